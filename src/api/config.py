@@ -43,4 +43,68 @@ else:
     BUCKET_NAME = None
     PDF_STORAGE_PATH = os.path.abspath("pdfs")
 
+# Local caches (Gemini batches, price tables, pre-pricing job state). Anchored to the repo root, not the working directory
+CACHE_DIR = os.path.abspath(os.getenv('CACHE_DIR', str(current_dir.parent.parent / "cache")))
+
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
+
+# Catalog ingestion (Gemini) settings
+GEMINI_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', '4'))
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv('GEMINI_REQUESTS_PER_MINUTE', '60'))
+# Estimated text tokens per Gemini batch. 0 falls back to fixed 2-page batches
+GEMINI_BATCH_TOKEN_BUDGET = int(os.getenv('GEMINI_BATCH_TOKEN_BUDGET', '3000'))
+# Processes for PDF text/layout extraction during upload, capped at the core count. Off (1) by default: each
+# spawned worker costs ~1.4s against ~3ms per page in-process (see benchmarks/parallel_extraction.py)
+EXTRACTION_WORKERS = int(os.getenv('EXTRACTION_WORKERS', '1'))
+# Catalogs shorter than this are extracted in-process even with EXTRACTION_WORKERS > 1
+EXTRACTION_MIN_PAGES = int(os.getenv('EXTRACTION_MIN_PAGES', '1000'))
+# Skip Gemini for pages with no product heading (see benchmarks/heading_detector.py before enabling)
+SKIP_CONTINUATION_PAGES = os.getenv('SKIP_CONTINUATION_PAGES', 'false').lower() == 'true'
+# Detect price tables on every page at upload and store their layouts. Off by default: it makes page
+# extraction ~60x slower (see benchmarks/table_layout_index.py), and pages are indexed on their first BoQ lookup anyway
+INDEX_TABLES = os.getenv('INDEX_TABLES', 'false').lower() == 'true'
+# Strip repeated headers/footers/legal lines and whitespace runs from Gemini prompts
+COMPACT_PROMPTS = os.getenv('COMPACT_PROMPTS', 'true').lower() == 'true'
+GEMINI_CACHE_PATH = os.getenv('GEMINI_CACHE_PATH', os.path.join(CACHE_DIR, "gemini_batches.sqlite3"))
+GEMINI_CACHE_MAX_MB = int(os.getenv('GEMINI_CACHE_MAX_MB', '256'))
+
+# Threads resolving BoQ items across all requests, and how many of them one /process-boq-text request may use
+BOQ_MAX_WORKERS = int(os.getenv('BOQ_MAX_WORKERS', '16'))
+BOQ_REQUEST_CONCURRENCY = int(os.getenv('BOQ_REQUEST_CONCURRENCY', '4'))
+
+# Catalog uploads: threads running ingestion jobs, and the chunk size uploads are written to disk in
+INGESTION_WORKERS = int(os.getenv('INGESTION_WORKERS', '1'))
+UPLOAD_CHUNK_BYTES = int(os.getenv('UPLOAD_CHUNK_BYTES', str(1024 * 1024)))
+# How long an ingestion job's claim on its catalog lasts without a stored batch. A catalog left claimed by a
+# stopped instance is resumed at the next startup (or re-upload) after this
+INGESTION_LEASE_SECONDS = int(os.getenv('INGESTION_LEASE_SECONDS', '300'))
+# How long shutdown waits for running ingestion jobs to commit the batch they are on and stop
+INGESTION_SHUTDOWN_SECONDS = float(os.getenv('INGESTION_SHUTDOWN_SECONDS', '60'))
+# Tries a page batch gets (across restarts) before its pages are recorded as failed and ingestion moves past them
+INGESTION_BATCH_ATTEMPTS = int(os.getenv('INGESTION_BATCH_ATTEMPTS', '3'))
+
+# Catalog PDFs kept open between requests (shared by uploads and price lookups)
+DOCUMENT_POOL_SIZE = int(os.getenv('DOCUMENT_POOL_SIZE', '8'))
+
+# Price table extraction (Claude) settings
+CLAUDE_MAX_CONCURRENCY = int(os.getenv('CLAUDE_MAX_CONCURRENCY', '6'))
+CLAUDE_REQUESTS_PER_MINUTE = float(os.getenv('CLAUDE_REQUESTS_PER_MINUTE', '50'))
+CLAUDE_OUTPUT_TOKENS_PER_MINUTE = float(os.getenv('CLAUDE_OUTPUT_TOKENS_PER_MINUTE', '16000'))
+# Stream price table output, so tables longer than the output token limit are continued, not lost
+CLAUDE_STREAM = os.getenv('CLAUDE_STREAM', 'true').lower() == 'true'
+PRICE_CACHE_PATH = os.getenv('PRICE_CACHE_PATH', os.path.join(CACHE_DIR, "price_tables.sqlite3"))
+PRICE_CACHE_MAX_MB = int(os.getenv('PRICE_CACHE_MAX_MB', '64'))
+# Also reuse prices for tables whose perceptual hash is within this many bits. Off by default:
+# sibling price grids that differ only in digits can hash this close (see benchmarks/price_cache.py)
+PRICE_CACHE_MAX_DISTANCE = int(os.environ['PRICE_CACHE_MAX_DISTANCE']) if os.getenv('PRICE_CACHE_MAX_DISTANCE') else None
+# Price tables parsed from the PDF's cell grid with at least this confidence skip Claude. A broken grid
+# scores at most 0.90 on the sample catalog (see benchmarks/native_table_parser.py); above 1 turns it off
+NATIVE_TABLE_MIN_CONFIDENCE = float(os.getenv('NATIVE_TABLE_MIN_CONFIDENCE', '0.95'))
+# Rendered price table images: pixel budget, longest side and PNG encoding (rgb / gray / palette)
+TABLE_IMAGE_MAX_PIXELS = int(os.getenv('TABLE_IMAGE_MAX_PIXELS', '1150000'))
+TABLE_IMAGE_MAX_EDGE = int(os.getenv('TABLE_IMAGE_MAX_EDGE', '1568'))
+TABLE_IMAGE_ENCODING = os.getenv('TABLE_IMAGE_ENCODING', 'rgb')
+# Offline pre-pricing job (python -m src.api.prepricing): submitted batch ids and table layout are kept here to resume
+PREPRICING_STATE_PATH = os.getenv('PREPRICING_STATE_PATH', os.path.join(CACHE_DIR, "prepricing_job.json"))
+PREPRICING_POLL_SECONDS = float(os.getenv('PREPRICING_POLL_SECONDS', '60'))
@@ -1,30 +1,41 @@
-from sqlalchemy import create_engine, or_, text
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.exc import SQLAlchemyError
-from typing import List, Dict, Optional
-from .models import Base, Product
-from .config import DATABASE_URL
+from sqlalchemy import and_, create_engine, func, or_, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Iterator, List, Dict, Optional, Set
+from .models import Base, Catalog, IndexedPage, IngestionCheckpoint, Product, TableLayout
+from .config import DATABASE_URL, BOQ_MAX_WORKERS, INGESTION_BATCH_ATTEMPTS, INGESTION_LEASE_SECONDS
 import logging
 import json
 
 logger = logging.getLogger(__name__)
 
+# First key of the advisory locks taken while pricing a product (the second is the product id)
+PRICE_LOCK_NAMESPACE = 7301
+
 class DatabaseSession:
     def __init__(self):
         self.Session = None
         self.engine = None
         
     def __call__(self):
+        """
+        The calling thread's session (a scoped_session proxy), so a ProductDB can be shared by the
+        event loop and the BoQ worker threads
+        """
         if self.Session is None:
             self.init_db()
-        return self.Session()
+        return self.Session
     
     def init_db(self):
         try:
             logger.info("Initializing database connection...")
-            self.engine = create_engine(DATABASE_URL)
+            # A BoQ worker can hold its session's connection and a price lock's connection at once
+            self.engine = create_engine(DATABASE_URL, max_overflow=max(10, 2 * BOQ_MAX_WORKERS))
             Base.metadata.create_all(self.engine)
-            self.Session = sessionmaker(bind=self.engine)
+            self.Session = scoped_session(sessionmaker(bind=self.engine))
             logger.info("Database initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize database: {str(e)}")
@@ -36,6 +47,10 @@ class ProductDB:
     def __init__(self):
         self.session = db_session()
     
+    def release_session(self):
+        """Close the calling thread's session, returning its connection to the pool (call when a worker's item is done)"""
+        self.session.remove()
+
     def add_products(self, products: List[dict]):
         """Add products with sequence numbers"""
         try:
@@ -117,9 +132,16 @@ class ProductDB:
         }
 
     def clear_products(self):
+        """Delete every product with its catalog's table layouts, content hash and ingestion checkpoint"""
         try:
             logger.info("Attempting to clear all products from database...")
             self.session.query(Product).delete()
+            self.session.query(TableLayout).delete()
+            self.session.query(IndexedPage).delete()
+            # Otherwise re-uploads are rejected as already processed, and unfinished ingestions resume
+            # at startup into catalogs that no longer exist
+            self.session.query(Catalog).delete()
+            self.session.query(IngestionCheckpoint).delete()
             self.session.commit()
             logger.info("Successfully cleared all products")
         except SQLAlchemyError as e:
@@ -172,6 +194,165 @@ class ProductDB:
             Product.page_reference['file_path'].astext == filename
         ).count() > 0
     
+    def get_catalog_by_hash(self, content_hash: str) -> Optional[str]:
+        """File path of the catalog already ingested with this content hash, if any"""
+        try:
+            catalog = self.session.query(Catalog).filter(Catalog.content_hash == content_hash).first()
+            return catalog.file_path if catalog else None
+        except SQLAlchemyError as e:
+            logger.error(f"Error getting catalog: {str(e)}")
+            raise
+
+    def add_catalog(self, file_path: str, content_hash: str, failed_pages: Optional[List[int]] = None):
+        """
+        Record an ingested catalog's content hash (see get_catalog_by_hash) and the pages it was ingested
+        without (see record_failed_batch), replacing its ingestion checkpoint
+        """
+        try:
+            self.session.add(Catalog(file_path=file_path, content_hash=content_hash, failed_pages=failed_pages or []))
+            self.session.query(IngestionCheckpoint).filter(IngestionCheckpoint.content_hash == content_hash).delete()
+            self.session.commit()
+        except Exception as e:
+            self.session.rollback()
+            logger.error(f"Error adding catalog: {str(e)}")
+            raise
+
+    def get_ingestion_checkpoint(self, content_hash: str) -> Optional[Dict]:
+        """{"file_path", "pages_done", "products_added", "failed_pages"} of an unfinished ingestion of this content, if any"""
+        try:
+            checkpoint = self.session.query(IngestionCheckpoint).filter(
+                IngestionCheckpoint.content_hash == content_hash
+            ).first()
+            return self._checkpoint_to_dict(checkpoint) if checkpoint else None
+        except SQLAlchemyError as e:
+            logger.error(f"Error getting ingestion checkpoint: {str(e)}")
+            raise
+
+    def get_ingestion_checkpoints(self) -> List[Dict]:
+        """Every unfinished ingestion, as get_ingestion_checkpoint plus its content_hash and whether a job holds it"""
+        try:
+            return [{"content_hash": checkpoint.content_hash, "claimed": bool(claimed), **self._checkpoint_to_dict(checkpoint)}
+                    for checkpoint, claimed in self.session.query(
+                        IngestionCheckpoint, IngestionCheckpoint.claimed_until > func.now()
+                    ).all()]
+        except SQLAlchemyError as e:
+            logger.error(f"Error getting ingestion checkpoints: {str(e)}")
+            raise
+
+    def _checkpoint_to_dict(self, checkpoint: IngestionCheckpoint) -> Dict:
+        return {
+            "file_path": checkpoint.file_path,
+            "pages_done": checkpoint.pages_done,
+            "products_added": checkpoint.products_added,
+            "failed_pages": list(checkpoint.failed_pages or [])
+        }
+
+    def add_products_checkpointed(self, products: List[dict], layouts: List[Dict], content_hash: str,
+                                  file_path: str, pages_done: int, products_added: int, claimed_by: str,
+                                  indexed_pages: Optional[List[int]] = None,
+                                  continued_product: Optional[Dict] = None) -> bool:
+        """
+        Add a batch of products and the table layouts of its pages, move the catalog's ingestion checkpoint
+        to pages_done / products_added and renew claimed_by's claim on it, all in one transaction.
+        indexed_pages are the batch's pages whose tables were detected (so layouts has all of them), if
+        tables were indexed at upload. continued_product is an already stored product (by sequence_number)
+        whose page_reference gained the batch's continuation pages. Stores nothing and returns False if
+        claimed_by no longer holds the claim
+        """
+        try:
+            checkpoint = self.session.query(IngestionCheckpoint).filter(
+                IngestionCheckpoint.content_hash == content_hash
+            ).with_for_update().first()
+            if checkpoint is None or checkpoint.claimed_by != claimed_by:
+                self.session.rollback()
+                return False
+            self.session.add_all([Product(**product) for product in products])
+            self.session.add_all([self._table_layout(file_path, layout) for layout in layouts])
+            self.session.add_all([IndexedPage(file_path=file_path, page_num=page_num) for page_num in indexed_pages or []])
+            if continued_product is not None:
+                self.session.query(Product).filter(
+                    Product.page_reference['file_path'].astext == file_path,
+                    Product.sequence_number == continued_product['sequence_number']
+                ).update({Product.page_reference: continued_product['page_reference']}, synchronize_session=False)
+            checkpoint.pages_done = pages_done
+            checkpoint.products_added = products_added
+            checkpoint.batch_attempts = 0
+            checkpoint.claimed_until = func.now() + timedelta(seconds=INGESTION_LEASE_SECONDS)
+            self.session.commit()
+            return True
+        except Exception as e:
+            self.session.rollback()
+            logger.error(f"Error adding products: {str(e)}")
+            raise
+
+    def record_failed_batch(self, content_hash: str, claimed_by: str, pages: List[int]) -> Optional[Dict]:
+        """
+        Count a failed try of the batch after the checkpoint (its pages), renewing claimed_by's claim. After
+        INGESTION_BATCH_ATTEMPTS tries its pages are added to failed_pages and the checkpoint moves past them,
+        so a batch Gemini never answers doesn't stop the catalog for good. Returns the checkpoint as
+        get_ingestion_checkpoint, or None if claimed_by no longer holds the claim
+        """
+        try:
+            checkpoint = self.session.query(IngestionCheckpoint).filter(
+                IngestionCheckpoint.content_hash == content_hash
+            ).with_for_update().first()
+            if checkpoint is None or checkpoint.claimed_by != claimed_by:
+                self.session.rollback()
+                return None
+            checkpoint.batch_attempts += 1
+            if checkpoint.batch_attempts >= INGESTION_BATCH_ATTEMPTS:
+                logger.warning(f"Giving up pages {pages} of {checkpoint.file_path} after {checkpoint.batch_attempts} tries")
+                checkpoint.failed_pages = list(checkpoint.failed_pages or []) + list(pages)
+                checkpoint.pages_done = max(pages)
+                checkpoint.batch_attempts = 0
+            checkpoint.claimed_until = func.now() + timedelta(seconds=INGESTION_LEASE_SECONDS)
+            self.session.commit()
+            return self._checkpoint_to_dict(checkpoint)
+        except Exception as e:
+            self.session.rollback()
+            logger.error(f"Error recording failed batch: {str(e)}")
+            raise
+
+    def claim_ingestion(self, content_hash: str, file_path: str, claimed_by: str) -> Optional[Dict]:
+        """
+        Claim the ingestion of this content for a job, across every worker process, for INGESTION_LEASE_SECONDS
+        (add_products_checkpointed renews it). A new catalog gets a checkpoint at page 0, stored at file_path.
+        Returns the checkpoint as get_ingestion_checkpoint, or None if another job holds an unexpired claim
+        """
+        try:
+            self.session.execute(insert(IngestionCheckpoint).values(
+                content_hash=content_hash, file_path=file_path, pages_done=0, products_added=0
+            ).on_conflict_do_nothing(index_elements=[IngestionCheckpoint.content_hash]))
+            claimed = self.session.query(IngestionCheckpoint).filter(
+                IngestionCheckpoint.content_hash == content_hash,
+                or_(IngestionCheckpoint.claimed_by.is_(None),
+                    IngestionCheckpoint.claimed_by == claimed_by,
+                    IngestionCheckpoint.claimed_until < func.now())
+            ).update({
+                IngestionCheckpoint.claimed_by: claimed_by,
+                IngestionCheckpoint.claimed_until: func.now() + timedelta(seconds=INGESTION_LEASE_SECONDS)
+            }, synchronize_session=False)
+            self.session.commit()
+            return self.get_ingestion_checkpoint(content_hash) if claimed else None
+        except Exception as e:
+            self.session.rollback()
+            logger.error(f"Error claiming ingestion: {str(e)}")
+            raise
+
+    def release_ingestion(self, content_hash: str, claimed_by: str):
+        """Give up a job's claim on an ingestion (when the job stops before finishing), so another can resume it"""
+        try:
+            self.session.query(IngestionCheckpoint).filter(
+                IngestionCheckpoint.content_hash == content_hash,
+                IngestionCheckpoint.claimed_by == claimed_by
+            ).update({IngestionCheckpoint.claimed_by: None, IngestionCheckpoint.claimed_until: None},
+                     synchronize_session=False)
+            self.session.commit()
+        except Exception as e:
+            self.session.rollback()
+            logger.error(f"Error releasing ingestion: {str(e)}")
+            raise
+
     def find_products(self, name: str, brand: str, type: str) -> List[Product]:
         """Find products matching name, brand and type"""
         return self.session.query(Product).filter(
@@ -187,6 +368,134 @@ class ProductDB:
             Product.sequence_number == current_product.sequence_number + 1
         ).first()
     
+    def get_unpriced_products(self) -> List[Product]:
+        """Products whose price tables haven't been extracted yet, in catalog order"""
+        # Uploads store price_data=None, which JSONB columns persist as a JSON null rather than SQL NULL
+        return self.session.query(Product).filter(
+            or_(Product.price_data.is_(None), func.jsonb_typeof(Product.price_data) == 'null')
+        ).order_by(Product.page_reference['file_path'].astext, Product.sequence_number).all()
+
+    def add_table_layouts(self, file_path: str, layouts: List[Dict]):
+        """Replace the stored table layouts of a catalog (see page_layout.detect_tables), marking its pages unindexed"""
+        try:
+            self.session.query(TableLayout).filter(TableLayout.file_path == file_path).delete()
+            self.session.query(IndexedPage).filter(IndexedPage.file_path == file_path).delete()
+            self.session.add_all([self._table_layout(file_path, layout) for layout in layouts])
+            self.session.commit()
+            logger.info(f"Stored {len(layouts)} table layouts for {file_path}")
+        except Exception as e:
+            self.session.rollback()
+            logger.error(f"Error adding table layouts: {str(e)}")
+            raise
+
+    def get_indexed_pages(self, file_path: str, start_page: int, end_page: int) -> Set[int]:
+        """Pages from start_page to end_page of a catalog whose tables are stored (see add_page_table_layouts)"""
+        try:
+            return {page_num for (page_num,) in self.session.query(IndexedPage.page_num).filter(
+                IndexedPage.file_path == file_path,
+                IndexedPage.page_num >= start_page,
+                IndexedPage.page_num <= end_page
+            )}
+        except SQLAlchemyError as e:
+            logger.error(f"Error getting indexed pages: {str(e)}")
+            raise
+
+    def add_page_table_layouts(self, file_path: str, pages: List[int], layouts: List[Dict]):
+        """
+        Store the tables detected on some pages of a catalog (all of them, none if a page has no tables)
+        and mark the pages indexed, replacing layouts stored for them before. If another worker indexed
+        the same pages first, its layouts are kept
+        """
+        if not pages:
+            return
+        try:
+            in_pages = and_(TableLayout.file_path == file_path, TableLayout.page_num.in_(pages))
+            self.session.query(TableLayout).filter(in_pages).delete(synchronize_session=False)
+            self.session.add_all([self._table_layout(file_path, layout) for layout in layouts])
+            self.session.add_all([IndexedPage(file_path=file_path, page_num=page_num) for page_num in pages])
+            self.session.commit()
+            logger.info(f"Indexed {len(layouts)} tables on pages {pages[0]}-{pages[-1]} of {file_path}")
+        except IntegrityError:
+            self.session.rollback()
+            logger.info(f"Pages {pages[0]}-{pages[-1]} of {file_path} were indexed by another worker")
+        except Exception as e:
+            self.session.rollback()
+            logger.error(f"Error adding table layouts: {str(e)}")
+            raise
+
+    def _table_layout(self, file_path: str, layout: Dict) -> TableLayout:
+        return TableLayout(
+            file_path=file_path,
+            page_num=layout["page_num"],
+            x0=layout["bbox"][0], y0=layout["bbox"][1], x1=layout["bbox"][2], y1=layout["bbox"][3],
+            row_count=layout["row_count"],
+            col_count=layout["col_count"],
+            header=layout["header"],
+            cells=layout["cells"]
+        )
+
+    def get_table_layouts(self, file_path: str, start_page: int, start_y: Optional[float],
+                          end_page: int, end_y: Optional[float]) -> Optional[List[Dict]]:
+        """
+        Stored tables of a catalog from (start_page, start_y) to (end_page, end_y), in page and y order.
+        Tables on start_page above start_y and on end_page below end_y are left out, as in
+        BoQProcessor._get_price_tables. Returns None if any page in the range isn't indexed yet.
+        """
+        try:
+            indexed = self.session.query(func.count(IndexedPage.id)).filter(
+                IndexedPage.file_path == file_path,
+                IndexedPage.page_num >= start_page,
+                IndexedPage.page_num <= end_page
+            ).scalar()
+            if indexed < end_page - start_page + 1:
+                return None
+            in_file = TableLayout.file_path == file_path
+            after_start = TableLayout.page_num >= start_page
+            if start_y is not None:
+                after_start = or_(TableLayout.page_num > start_page,
+                                  and_(TableLayout.page_num == start_page, TableLayout.y0 >= start_y))
+            before_end = TableLayout.page_num <= end_page
+            if end_y:
+                before_end = or_(TableLayout.page_num < end_page,
+                                 and_(TableLayout.page_num == end_page, TableLayout.y0 <= end_y))
+            layouts = self.session.query(TableLayout).filter(
+                in_file, after_start, before_end
+            ).order_by(TableLayout.page_num, TableLayout.y0).all()
+            return [{
+                "page_num": layout.page_num,
+                "bbox": (layout.x0, layout.y0, layout.x1, layout.y1),
+                "row_count": layout.row_count,
+                "col_count": layout.col_count,
+                "header": layout.header or [],
+                "cells": layout.cells or []
+            } for layout in layouts]
+        except SQLAlchemyError as e:
+            logger.error(f"Error getting table layouts: {str(e)}")
+            raise
+
+    @contextmanager
+    def price_lock(self, product_id: int) -> Iterator[None]:
+        """
+        Hold the advisory lock on pricing product_id, shared by every worker process on the database.
+        It's taken on a connection of its own, so the session can commit while it's held, and is
+        released with that connection's transaction (also if the worker dies)
+        """
+        with self.session.get_bind().begin() as connection:
+            connection.execute(
+                text("SELECT pg_advisory_xact_lock(:namespace, :product_id)"),
+                {"namespace": PRICE_LOCK_NAMESPACE, "product_id": product_id}
+            )
+            yield
+
+    def get_stored_price_data(self, product_id: int):
+        """The product's committed price data (read from the database, not the session), or None if unpriced"""
+        try:
+            price_data = self.session.query(Product.price_data).filter(Product.id == product_id).scalar()
+            return price_data or None
+        except SQLAlchemyError as e:
+            logger.error(f"Error getting price data: {str(e)}")
+            raise
+
     def update_price_data(self, product_id: int, price_data: dict):
         """Update price data for a product"""
         try:
@@ -0,0 +1,259 @@
+"""
+Background catalog ingestion: /upload saves the PDF and queues a job, and the extraction runs here,
+on worker threads, while /upload/jobs/{id} reports its progress. The queue is local to the process,
+but every batch of products is committed with a checkpoint keyed on the catalog's content hash, so a
+job that fails or is lost with the instance resumes at its first unfinished batch: at startup, or
+when the same PDF is uploaded again. A job claims its catalog's checkpoint with a lease renewed by every
+batch, so two jobs (on any instances) never ingest the same catalog at once; the one that finds it
+claimed is skipped.
+
+At shutdown a running job stops after the batch it is on is committed, and is resumed from there.
+Products, table layouts and the checkpoint of a batch are committed in one transaction, so a worker
+killed mid-commit (past the shutdown timeout) loses only that uncommitted batch, which is redone.
+"""
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+from ..pdf_processor import PDFProcessor
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class IngestionClaimed(Exception):
+    """Another job holds the catalog's ingestion (see ProductDB.claim_ingestion), so this one is skipped"""
+
+
+class IngestionStopped(Exception):
+    """The server is shutting down: the job stopped after its last committed batch, and resumes from its checkpoint"""
+
+
+class IngestionJob:
+    """One uploaded catalog waiting for or going through extraction"""
+
+    def __init__(self, file_name: str, content_hash: str, path: str):
+        self.id = uuid.uuid4().hex
+        self.file_name = file_name
+        self.content_hash = content_hash
+        # The uploaded PDF, on local disk until the job's cleanup
+        self.path = path
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Live counters of the job's PDFProcessor (pages_total, pages_done, ...), set once it starts
+        self.stats: Dict = {}
+        self.products_found = 0
+        # Pages given up after repeated batch failures (see ProductDB.record_failed_batch)
+        self.failed_pages: List[int] = []
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        # Set by IngestionQueue.close(): stop after the batch being extracted is committed
+        self.stop_requested = False
+
+    def progress(self) -> Dict:
+        """What the status endpoint reports: pages done, products found, pages failed and an ETA from the page rate so far"""
+        pages_total = self.stats.get("pages_total") or None
+        pages_done = self.stats.get("pages_done", 0)
+        eta_seconds = None
+        if self.status == "running" and pages_total and pages_done:
+            elapsed = time.time() - self.started_at
+            eta_seconds = round(elapsed / pages_done * max(0, pages_total - pages_done), 1)
+        return {
+            "job_id": self.id,
+            "file_name": self.file_name,
+            "status": self.status,
+            "pages_total": pages_total,
+            "pages_done": pages_done,
+            "products_found": self.products_found,
+            "failed_pages": self.failed_pages,
+            "eta_seconds": eta_seconds,
+            "queued_seconds": round((self.started_at or time.time()) - self.created_at, 1),
+            "running_seconds": round((self.finished_at or time.time()) - self.started_at, 1) if self.started_at else None,
+            "result": self.result,
+            "error": self.error
+        }
+
+
+def store_product_batches(db, processor: PDFProcessor, content_hash: str, file_path: str, claimed_by: str,
+                          products_added: int = 0, job: Optional[IngestionJob] = None) -> int:
+    """
+    Store the processor's products as each batch comes back, committing every batch together with its
+    pages' table layouts and the catalog's checkpoint (last page done, products so far). A failed run
+    restarts with PDFProcessor(start_page=pages_done + 1) and products_added from the checkpoint.
+
+    Args:
+        db: ProductDB (add_products_checkpointed)
+        processor: Extracts the catalog, from its start_page
+        content_hash: SHA-256 of the catalog PDF, the checkpoint's key
+        file_path: Stored path of the catalog, written into each product's page_reference
+        claimed_by: Id the checkpoint was claimed with, its lease renewed by every batch
+        products_added: Products already stored by an earlier run (sequence numbers continue after it)
+        job: Optional job whose products_found is kept up to date
+
+    Returns:
+        Products stored in total, earlier runs included
+
+    Raises:
+        IngestionClaimed: The claim expired and another job took the catalog over (nothing more is stored)
+        IngestionStopped: job.stop_requested was set; the batches stored so far are checkpointed
+    """
+    # The last product stored, and its page count then: iter_batches can add continuation pages to it later
+    last_product, last_page_count = None, 0
+    for pages, products in processor.iter_batches():
+        continued_product = None
+        if last_product is not None and len(last_product['page_reference']['page_numbers']) != last_page_count:
+            continued_product = last_product
+        for product in products:
+            products_added += 1
+            if product.get('page_reference'):
+                product['page_reference']['file_path'] = file_path
+            product['price_data'] = None     # Initialize price_data as NULL
+            product['sequence_number'] = products_added   # Add sequence number so its easy to get next product when finding price tables for curr product
+
+        # Layouts are collected as pages are extracted (ahead of their batch); commit this batch's share
+        batch_pages = set(pages)
+        layouts = [layout for layout in processor.table_layouts if layout["page_num"] in batch_pages]
+        processor.table_layouts = [layout for layout in processor.table_layouts if layout["page_num"] not in batch_pages]
+
+        indexed_pages = pages if processor.index_tables else []
+        if not db.add_products_checkpointed(products, layouts, content_hash, file_path, max(pages), products_added,
+                                            claimed_by, indexed_pages=indexed_pages,
+                                            continued_product=continued_product):
+            raise IngestionClaimed(f"Lost the claim on {file_path} to another job at page {min(pages)}")
+        if products:
+            last_product = products[-1]
+        if last_product is not None:
+            last_page_count = len(last_product['page_reference']['page_numbers'])
+        if job is not None:
+            job.products_found = products_added
+        logger.info(f"Stored {products_added} products so far (pages up to {max(pages)} done)")
+        if job is not None and job.stop_requested:
+            raise IngestionStopped(f"Stopped at shutdown after page {max(pages)}, resumes from the checkpoint")
+    return products_added
+
+
+class IngestionQueue:
+    """
+    In-process FIFO of ingestion jobs, run by `workers` threads. ingest(job) does the work and returns
+    the job's result, or raises IngestionClaimed to skip the job; cleanup(job) runs after it (or for a job
+    dropped at shutdown) to remove the upload. Finished jobs are kept for status lookups, up to max_finished.
+    The workers aren't daemon threads, so the process doesn't exit in the middle of a batch's commit.
+    """
+
+    def __init__(self, ingest: Callable[[IngestionJob], Dict], cleanup: Callable[[IngestionJob], None],
+                 workers: int = 1, max_finished: int = 100):
+        self.ingest = ingest
+        self.cleanup = cleanup
+        self.max_finished = max_finished
+        self._queue: "queue.Queue[Optional[IngestionJob]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._work, name=f"ingestion-{i}")
+            for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, file_name: str, content_hash: str, path: str) -> IngestionJob:
+        job = IngestionJob(file_name, content_hash, path)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Ingestion queue is closed")
+            self._jobs[job.id] = job
+        self._queue.put(job)
+        logger.info(f"Queued ingestion job {job.id} for {file_name} ({self._queue.qsize()} waiting)")
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[IngestionJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def find_active(self, content_hash: Optional[str] = None, file_name: Optional[str] = None) -> Optional[IngestionJob]:
+        """A queued or running job for the same content (or, failing that, the same file name)"""
+        active = [job for job in self.jobs() if job.status in ACTIVE_STATUSES]
+        return (next((job for job in active if job.content_hash == content_hash), None)
+                or next((job for job in active if job.file_name == file_name), None))
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                # Dropped by close() while waiting
+                if job.status != "queued":
+                    continue
+                job.status = "running"
+            job.started_at = time.time()
+            logger.info(f"Starting ingestion job {job.id} for {job.file_name}")
+            try:
+                job.result = self.ingest(job)
+                job.status = "done"
+            except IngestionClaimed as e:
+                logger.info(f"Skipped ingestion job {job.id}: {str(e)}")
+                job.error = str(e)
+                job.status = "skipped"
+            except IngestionStopped as e:
+                logger.warning(f"Ingestion job {job.id}: {str(e)}")
+                job.error = str(e)
+                job.status = "failed"
+            except Exception as e:
+                logger.error(f"Ingestion job {job.id} failed: {str(e)}", exc_info=True)
+                job.error = str(e)
+                job.status = "failed"
+            finally:
+                job.finished_at = time.time()
+                self._cleanup(job)
+                self._forget_finished()
+
+    def _cleanup(self, job: IngestionJob):
+        try:
+            self.cleanup(job)
+        except Exception as e:
+            logger.error(f"Error cleaning up ingestion job {job.id}: {str(e)}")
+
+    def _forget_finished(self):
+        with self._lock:
+            finished = [job_id for job_id, job in self._jobs.items() if job.status not in ACTIVE_STATUSES]
+            for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+                del self._jobs[job_id]
+
+    def close(self, timeout: Optional[float] = None):
+        """
+        Stop running jobs after their current batch is committed, drop queued ones (their uploads are
+        removed) and stop the workers, waiting up to timeout seconds for them (None waits for good)
+        """
+        with self._lock:
+            self._closed = True
+            dropped = [job for job in self._jobs.values() if job.status == "queued"]
+            for job in dropped:
+                job.status = "failed"
+                job.error = "Server shut down before the job started"
+            for job in self._jobs.values():
+                if job.status == "running":
+                    job.stop_requested = True
+        for job in dropped:
+            self._cleanup(job)
+        for _ in self._threads:
+            self._queue.put(None)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        running = [thread.name for thread in self._threads if thread.is_alive()]
+        if running:
+            logger.warning(f"Ingestion workers {running} still extracting after {timeout}s; "
+                           f"their jobs resume from the last committed batch")
+        if dropped:
+            logger.warning(f"Dropped {len(dropped)} queued ingestion jobs at shutdown")
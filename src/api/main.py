@@ -1,20 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy import inspect
-from typing import Optional, List
+from typing import AsyncIterator, Literal, Optional, List
 from google.cloud import storage
 from pydantic import BaseModel
+import asyncio
+import hashlib
+import json
 import tempfile
+import time
 import os
 import logging
 import shutil
 from .database import ProductDB, db_session
 from .models import Base, Product
-from .config import ALLOW_ORIGINS, BUCKET_NAME, GEMINI_API_KEY, STORAGE_TYPE, PDF_STORAGE_PATH
-from ..pdf_processor import PDFProcessor
-from ..boq_processor import BoQProcessor
+from .config import (
+    ALLOW_ORIGINS, BUCKET_NAME, GEMINI_API_KEY, ANTHROPIC_API_KEY, STORAGE_TYPE, PDF_STORAGE_PATH,
+    GEMINI_MAX_CONCURRENCY, GEMINI_REQUESTS_PER_MINUTE, GEMINI_CACHE_PATH, GEMINI_CACHE_MAX_MB,
+    GEMINI_BATCH_TOKEN_BUDGET, EXTRACTION_WORKERS, EXTRACTION_MIN_PAGES, SKIP_CONTINUATION_PAGES,
+    COMPACT_PROMPTS, INDEX_TABLES, CLAUDE_MAX_CONCURRENCY, CLAUDE_REQUESTS_PER_MINUTE,
+    CLAUDE_OUTPUT_TOKENS_PER_MINUTE, PRICE_CACHE_PATH, PRICE_CACHE_MAX_MB, PRICE_CACHE_MAX_DISTANCE,
+    NATIVE_TABLE_MIN_CONFIDENCE, CLAUDE_STREAM, TABLE_IMAGE_MAX_PIXELS, TABLE_IMAGE_MAX_EDGE,
+    TABLE_IMAGE_ENCODING, DOCUMENT_POOL_SIZE, BOQ_MAX_WORKERS, BOQ_REQUEST_CONCURRENCY,
+    INGESTION_WORKERS, INGESTION_SHUTDOWN_SECONDS, UPLOAD_CHUNK_BYTES,
+)
+from .ingestion import IngestionClaimed, IngestionJob, IngestionQueue, store_product_batches
+from ..pdf_processor import BatchExtractionError, ExtractionOptions, PDFProcessor
+from ..pricing_service import PricingService
+from ..result_cache import ResultCache
+from ..price_cache import PriceCache
+from ..price_extractor import PRICE_CACHE_NAMESPACE
 
 # Configure logging
 logging.basicConfig(
@@ -33,16 +54,63 @@ class BOQRequest(BaseModel):
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Initialize database
+    # Startup: Initialize database and the pricing service shared by all requests
     db_session.init_db()
+    # Parsed Gemini batch results, shared by all uploads so re-issued catalogs only pay for changed pages
+    app.state.gemini_cache = ResultCache(GEMINI_CACHE_PATH, max_bytes=GEMINI_CACHE_MAX_MB * 1024 * 1024)
+    # How every ingestion job batches and extracts its catalog
+    app.state.extraction_options = ExtractionOptions(
+        max_concurrency=GEMINI_MAX_CONCURRENCY,
+        requests_per_minute=GEMINI_REQUESTS_PER_MINUTE,
+        token_budget=GEMINI_BATCH_TOKEN_BUDGET or None,
+        extraction_workers=EXTRACTION_WORKERS,
+        extraction_min_pages=EXTRACTION_MIN_PAGES,
+        skip_continuation_pages=SKIP_CONTINUATION_PAGES,
+        compact_prompts=COMPACT_PROMPTS,
+        index_tables=INDEX_TABLES,
+        # A failed batch stops the run, so it's retried instead of its products going missing
+        raise_on_batch_errors=True
+    )
+    # Parsed price tables keyed on the table image, so shared price grids and re-uploads skip Claude
+    app.state.price_cache = PriceCache(
+        ResultCache(PRICE_CACHE_PATH, max_bytes=PRICE_CACHE_MAX_MB * 1024 * 1024),
+        namespace=PRICE_CACHE_NAMESPACE,
+        max_distance=PRICE_CACHE_MAX_DISTANCE
+    )
+    app.state.pricing_service = PricingService(
+        catalog_dir=PDF_STORAGE_PATH,
+        claude_api_key=ANTHROPIC_API_KEY,
+        max_open_documents=DOCUMENT_POOL_SIZE,
+        max_concurrency=CLAUDE_MAX_CONCURRENCY,
+        requests_per_minute=CLAUDE_REQUESTS_PER_MINUTE,
+        output_tokens_per_minute=CLAUDE_OUTPUT_TOKENS_PER_MINUTE,
+        price_cache=app.state.price_cache,
+        native_min_confidence=NATIVE_TABLE_MIN_CONFIDENCE,
+        stream_prices=CLAUDE_STREAM,
+        image_max_pixels=TABLE_IMAGE_MAX_PIXELS,
+        image_max_edge=TABLE_IMAGE_MAX_EDGE,
+        image_encoding=TABLE_IMAGE_ENCODING,
+        table_index=db,
+        price_store=db
+    )
+    # Blocking BoQ work (database lookups, PDF rendering, Claude calls) runs here, off the event loop
+    app.state.boq_executor = ThreadPoolExecutor(max_workers=BOQ_MAX_WORKERS, thread_name_prefix="boq")
+    # Catalog extraction runs in the background, after /upload has returned
+    app.state.ingestion_queue = IngestionQueue(ingest_catalog, cleanup=discard_upload, workers=INGESTION_WORKERS)
+    resume_ingestion_jobs()
     yield
-    # Shutdown: Close database session
+    # Shutdown: Stop ingestion and BoQ workers (they still use the database), then close the database
+    # session, Claude connections and pooled catalogs
+    app.state.ingestion_queue.close(timeout=INGESTION_SHUTDOWN_SECONDS)
+    app.state.boq_executor.shutdown(wait=True, cancel_futures=True)
     if db.session:
         db.session.close()
+    app.state.pricing_service.close()
+    app.state.gemini_cache.close()
+    app.state.price_cache.cache.close()
 
 app = FastAPI(lifespan=lifespan)
 db = ProductDB()
-
 app.add_middleware(
     CORSMiddleware,
     allow_origins=ALLOW_ORIGINS,
@@ -96,6 +164,19 @@ async def get_all_products():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/debug/price-cache")
+async def get_price_cache_stats():
+    price_cache = app.state.price_cache
+    return {"lookups": price_cache.stats(), "store": price_cache.cache.stats()}
+
+@app.get("/debug/document-pool")
+async def get_document_pool_stats():
+    return app.state.pricing_service.document_pool.stats()
+
+@app.get("/debug/pricing-service")
+async def get_pricing_service_stats():
+    return app.state.pricing_service.stats()
+
 @app.delete("/debug/products")
 async def clear_all_products():
     try:
@@ -104,84 +185,231 @@ async def clear_all_products():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/upload")
+@app.post("/upload", status_code=202)
 async def upload_pdf(file: UploadFile = File(...)):
+    """Save the PDF and queue it for extraction. Poll /upload/jobs/{job_id} for progress"""
     temp_dir = tempfile.mkdtemp()
     temp_path = os.path.join(temp_dir, file.filename)
+    queued = False
     
     try:
         # Log the start of processing
         logger.info(f"Starting upload process for file: {file.filename}")
 
-        # Check if PDF already exists        
-        if db.pdf_exists(file.filename):
-            raise HTTPException(status_code=400, detail=f"PDF {file.filename} already processed.")
-        
-        # Save the uploaded file to temp location
-        with open(temp_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-        
-        logger.info(f"File saved to temp location: {temp_path}")
-        
-        # Process PDF
-        processor = PDFProcessor(temp_path, GEMINI_API_KEY)
-        logger.info("Starting PDF processing")
-        products = processor.extract_product_info()
-        logger.info(f"Extracted {len(products)} products")
-        
-        if STORAGE_TYPE == 'local':
-            # Move to local storage
-            final_path = os.path.join(PDF_STORAGE_PATH, file.filename)
-            logger.info(f"Moving file to: {final_path}")
-            
-            # Remove existing file if it exists
-            if os.path.exists(final_path):
-                logger.info(f"Removing existing file: {final_path}")
-                os.remove(final_path)
-            
-            # Use shutil.copy2 instead of os.rename
-            shutil.copy2(temp_path, final_path)
-            logger.info("File moved successfully")
-            
-            # Update file paths in products
-            for i, product in enumerate(products, start=1):
-                if product.get('page_reference'):
-                    product['page_reference']['file_path'] = file.filename
-                product['price_data'] = None     # Initialize price_data as NULL
-                product['sequence_number'] = i   # Add sequence number so its easy to get next product when finding price tables for curr product
-
-        else:
-            # Cloud storage logic...
-            logger.info("Using cloud storage")
-            blob = bucket.blob(f"pdfs/{file.filename}")
-            blob.upload_from_filename(temp_path)
-            # Update file paths in products
-            for i, product in enumerate(products, start=1):
-                if product.get('page_reference'):
-                    product['page_reference']['file_path'] = f"pdfs/{file.filename}"
-                product['price_data'] = None     # Initialize price_data as NULL
-                product['sequence_number'] = i   # Add sequence number so its easy to get next product when finding price tables for curr product
-                
-        # Store in database
-        logger.info("Storing products in database")
-        db.add_products(products)        
-        return {"message": f"Processed {len(products)} products from {file.filename}", "products_added": len(products)}
+        # Write the upload to disk in chunks, hashing it on the way, instead of reading it all into memory.
+        # Disk writes, hashing and the database checks below run on the threadpool, off the event loop
+        digest = hashlib.sha256()
+        size = 0
+        buffer = await run_in_threadpool(open, temp_path, "wb")
+        try:
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                await run_in_threadpool(write_chunk, buffer, digest, chunk)
+                size += len(chunk)
+        finally:
+            await run_in_threadpool(buffer.close)
+        content_hash = digest.hexdigest()
+        logger.info(f"File saved to temp location: {temp_path} ({size} bytes, sha256 {content_hash})")
+
+        # The same content already being ingested: hand back that job
+        active = app.state.ingestion_queue.find_active(content_hash=content_hash, file_name=file.filename)
+        if active is not None and active.content_hash == content_hash:
+            return active.progress()
+        if active is not None:
+            raise HTTPException(status_code=400, detail=f"PDF {file.filename} is already being processed.")
+
+        conflict = await run_in_threadpool(find_processed_catalog, content_hash, file.filename)
+        if conflict is not None:
+            raise HTTPException(status_code=400, detail=conflict)
+
+        job = app.state.ingestion_queue.submit(file.filename, content_hash, temp_path)
+        queued = True
+        return job.progress()
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing upload: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
     
     finally:
-        # Cleanup temp files
+        await file.close()
+        # Once queued, the upload belongs to the job (see discard_upload)
+        if not queued:
+            await run_in_threadpool(remove_upload, temp_path)
+
+def write_chunk(buffer, digest, chunk: bytes):
+    """Hash an upload chunk and append it to the upload's temp file"""
+    digest.update(chunk)
+    buffer.write(chunk)
+
+def find_processed_catalog(content_hash: str, file_name: str) -> Optional[str]:
+    """
+    Why an upload is rejected as already processed, or None. Matches by content under any name (or by name,
+    for catalogs from before hashes were stored). A catalog whose ingestion stopped part way has a checkpoint
+    instead, and the job resumes it. Runs on the threadpool
+    """
+    try:
+        existing_path = db.get_catalog_by_hash(content_hash)
+        if existing_path is not None:
+            return f"PDF {file_name} already processed (as {existing_path})."
+        if db.get_ingestion_checkpoint(content_hash) is None and db.pdf_exists(file_name):
+            return f"PDF {file_name} already processed."
+        return None
+    finally:
+        db.release_session()
+
+@app.get("/upload/jobs")
+async def list_upload_jobs():
+    return [job.progress() for job in app.state.ingestion_queue.jobs()]
+
+@app.get("/upload/jobs/{job_id}")
+async def get_upload_job(job_id: str):
+    job = app.state.ingestion_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No upload job {job_id}")
+    return job.progress()
+
+def ingest_catalog(job: IngestionJob) -> dict:
+    """
+    Store an uploaded catalog and extract its products, or resume from the catalog's checkpoint if an
+    earlier job for the same content stopped part way. Runs on an ingestion worker thread
+    """
+    try:
+        # Claim the catalog for this job on every instance; a job finding it claimed is skipped, not failed
+        checkpoint = db.claim_ingestion(job.content_hash, catalog_storage_path(job.file_name), job.id)
+        if checkpoint is None:
+            raise IngestionClaimed(f"{job.file_name} is already being processed by another worker")
         try:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            if os.path.exists(temp_dir):
-                os.rmdir(temp_dir)
-            logger.info("Cleaned up temporary files")
-        except Exception as e:
-            logger.error(f"Error cleaning up temp files: {str(e)}")
+            # Stored by the job that created the checkpoint, whatever this upload is called
+            stored_file_path = checkpoint["file_path"]
+            resumed = checkpoint["pages_done"] > 0
+            if not resumed:
+                # Store the PDF first, so products committed mid-extraction already point at a readable file
+                store_catalog(job, stored_file_path)
+                # Drop layouts left from an earlier catalog of the same name; this one's are added per batch
+                db.add_table_layouts(stored_file_path, [])
+                start_page, products_added = 1, 0
+            else:
+                if not os.path.exists(job.path):
+                    fetch_catalog(stored_file_path, job.path)
+                start_page, products_added = checkpoint["pages_done"] + 1, checkpoint["products_added"]
+                logger.info(f"Resuming {stored_file_path} at page {start_page} ({products_added} products already stored)")
+            first_page = start_page
+
+            # Live counts for the job's progress
+            job.products_found = products_added
+            job.failed_pages = checkpoint["failed_pages"]
+            while True:
+                # Process PDF, storing each batch of products (and the checkpoint) as soon as it comes back
+                processor = PDFProcessor(
+                    job.path, GEMINI_API_KEY,
+                    options=app.state.extraction_options,
+                    cache=app.state.gemini_cache,
+                    document_pool=app.state.pricing_service.document_pool,
+                    start_page=start_page
+                )
+                job.stats = processor.stats
+                logger.info(f"Starting PDF processing at page {start_page}")
+                try:
+                    products_added = store_product_batches(
+                        db, processor, job.content_hash, stored_file_path, job.id, products_added=products_added, job=job
+                    )
+                    break
+                except BatchExtractionError as e:
+                    # Retry from the checkpoint; after INGESTION_BATCH_ATTEMPTS tries the checkpoint has moved past the batch
+                    logger.warning(f"Ingestion of {stored_file_path} stopped: {str(e)}")
+                    checkpoint = db.record_failed_batch(job.content_hash, job.id, e.pages)
+                    if checkpoint is None:
+                        raise IngestionClaimed(f"Lost the claim on {stored_file_path} to another job")
+                    start_page, products_added = checkpoint["pages_done"] + 1, checkpoint["products_added"]
+                    job.failed_pages = checkpoint["failed_pages"]
+
+            logger.info(f"Extracted {products_added} products")
+            # Only a fully ingested catalog counts as a duplicate for later uploads (this also drops the claim)
+            db.add_catalog(stored_file_path, job.content_hash, job.failed_pages)
+            message = f"Processed {products_added} products from {job.file_name}"
+            if job.failed_pages:
+                message += f" ({len(job.failed_pages)} pages could not be read)"
+            return {
+                "message": message,
+                "products_added": products_added,
+                "failed_pages": job.failed_pages,
+                "resumed_from_page": first_page if resumed else None,
+                "batch_stats": dict(processor.stats)
+            }
+        except Exception:
+            # Let a re-upload (or the next startup) resume it now instead of after the lease
+            db.release_ingestion(job.content_hash, job.id)
+            raise
+    finally:
+        db.release_session()
+
+def catalog_storage_path(file_name: str) -> str:
+    """Stored file path of an uploaded catalog (Product.page_reference['file_path'])"""
+    return file_name if STORAGE_TYPE == 'local' else f"pdfs/{file_name}"
+
+def store_catalog(job: IngestionJob, stored_file_path: str):
+    """Copy an uploaded catalog to PDF storage, at stored_file_path (see catalog_storage_path)"""
+    if STORAGE_TYPE == 'local':
+        # Move to local storage
+        final_path = os.path.join(PDF_STORAGE_PATH, stored_file_path)
+        logger.info(f"Moving file to: {final_path}")
+        
+        # Remove existing file if it exists
+        if os.path.exists(final_path):
+            logger.info(f"Removing existing file: {final_path}")
+            os.remove(final_path)
+        
+        # Use shutil.copy2 instead of os.rename
+        shutil.copy2(job.path, final_path)
+        logger.info("File moved successfully")
+        return
+
+    # Cloud storage logic...
+    logger.info("Using cloud storage")
+    blob = bucket.blob(stored_file_path)
+    blob.upload_from_filename(job.path)
+
+def fetch_catalog(stored_file_path: str, temp_path: str):
+    """Copy a stored catalog back to local disk (to resume a job whose upload is gone)"""
+    logger.info(f"Fetching stored catalog {stored_file_path}")
+    if STORAGE_TYPE == 'local':
+        shutil.copy2(os.path.join(PDF_STORAGE_PATH, stored_file_path), temp_path)
+    else:
+        bucket.blob(stored_file_path).download_to_filename(temp_path)
+
+def resume_ingestion_jobs():
+    """Queue a job for every catalog whose ingestion was cut off (e.g. by the last instance stopping)"""
+    for checkpoint in db.get_ingestion_checkpoints():
+        # Claimed by a job still running on another instance
+        if checkpoint["claimed"]:
+            logger.info(f"Not resuming {checkpoint['file_path']}: running elsewhere")
+            continue
+        # Stopped before its first batch: nothing to resume until it's uploaded again
+        if checkpoint["pages_done"] == 0:
+            continue
+        file_name = os.path.basename(checkpoint["file_path"])
+        # The stored PDF is fetched into this path when the job starts
+        temp_path = os.path.join(tempfile.mkdtemp(), file_name)
+        app.state.ingestion_queue.submit(file_name, checkpoint["content_hash"], temp_path)
+        logger.info(f"Queued unfinished ingestion of {checkpoint['file_path']} from page {checkpoint['pages_done'] + 1}")
+
+def discard_upload(job: IngestionJob):
+    """Drop an ingestion job's uploaded PDF from the document pool and the temp directory"""
+    app.state.pricing_service.document_pool.discard(job.path)
+    remove_upload(job.path)
+
+def remove_upload(temp_path: str):
+    """Remove an uploaded PDF and the temp directory it was written to"""
+    try:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        temp_dir = os.path.dirname(temp_path)
+        if os.path.exists(temp_dir):
+            os.rmdir(temp_dir)
+        logger.info("Cleaned up temporary files")
+    except Exception as e:
+        logger.error(f"Error cleaning up temp files: {str(e)}")
 
 @app.post("/import-json")
 async def import_json_data(file: UploadFile = File(...)):
@@ -268,54 +496,117 @@ async def process_boq_text(request: BOQRequest):
     """Process BOQ items and find matches in the database"""
     try:
         logger.info(f"Processing {len(request.items)} BOQ items")
-        results = []
-        
-        for item in request.items:
-            # Find matching products
-            matches = db.find_products(name=item.name, brand=item.brand, type=item.type)
-            
-            if not matches:
-                results.append({
-                    "status": "not_found",
-                    "boqItem": item.model_dump(),
-                    "message": "No matching products found"
-                })
-                continue
-            
-            matches_with_prices = []
-
-            for product in matches:
-                product_dict = product.__dict__
-                
-                # if product in db doesn't have price data, get it
-                if not product.price_data:
-                    # Find next product using sequence number
-                    next_product = db.get_next_product(product)
-                    boq_processor = BoQProcessor(catalog_dir=PDF_STORAGE_PATH)
-                    
-                    # get price data
-                    boq_result = boq_processor.get_price_data(
-                        current_prod=product_dict, 
-                        next_prod=next_product.__dict__ if next_product else None
-                    )
-                    
-                    if boq_result is not None and boq_result["status"] == "found":
-                        db.update_price_data(product.id, boq_result["price_tables"])
-                        product_dict["price_data"] = boq_result["price_tables"]
-                
-                matches_with_prices.append(product_dict)
-            
-            results.append({
-                "status": "found",
-                "boqItem": {"name": item.name, "brand": item.brand, "type": item.type},
-                "matches": matches_with_prices,
-                "selectedMatch": matches_with_prices[0] if matches_with_prices else None
-            })
-
-            logger.info(f"Found {len(matches_with_prices)} matches for item: {item.name}")
+        # gather keeps the results in item order
+        results = await asyncio.gather(*start_boq_items(request.items))
         
+        logger.info(f"Price cache: {app.state.price_cache.stats()}")
         return results
         
     except Exception as e:
         logger.error(f"Error processing BOQ text: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/process-boq-text/stream")
+async def process_boq_text_stream(request: BOQRequest, format: Literal["ndjson", "sse"] = "ndjson"):
+    """
+    Like /process-boq-text, but each item's result is sent as soon as it's resolved (so not in item
+    order), as {"type": "result", "index", "result"} or {"type": "error", "index", "message"}, then
+    {"type": "summary", ...}. format=ndjson sends one JSON object per line, format=sse one event each
+    """
+    logger.info(f"Streaming {len(request.items)} BOQ items as {format}")
+
+    def frame(message: dict) -> str:
+        data = json.dumps(jsonable_encoder(message))
+        return f"event: {message['type']}\ndata: {data}\n\n" if format == "sse" else f"{data}\n"
+
+    async def frames() -> AsyncIterator[str]:
+        started = time.perf_counter()
+        tasks = start_boq_items(request.items)
+        indexes = {task: index for index, task in enumerate(tasks)}
+        counts = {"found": 0, "not_found": 0, "error": 0}
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=indexes.get):
+                    if task.exception() is not None:
+                        logger.error(f"Error processing BOQ item {indexes[task]}: {str(task.exception())}")
+                        counts["error"] += 1
+                        yield frame({"type": "error", "index": indexes[task], "message": str(task.exception())})
+                    else:
+                        counts[task.result()["status"]] += 1
+                        yield frame({"type": "result", "index": indexes[task], "result": task.result()})
+
+            logger.info(f"Price cache: {app.state.price_cache.stats()}")
+            yield frame({
+                "type": "summary",
+                "items": len(tasks),
+                **counts,
+                "seconds": round(time.perf_counter() - started, 3)
+            })
+        finally:
+            # The client went away: don't start items nobody will read
+            for task in pending:
+                task.cancel()
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(frames(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+def start_boq_items(items: List[BOQItem]) -> List[asyncio.Task]:
+    """
+    Start resolving items in the BoQ workers. Items share the app's BOQ_MAX_WORKERS threads, at most
+    BOQ_REQUEST_CONCURRENCY of them per request. Returns one task per item, in item order
+    """
+    loop = asyncio.get_running_loop()
+    request_slots = asyncio.Semaphore(BOQ_REQUEST_CONCURRENCY)
+
+    async def resolve(item: BOQItem):
+        async with request_slots:
+            return await loop.run_in_executor(app.state.boq_executor, resolve_boq_item, item)
+
+    return [asyncio.create_task(resolve(item)) for item in items]
+
+def resolve_boq_item(item: BOQItem) -> dict:
+    """Find the products matching one BoQ item, pricing any that aren't priced yet. Blocking: runs in a BoQ worker"""
+    try:
+        # Find matching products
+        matches = db.find_products(name=item.name, brand=item.brand, type=item.type)
+        
+        if not matches:
+            return {
+                "status": "not_found",
+                "boqItem": item.model_dump(),
+                "message": "No matching products found"
+            }
+        
+        matches_with_prices = []
+
+        for product in matches:
+            product_dict = product.__dict__
+            
+            # if product in db doesn't have price data, get it
+            if not product.price_data:
+                # Find next product using sequence number
+                next_product = db.get_next_product(product)
+                # get price data (stored by the pricing service), or wait for the caller already getting it
+                boq_result = app.state.pricing_service.price_product(
+                    product_id=product.id,
+                    current_prod=product_dict, 
+                    next_prod=next_product.__dict__ if next_product else None
+                )
+                
+                if boq_result is not None and boq_result["status"] == "found":
+                    product_dict["price_data"] = boq_result["price_tables"]
+                    product_dict["failed_price_tables"] = boq_result["failed_tables"]
+            
+            matches_with_prices.append(product_dict)
+
+        logger.info(f"Found {len(matches_with_prices)} matches for item: {item.name}")
+        return {
+            "status": "found",
+            "boqItem": {"name": item.name, "brand": item.brand, "type": item.type},
+            "matches": matches_with_prices,
+            "selectedMatch": matches_with_prices[0] if matches_with_prices else None
+        }
+    finally:
+        db.release_session()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, ARRAY, JSON
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, ARRAY, JSON, Index, UniqueConstraint
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -18,4 +18,68 @@ class Product(Base):
     page_reference = Column(JSONB)  # {file_path: str, page_numbers: int, y_coord: float}
     price_data = Column(JSONB)  # {processed_at: datetime, catalog_version: str, tables: [{page_num: int, bbox: tuple, price_data: list}]}
     sequence_number = Column(Integer, index=True)
-    created_at = Column(DateTime, default=datetime.now)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.now)
+
+
+class TableLayout(Base):
+    """A table found by table detection at upload, so BoQ lookups don't have to detect tables again"""
+    __tablename__ = 'table_layouts'
+
+    id = Column(Integer, primary_key=True)
+    file_path = Column(String, nullable=False)  # same as Product.page_reference['file_path']
+    page_num = Column(Integer, nullable=False)
+    x0 = Column(Float)
+    y0 = Column(Float)
+    x1 = Column(Float)
+    y1 = Column(Float)
+    row_count = Column(Integer)
+    col_count = Column(Integer)
+    header = Column(ARRAY(String))
+    cells = Column(JSONB)  # [[[x0, y0, x1, y1] or null per cell] per row]
+    created_at = Column(DateTime, default=datetime.now)
+
+    # A product's tables are a range query on (page_num, y0) within one file
+    __table_args__ = (Index('ix_table_layouts_file_page_y', 'file_path', 'page_num', 'y0'),)
+
+
+class IndexedPage(Base):
+    """A catalog page whose tables are all in table_layouts (it may have none), at upload or on its first BoQ lookup"""
+    __tablename__ = 'indexed_pages'
+
+    id = Column(Integer, primary_key=True)
+    file_path = Column(String, nullable=False)  # same as TableLayout.file_path
+    page_num = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.now)
+
+    # Also stops two workers indexing the same page at once from storing its tables twice
+    __table_args__ = (UniqueConstraint('file_path', 'page_num', name='uq_indexed_pages_file_page'),)
+
+
+class Catalog(Base):
+    """An ingested catalog PDF, keyed on the SHA-256 of its content so a re-upload is caught under any name"""
+    __tablename__ = 'catalogs'
+
+    id = Column(Integer, primary_key=True)
+    file_path = Column(String, nullable=False)  # same as Product.page_reference['file_path']
+    content_hash = Column(String(64), nullable=False, unique=True, index=True)
+    failed_pages = Column(ARRAY(Integer))  # pages given up after INGESTION_BATCH_ATTEMPTS, so without products
+    created_at = Column(DateTime, default=datetime.now)
+
+
+class IngestionCheckpoint(Base):
+    """
+    How far an unfinished catalog ingestion got, committed with each batch of products (see ingestion.py),
+    and the job that holds it. Created when a job claims a new catalog
+    """
+    __tablename__ = 'ingestion_checkpoints'
+
+    id = Column(Integer, primary_key=True)
+    content_hash = Column(String(64), nullable=False, unique=True, index=True)  # as Catalog.content_hash
+    file_path = Column(String, nullable=False)  # same as Product.page_reference['file_path']
+    pages_done = Column(Integer, nullable=False)  # every page up to this one is stored
+    products_added = Column(Integer, nullable=False)  # highest sequence_number stored so far
+    batch_attempts = Column(Integer, nullable=False, default=0)  # failed tries of the batch after pages_done
+    failed_pages = Column(ARRAY(Integer), nullable=False, default=list)  # batches given up, so skipped
+    claimed_by = Column(String)  # IngestionJob.id of the job ingesting it, if any
+    claimed_until = Column(DateTime)  # the claim's lease, renewed with every batch; free to claim after it
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
@@ -0,0 +1,269 @@
+"""
+Offline pre-pricing: price every product that hasn't been priced yet, ahead of any BoQ asking for it.
+Tables that parse natively (or are in the price cache) are written straight away; the rest are
+submitted to Claude's Message Batches API as each batch fills up, and written back (and cached, like
+lazily priced tables) batch by batch as batches end.
+
+The job is resumable: submitted batch ids and each submitted product's table layout are saved to a
+state file after every batch, so a restarted job polls the same batches and goes on collecting after
+the last submitted product instead of submitting again. Products already priced in the database are
+skipped, so the database itself records how far the write-back got.
+
+Run from the repo root:
+    python -m src.api.prepricing
+"""
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+from ..boq_processor import BoQProcessor
+from ..price_extractor import PriceExtractor
+
+logger = logging.getLogger(__name__)
+
+# Message Batches limits are 100,000 requests or 256 MB per batch; stay a little under the size limit
+MAX_BATCH_REQUESTS = 100_000
+MAX_BATCH_BYTES = 250 * 1024 * 1024
+
+
+def _custom_id(product_id: int, table_index: int) -> str:
+    return f"p{product_id}-t{table_index}"
+
+
+class PrePricingJob:
+    def __init__(self, db, boq_processor: BoQProcessor, price_extractor: PriceExtractor,
+                 state_path: str, poll_interval: float = 60.0,
+                 max_batch_requests: int = MAX_BATCH_REQUESTS, max_batch_bytes: int = MAX_BATCH_BYTES):
+        """
+        Args:
+            db: ProductDB (get_unpriced_products, get_next_product, update_price_data)
+            boq_processor: Finds, parses and renders each product's price tables
+            price_extractor: Builds the Claude requests and parses their output. Its client's
+                `messages.batches` is the batch service (a stub in benchmarks/prepricing_job.py)
+            state_path: JSON file the job's progress is saved to, removed once the job finishes
+            poll_interval: Seconds between batch status checks
+            max_batch_requests: Requests per submitted batch
+            max_batch_bytes: Approximate request payload per submitted batch
+        """
+        self.db = db
+        self.boq_processor = boq_processor
+        self.price_extractor = price_extractor
+        self.batches = price_extractor.client.messages.batches
+        self.state_path = state_path
+        self.poll_interval = poll_interval
+        self.max_batch_requests = max_batch_requests
+        self.max_batch_bytes = max_batch_bytes
+        self.stats = {"products": 0, "priced_without_batch": 0, "priced_from_batch": 0,
+                      "failed": 0, "batches_submitted": 0, "batch_requests": 0}
+
+    def run(self) -> Dict:
+        """Price all unpriced products, resuming a previous run if its state file exists. Returns stats"""
+        state = self._load_state()
+        if state is None:
+            state = {"products": {}, "batches": [], "applied": [], "collected": False}
+        else:
+            logger.info(f"Resuming pre-pricing job with {len(state['batches'])} submitted batches")
+        if not state["collected"]:
+            self._collect(state)
+        self._apply(state)
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+        logger.info(f"Pre-pricing finished: {self.stats}")
+        return self.stats
+
+    def _load_state(self) -> Optional[Dict]:
+        if not os.path.exists(self.state_path):
+            return None
+        with open(self.state_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def _save_state(self, state: Dict):
+        # Write then rename, so a crash mid-write leaves the previous state intact
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+        temp_path = f"{self.state_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(state, file)
+        os.replace(temp_path, self.state_path)
+
+    def _collect(self, state: Dict):
+        """
+        Find every unpriced product's tables. Products needing no Claude call are written now; the
+        requests for the rest are submitted in batches as they fill up, each product's tables in one
+        batch, and the product is recorded in state["products"] when its batch is submitted. Only the
+        batch being filled is held in memory, and a restart picks up after the last submitted product.
+        """
+        chunk, chunk_bytes, chunk_products = [], 0, {}
+        unpriced = [product for product in self.db.get_unpriced_products()
+                    if str(product.id) not in state["products"]]
+        logger.info(f"Collecting price tables for {len(unpriced)} unpriced products")
+        for product in unpriced:
+            self.stats["products"] += 1
+            next_product = self.db.get_next_product(product)
+            tables = self.boq_processor.prepare_price_tables(
+                product.__dict__, next_product.__dict__ if next_product else None
+            )
+            if not tables:
+                logger.warning(f"No price tables found for product {product.product_name}")
+                continue
+
+            entries = []
+            requests = []
+            cache = self.price_extractor.cache
+            for i, table in enumerate(tables):
+                entry = {"page_num": table["page_num"], "bbox": list(table["bbox"]),
+                         "price_data": table["price_data"], "source": "native", "custom_id": None,
+                         "cache_key": None}
+                if entry["price_data"] is None and table["image"] is not None:
+                    entry["source"] = "llm"
+                    entry["price_data"] = cache.get(table["image"]) if cache else None
+                    if entry["price_data"] is None:
+                        entry["custom_id"] = _custom_id(product.id, i)
+                        # The image itself isn't kept: batch results are cached under its hashes
+                        entry["cache_key"] = cache.image_key(table["image"]) if cache else None
+                        requests.append({"custom_id": entry["custom_id"],
+                                         "params": self.price_extractor.request_params(table["image"])})
+                entries.append(entry)
+
+            if not requests:
+                self._write(product.id, entries)
+                self.stats["priced_without_batch"] += 1
+                continue
+            size = sum(len(json.dumps(request)) for request in requests)
+            if chunk and (len(chunk) + len(requests) > self.max_batch_requests
+                          or chunk_bytes + size > self.max_batch_bytes):
+                self._submit_chunk(state, chunk, chunk_products)
+                chunk, chunk_bytes, chunk_products = [], 0, {}
+            chunk.extend(requests)
+            chunk_bytes += size
+            chunk_products[str(product.id)] = entries
+
+        if chunk:
+            self._submit_chunk(state, chunk, chunk_products)
+        state["collected"] = True
+        self._save_state(state)
+
+    def _submit_chunk(self, state: Dict, requests: List[Dict], products: Dict[str, List[Dict]]):
+        """Submit one batch and save state, recording its products as submitted"""
+        batch = self.batches.create(requests=requests)
+        state["batches"].append(batch.id)
+        state["products"].update(products)
+        self._save_state(state)
+        self.stats["batches_submitted"] += 1
+        self.stats["batch_requests"] += len(requests)
+        logger.info(f"Submitted batch {batch.id} with {len(requests)} price tables")
+
+    def _apply(self, state: Dict):
+        """
+        Poll the submitted batches and write each product back once all its tables have a result.
+        Products with a failed, truncated or never-submitted table are left unpriced for lazy pricing.
+        """
+        if not state["batches"]:
+            return
+        # Products written by an earlier run of this job (or priced lazily since) are already done
+        unpriced = {str(product.id) for product in self.db.get_unpriced_products()}
+        pending = {product_id: tables for product_id, tables in state["products"].items() if product_id in unpriced}
+        waiting = {table["custom_id"]: (product_id, table)
+                   for product_id, tables in pending.items() for table in tables
+                   # Tables answered by a batch applied before a restart already have their rows
+                   if table["custom_id"] and table["price_data"] is None}
+        failed = set()
+
+        remaining = [batch_id for batch_id in state["batches"] if batch_id not in state["applied"]]
+        while remaining:
+            ended = [batch_id for batch_id in remaining
+                     if self.batches.retrieve(batch_id).processing_status == "ended"]
+            if not ended:
+                time.sleep(self.poll_interval)
+                continue
+            for batch_id in ended:
+                for entry in self.batches.results(batch_id):
+                    if entry.custom_id not in waiting:
+                        continue
+                    product_id, table = waiting.pop(entry.custom_id)
+                    table["price_data"] = self._parse_result(entry)
+                    if table["price_data"] is None:
+                        failed.add(product_id)
+                        continue
+                    # Cached like the lazy path caches Claude's rows, so BoQ requests for the same table hit
+                    cache = self.price_extractor.cache
+                    if cache and table["cache_key"]:
+                        cache.set_by_key(table["cache_key"], table["price_data"])
+                    if product_id in failed:
+                        continue
+                    if all(t["price_data"] is not None for t in pending[product_id]):
+                        self._write(int(product_id), pending[product_id])
+                        self.stats["priced_from_batch"] += 1
+                remaining.remove(batch_id)
+                state["applied"].append(batch_id)
+                self._save_state(state)
+
+        # Tables missing from their batch's results are left for lazy pricing
+        failed.update(product_id for product_id, _ in waiting.values())
+        self.stats["failed"] += len(failed)
+        if failed:
+            logger.warning(f"{len(failed)} products left unpriced after pre-pricing")
+
+    def _parse_result(self, entry) -> Optional[List[Dict]]:
+        result = entry.result
+        if result.type != "succeeded":
+            logger.error(f"Batch request {entry.custom_id} {result.type}")
+            return None
+        # Batched requests can't be streamed and continued, so a cut-off table is left for lazy pricing
+        if result.message.stop_reason == "max_tokens":
+            logger.warning(f"Batch request {entry.custom_id} hit the output token limit")
+            return None
+        try:
+            price_data = self.price_extractor.parse_output(result.message.content[0].text)
+        except Exception as e:
+            logger.error(f"Error parsing batch result {entry.custom_id}: {str(e)}")
+            return None
+        return price_data or None
+
+    def _write(self, product_id: int, tables: List[Dict]):
+        """Store a product's tables in the shape /process-boq-text stores them"""
+        price_tables = [{"page_num": table["page_num"], "bbox": table["bbox"],
+                         "price_data": table["price_data"], "source": table["source"]}
+                        for table in tables if table["price_data"]]
+        self.db.update_price_data(product_id, price_tables)
+
+
+if __name__ == "__main__":
+    from .config import (
+        PDF_STORAGE_PATH, PRICE_CACHE_PATH, PRICE_CACHE_MAX_MB, PRICE_CACHE_MAX_DISTANCE,
+        NATIVE_TABLE_MIN_CONFIDENCE, TABLE_IMAGE_MAX_PIXELS, TABLE_IMAGE_MAX_EDGE, TABLE_IMAGE_ENCODING,
+        PREPRICING_STATE_PATH, PREPRICING_POLL_SECONDS,
+    )
+    from .database import ProductDB
+    from ..document_pool import DocumentPool
+    from ..price_cache import PriceCache
+    from ..price_extractor import PRICE_CACHE_NAMESPACE
+    from ..result_cache import ResultCache
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    price_cache = PriceCache(
+        ResultCache(PRICE_CACHE_PATH, max_bytes=PRICE_CACHE_MAX_MB * 1024 * 1024),
+        namespace=PRICE_CACHE_NAMESPACE,
+        max_distance=PRICE_CACHE_MAX_DISTANCE
+    )
+    db = ProductDB()
+    job = PrePricingJob(
+        db=db,
+        boq_processor=BoQProcessor(
+            catalog_dir=PDF_STORAGE_PATH,
+            native_min_confidence=NATIVE_TABLE_MIN_CONFIDENCE,
+            image_max_pixels=TABLE_IMAGE_MAX_PIXELS,
+            image_max_edge=TABLE_IMAGE_MAX_EDGE,
+            image_encoding=TABLE_IMAGE_ENCODING,
+            table_index=db,
+            document_pool=DocumentPool()
+        ),
+        price_extractor=PriceExtractor(
+            claude_api_key=os.getenv('ANTHROPIC_API_KEY'),
+            few_shot_examples_dir=os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "few-shot-examples"),
+            cache=price_cache
+        ),
+        state_path=PREPRICING_STATE_PATH,
+        poll_interval=PREPRICING_POLL_SECONDS
+    )
+    print(job.run())
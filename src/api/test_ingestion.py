@@ -0,0 +1,96 @@
+"""
+Checkpointed catalog ingestion against the stub Gemini model and an in-memory checkpoint store: resuming
+after an outage, giving up a batch that keeps failing, and stopping a running job at shutdown.
+
+Run from the repo root:
+    python -m pytest src/api/test_ingestion.py
+"""
+import time
+import pytest
+from src.api.ingestion import IngestionQueue, store_product_batches
+from src.benchmarks.resumable_ingestion import (
+    CONTENT_HASH, OPTIONS, BadPageGeminiModel, FlakyGeminiModel, InMemoryCheckpointDB, run, summary
+)
+from src.benchmarks.stubs import StubGeminiModel, build_large_catalog
+from src.pdf_processor import PDFProcessor
+
+
+@pytest.fixture(scope="module")
+def catalog(tmp_path_factory):
+    return build_large_catalog(3, str(tmp_path_factory.mktemp("catalog") / "large.pdf"))
+
+
+@pytest.fixture(scope="module")
+def uninterrupted(catalog):
+    db, model = InMemoryCheckpointDB(), StubGeminiModel(latency=0.0)
+    run(db, catalog, model, "reference")
+    return db, model.calls
+
+
+def test_restart_resumes_from_the_checkpoint(catalog, uninterrupted):
+    reference, reference_calls = uninterrupted
+    db = InMemoryCheckpointDB()
+    assert run(db, catalog, FlakyGeminiModel(fail_after=4), "first") == -1
+    stored = len(db.products)
+    assert 0 < stored < len(reference.products)
+    assert db.checkpoint["claimed_by"] is None
+
+    resumed = StubGeminiModel(latency=0.0)
+    run(db, catalog, resumed, "restart")
+
+    assert summary(db) == summary(reference)
+    assert len(db.layouts) == len(reference.layouts)
+    # Only the batches after the checkpoint are extracted again
+    assert 0 < resumed.calls < reference_calls
+
+
+def test_a_claimed_catalog_is_not_claimed_twice():
+    db = InMemoryCheckpointDB()
+    assert db.claim_ingestion(CONTENT_HASH, "large.pdf", "held") is not None
+    assert db.claim_ingestion(CONTENT_HASH, "large.pdf", "other") is None
+    db.release_ingestion(CONTENT_HASH, "held")
+    assert db.claim_ingestion(CONTENT_HASH, "large.pdf", "other") is not None
+
+
+def test_a_batch_that_keeps_failing_is_given_up(catalog, uninterrupted):
+    reference, _ = uninterrupted
+    db, model = InMemoryCheckpointDB(), BadPageGeminiModel(bad_page=17)
+
+    run(db, catalog, model, "bad-page", retry=True)
+
+    failed = db.checkpoint["failed_pages"]
+    assert 17 in failed
+    expected = [product["product_name"] for product in reference.products
+                if not set(product["page_reference"]["page_numbers"]) & set(failed)]
+    assert [product["product_name"] for product in db.products] == expected
+    assert [product["sequence_number"] for product in db.products] == list(range(1, len(db.products) + 1))
+
+
+def test_shutdown_stops_a_running_job_after_its_batch(catalog, uninterrupted):
+    reference, _ = uninterrupted
+    db = InMemoryCheckpointDB()
+
+    def ingest(job):
+        checkpoint = db.claim_ingestion(job.content_hash, "large.pdf", job.id)
+        processor = PDFProcessor(catalog, gemini_api_key=None, model=StubGeminiModel(latency=0.05),
+                                 options=OPTIONS, start_page=checkpoint["pages_done"] + 1)
+        try:
+            return {"products_added": store_product_batches(db, processor, job.content_hash, "large.pdf", job.id,
+                                                            products_added=checkpoint["products_added"], job=job)}
+        except Exception:
+            db.release_ingestion(job.content_hash, job.id)
+            raise
+
+    queue = IngestionQueue(ingest, cleanup=lambda job: None)
+    job = queue.submit("large.pdf", CONTENT_HASH, catalog)
+    while not job.products_found:
+        time.sleep(0.01)
+    queue.close(timeout=30)
+
+    assert job.status == "failed" and "resumes from the checkpoint" in job.error
+    assert not any(thread.is_alive() for thread in queue._threads)
+    assert 0 < db.checkpoint["pages_done"] < 30 and db.checkpoint["claimed_by"] is None
+    # Everything committed before the stop counts, and the next run picks up from there
+    assert len(db.products) == db.checkpoint["products_added"]
+    run(db, catalog, StubGeminiModel(latency=0.0), "restart")
+    assert summary(db) == summary(reference)
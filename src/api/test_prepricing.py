@@ -0,0 +1,82 @@
+"""
+Pre-pricing job against the stub batch service, on the sample catalog's products (one per price table)
+with native parsing off, so every table goes through a batch.
+
+Run from the repo root:
+    python -m pytest src/api/test_prepricing.py
+"""
+import os
+import pytest
+from src.api.prepricing import PrePricingJob
+from src.benchmarks.prepricing_job import FEW_SHOT_DIR, Crash, InMemoryProductDB, sample_products
+from src.benchmarks.stubs import SAMPLE_PDF, StubAnthropicClient
+from src.boq_processor import BoQProcessor
+from src.price_cache import PriceCache
+from src.price_extractor import PriceExtractor
+from src.result_cache import ResultCache
+
+
+def make_job(db, client, state_path, cache=None, max_batch_requests=100_000):
+    extractor = PriceExtractor(claude_api_key="test", few_shot_examples_dir=FEW_SHOT_DIR, client=client, cache=cache)
+    processor = BoQProcessor(catalog_dir=os.path.dirname(SAMPLE_PDF), native_min_confidence=None)
+    return PrePricingJob(db, processor, extractor, state_path=state_path, poll_interval=0.0,
+                         max_batch_requests=max_batch_requests)
+
+
+def test_resume_after_a_crash_while_writing_back(tmp_path):
+    products = sample_products()
+    client = StubAnthropicClient(latency=0.0, rows=3, batch_polls=2)
+    state_path = str(tmp_path / "prepricing_job.json")
+    db = InMemoryProductDB(products, crash_after=5)
+    with pytest.raises(Crash):
+        make_job(db, client, state_path).run()
+    assert os.path.exists(state_path)
+
+    db.crash_after = None
+    stats = make_job(db, client, state_path).run()
+
+    assert client.batches_created == 1
+    assert stats["batches_submitted"] == 0 and stats["priced_from_batch"] == len(products) - 1 - 5
+    # The last product's page has no table below it
+    assert [product.id for product in db.get_unpriced_products()] == [len(products)]
+    assert not os.path.exists(state_path)
+
+
+def test_resume_after_a_crash_while_submitting(tmp_path):
+    products = sample_products()
+    client = StubAnthropicClient(latency=0.0, rows=3)
+    create_batch = client.messages.batches.create
+
+    def create_then_crash(requests):
+        if client.batches_created == 2:
+            raise Crash("crashed submitting the third batch")
+        return create_batch(requests=requests)
+
+    client.messages.batches.create = create_then_crash
+    state_path = str(tmp_path / "prepricing_job.json")
+    db = InMemoryProductDB(products)
+    with pytest.raises(Crash):
+        make_job(db, client, state_path, max_batch_requests=4).run()
+    submitted = sum(len(batch["requests"]) for batch in client._batches.values())
+    assert submitted == 8
+
+    client.messages.batches.create = create_batch
+    stats = make_job(db, client, state_path, max_batch_requests=4).run()
+
+    # Products in the two submitted batches aren't collected or submitted again
+    requests = [request["custom_id"] for batch in client._batches.values() for request in batch["requests"]]
+    assert len(requests) == len(set(requests)) == submitted + stats["batch_requests"]
+    assert stats["products"] == len(products) - 8
+    assert [product.id for product in db.get_unpriced_products()] == [len(products)]
+
+
+def test_batch_results_are_cached_under_the_table_image(tmp_path):
+    products = sample_products()
+    client = StubAnthropicClient(latency=0.0, rows=3)
+    cache = PriceCache(ResultCache(str(tmp_path / "prices.sqlite3")), namespace="test")
+    job = make_job(InMemoryProductDB(products), client, str(tmp_path / "prepricing_job.json"), cache=cache)
+    job.run()
+
+    product, next_product = products[0], products[1]
+    table = job.boq_processor.prepare_price_tables(product.__dict__, next_product.__dict__)[0]
+    assert cache.get(table["image"]) == product.price_data[0]["price_data"]
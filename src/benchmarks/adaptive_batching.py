@@ -0,0 +1,44 @@
+"""
+Fixed 2-page batches vs token-budget batches: Gemini request count and wall time, using a stub model
+whose latency grows with prompt size (like a real LLM).
+
+Run from the repo root:
+    python -m src.benchmarks.adaptive_batching --copies 10 --token-budget 3000
+"""
+import argparse
+import os
+import tempfile
+import time
+from ..pdf_processor import ExtractionOptions, PDFProcessor
+from .stubs import StubGeminiModel, build_large_catalog
+
+
+def run(pdf_path: str, token_budget, args):
+    model = StubGeminiModel(latency=args.latency, per_token_latency=args.per_token_latency)
+    options = ExtractionOptions(max_concurrency=args.concurrency, token_budget=token_budget)
+    processor = PDFProcessor(pdf_path, gemini_api_key=None, model=model, options=options)
+    start = time.perf_counter()
+    products = processor.extract_product_info()
+    return model.calls, len(products), time.perf_counter() - start, products
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--copies", type=int, default=10, help="Copies of the 10-page sample catalog")
+    parser.add_argument("--token-budget", type=int, default=3000)
+    parser.add_argument("--latency", type=float, default=0.2, help="Fixed seconds per stub Gemini call")
+    parser.add_argument("--per-token-latency", type=float, default=0.00002, help="Extra seconds per prompt token")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = build_large_catalog(args.copies, os.path.join(tmp, "catalog.pdf"))
+        fixed_calls, fixed_count, fixed_time, fixed = run(pdf_path, None, args)
+        budget_calls, budget_count, budget_time, budget = run(pdf_path, args.token_budget, args)
+
+    def pages(products):
+        return [(p["product_name"], p["page_reference"]["page_numbers"]) for p in products]
+
+    print(f"fixed 2-page:      {fixed_calls} requests, {fixed_count} products, {fixed_time:.2f}s")
+    print(f"budget {args.token_budget} tokens: {budget_calls} requests, {budget_count} products, {budget_time:.2f}s")
+    print(f"same products and page references: {pages(fixed) == pages(budget)}")
@@ -0,0 +1,113 @@
+"""
+Load test: a 100-line BoQ through /process-boq-text while another client polls /debug/price-cache.
+Database lookups and pricing are stand-ins with fixed latency (20ms per query, `--latency` per
+unpriced product), so only the endpoint's scheduling is measured. Reports the BoQ's wall time and
+the other endpoint's latency while it runs, and checks results come back in item order.
+
+Importing the app builds the database engine from api/.env (the driver must be installed), but
+no connection is made: create_all is skipped and the ProductDB is swapped for the stand-in.
+
+Run from the repo root:
+    python -m src.benchmarks.boq_endpoint_load --items 100 --latency 1.0
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest import mock
+import httpx
+from ..price_cache import PriceCache
+from ..result_cache import ResultCache
+
+QUERY_LATENCY = 0.02
+
+
+class SlowProductDB:
+    """The ProductDB methods /process-boq-text uses, one unpriced product per name, with query latency"""
+
+    def find_products(self, name, brand, type):
+        time.sleep(QUERY_LATENCY)
+        return [SimpleNamespace(id=name, product_name=name, brand_name=brand, type_of_product=type,
+                                page_reference={}, sequence_number=1, price_data=None)]
+
+    def get_next_product(self, current_product):
+        time.sleep(QUERY_LATENCY)
+        return None
+
+    def release_session(self):
+        pass
+
+
+class SlowPricingService:
+    """Stands in for PricingService: every product takes `latency` seconds (Claude) to price"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def get_price_data(self, current_prod, next_prod):
+        time.sleep(self.latency)
+        return {"status": "found", "failed_tables": [],
+                "price_tables": [{"price_data": [{"product": current_prod["product_name"]}]}]}
+
+    def price_product(self, product_id, current_prod, next_prod):
+        return self.get_price_data(current_prod, next_prod)
+
+
+async def poll(client, stop: asyncio.Event, latencies):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get("/debug/price-cache")
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0.05)
+
+
+async def run(app, items: int):
+    names = [f"ITEM {i}" for i in range(items)]
+    boq = {"items": [{"name": name, "brand": "Stub", "type": "Tavolo"} for name in names]}
+    latencies = []
+    stop = asyncio.Event()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        poller = asyncio.create_task(poll(client, stop, latencies))
+        started = time.perf_counter()
+        response = await client.post("/process-boq-text", json=boq)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await poller
+
+    results = response.json()
+    assert [result["boqItem"]["name"] for result in results] == names, "results out of order"
+    return elapsed, latencies
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=1.0)
+    args = parser.parse_args()
+
+    with mock.patch("src.api.database.Base.metadata.create_all"):
+        from ..api import main
+        from ..api.config import BOQ_MAX_WORKERS, BOQ_REQUEST_CONCURRENCY
+
+    # ASGITransport doesn't run the lifespan, so set up what it would
+    main.db = SlowProductDB()
+    cache_dir = tempfile.TemporaryDirectory()
+    main.app.state.price_cache = PriceCache(ResultCache(os.path.join(cache_dir.name, "price_tables.sqlite3")))
+    main.app.state.pricing_service = SlowPricingService(args.latency)
+    main.app.state.boq_executor = ThreadPoolExecutor(max_workers=BOQ_MAX_WORKERS, thread_name_prefix="boq")
+
+    elapsed, latencies = asyncio.run(run(main.app, args.items))
+    main.app.state.boq_executor.shutdown()
+    main.app.state.price_cache.cache.close()
+    cache_dir.cleanup()
+
+    serial = args.items * (args.latency + 2 * QUERY_LATENCY)
+    print(f"{args.items}-line BoQ: {elapsed:.2f}s ({serial:.0f}s one item at a time, "
+          f"{BOQ_REQUEST_CONCURRENCY} per request)")
+    print(f"/debug/price-cache during the BoQ: {len(latencies)} requests, "
+          f"median {statistics.median(latencies) * 1000:.1f}ms, max {max(latencies) * 1000:.1f}ms")
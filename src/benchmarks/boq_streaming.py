@@ -0,0 +1,93 @@
+"""
+Time to first result for a BoQ: /process-boq-text (everything at the end) vs /process-boq-text/stream
+in both formats, with the stand-in database and pricing from boq_endpoint_load. The app is served by
+uvicorn on a local port, since httpx's ASGI transport buffers whole responses.
+
+Run from the repo root:
+    python -m src.benchmarks.boq_streaming --items 20 --latency 1.0
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import httpx
+import uvicorn
+from ..price_cache import PriceCache
+from ..result_cache import ResultCache
+from .boq_endpoint_load import SlowPricingService, SlowProductDB
+
+PORT = 8765
+
+
+def boq(items: int):
+    return {"items": [{"name": f"ITEM {i}", "brand": "Stub", "type": "Tavolo"} for i in range(items)]}
+
+
+def time_buffered(client, items: int):
+    started = time.perf_counter()
+    results = client.post("/process-boq-text", json=boq(items)).json()
+    elapsed = time.perf_counter() - started
+    return elapsed, elapsed, len(results)
+
+
+def time_stream(client, items: int, format: str):
+    started = time.perf_counter()
+    first, messages = None, []
+    with client.stream("POST", "/process-boq-text/stream", params={"format": format}, json=boq(items)) as response:
+        for line in response.iter_lines():
+            if format == "sse":
+                if not line.startswith("data: "):
+                    continue
+                line = line[len("data: "):]
+            if not line:
+                continue
+            if first is None:
+                first = time.perf_counter() - started
+            messages.append(json.loads(line))
+    elapsed = time.perf_counter() - started
+
+    summary = messages[-1]
+    assert summary["type"] == "summary" and summary["found"] == items, summary
+    assert sorted(message["index"] for message in messages[:-1]) == list(range(items)), "missing items"
+    return first, elapsed, len(messages) - 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=1.0)
+    args = parser.parse_args()
+
+    with mock.patch("src.api.database.Base.metadata.create_all"):
+        from ..api import main
+        from ..api.config import BOQ_MAX_WORKERS
+
+    # The lifespan is off (it would connect to the database), so set up what it would
+    main.db = SlowProductDB()
+    cache_dir = tempfile.TemporaryDirectory()
+    main.app.state.price_cache = PriceCache(ResultCache(os.path.join(cache_dir.name, "price_tables.sqlite3")))
+    main.app.state.pricing_service = SlowPricingService(args.latency)
+    main.app.state.boq_executor = ThreadPoolExecutor(max_workers=BOQ_MAX_WORKERS, thread_name_prefix="boq")
+    server = uvicorn.Server(uvicorn.Config(main.app, port=PORT, lifespan="off", log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{PORT}", timeout=None) as client:
+            for label, run in [("buffered", lambda: time_buffered(client, args.items)),
+                               ("ndjson  ", lambda: time_stream(client, args.items, "ndjson")),
+                               ("sse     ", lambda: time_stream(client, args.items, "sse"))]:
+                first, elapsed, results = run()
+                print(f"{label}: first result after {first:.2f}s, all {results} after {elapsed:.2f}s")
+    finally:
+        server.should_exit = True
+        thread.join()
+        main.app.state.boq_executor.shutdown()
+        main.app.state.price_cache.cache.close()
+        cache_dir.cleanup()
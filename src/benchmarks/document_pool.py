@@ -0,0 +1,55 @@
+"""
+Document pool: a 200-line BoQ over three catalogs (the sample catalog repeated 1x, 5x and 20x),
+each line opening its catalog and reading one page, as BoQProcessor does per product:
+  1. opening the PDF per line vs borrowing it from the pool
+  2. the same from 8 threads with a pool smaller than the number of catalogs, so documents are
+     evicted while other threads still use them
+
+Run from the repo root:
+    python -m src.benchmarks.document_pool
+"""
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from ..document_pool import FITZ_LOCK, DocumentPool, open_document
+from .stubs import build_large_catalog
+
+LINES = 200
+COPIES = (1, 5, 20)
+
+
+def lookup(path, page_num, pool):
+    with open_document(path, pool) as doc, FITZ_LOCK:
+        return len(doc[page_num % doc.page_count].get_text("dict")["blocks"])
+
+
+def run(lines, pool, workers=1):
+    started = time.perf_counter()
+    if workers == 1:
+        results = [lookup(path, page_num, pool) for path, page_num in lines]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(lambda line: lookup(line[0], line[1], pool), lines))
+    return results, time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as catalog_dir:
+        paths = [build_large_catalog(copies, os.path.join(catalog_dir, f"catalog_{copies}x.pdf")) for copies in COPIES]
+        rng = random.Random(0)
+        lines = [(rng.choice(paths), rng.randrange(200)) for _ in range(LINES)]
+
+        expected, seconds = run(lines, None)
+        print(f"open per line: {seconds * 1000:.0f}ms for {LINES} lines")
+
+        pool = DocumentPool(max_documents=len(paths))
+        results, seconds = run(lines, pool)
+        print(f"pooled:        {seconds * 1000:.0f}ms, {pool.stats()}, same results: {results == expected}")
+        pool.close()
+
+        pool = DocumentPool(max_documents=2)
+        results, seconds = run(lines, pool, workers=8)
+        print(f"8 threads, pool of 2: {seconds * 1000:.0f}ms, {pool.stats()}, same results: {results == expected}")
+        pool.close()
@@ -0,0 +1,56 @@
+"""
+Precision/recall of the local product-heading detector against the hand-checked products in
+src/test_processors.py (pages where a product starts = pages that need an LLM call).
+
+Run from the repo root:
+    python -m src.benchmarks.heading_detector
+"""
+import ast
+import os
+import fitz  # PyMuPDF
+from ..page_layout import extract_page
+from .stubs import SAMPLE_PDF
+
+TEST_PROCESSORS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "test_processors.py")
+
+
+def load_test_processed_products():
+    """The last `test_processed_products = [...]` literal in test_processors.py, without importing it"""
+    with open(TEST_PROCESSORS, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    products = None
+    for node in tree.body:
+        if (isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Name)
+                and node.targets[0].id == "test_processed_products"):
+            products = ast.literal_eval(node.value)
+    return products
+
+
+def precision_recall(predicted: set, actual: set):
+    true_positives = len(predicted & actual)
+    precision = true_positives / len(predicted) if predicted else float("nan")
+    recall = true_positives / len(actual) if actual else float("nan")
+    return precision, recall
+
+
+if __name__ == "__main__":
+    products = load_test_processed_products()
+    heading_pages = {int(p["page_reference"]["page_numbers"][0]) for p in products}
+
+    doc = fitz.open(SAMPLE_PDF)
+    all_pages = set(range(1, doc.page_count + 1))
+    detected = set()
+    for page_num in all_pages:
+        _, span_index = extract_page(doc[page_num - 1])
+        if span_index.has_product_heading:
+            detected.add(page_num)
+        print(f"page {page_num:2}: detected {span_index.headings}, "
+              f"expected {[p['product_name'] for p in products if int(p['page_reference']['page_numbers'][0]) == page_num]}")
+    doc.close()
+
+    precision, recall = precision_recall(detected, heading_pages)
+    print(f"\nheading pages (sent to LLM):   precision {precision:.2f}, recall {recall:.2f}")
+    precision, recall = precision_recall(all_pages - detected, all_pages - heading_pages)
+    print(f"continuation pages (skipped): precision {precision:.2f}, recall {recall:.2f}")
+    print(f"LLM pages saved: {len(all_pages - detected)}/{len(all_pages)}, "
+          f"product pages wrongly skipped: {len(heading_pages - detected)}")
@@ -0,0 +1,86 @@
+"""
+Background ingestion of a large catalog, using a stub model:
+  1. peak memory of saving the upload: read whole (the old /upload) vs chunked with a running SHA-256
+  2. time until /upload can answer (the upload is saved and queued) vs the old in-request extraction,
+     then the job's progress (pages done, products found, ETA) as a client polling it would see it
+
+Run from the repo root:
+    python -m src.benchmarks.ingestion_jobs --copies 50
+"""
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+import tracemalloc
+from ..api.ingestion import IngestionJob, IngestionQueue
+from ..pdf_processor import ExtractionOptions, PDFProcessor
+from .stubs import StubGeminiModel, build_large_catalog
+
+CHUNK_BYTES = 1024 * 1024
+
+
+def save_whole(source, destination: str):
+    with open(destination, "wb") as buffer:
+        buffer.write(source.read())
+
+
+def save_chunked(source, destination: str) -> str:
+    digest = hashlib.sha256()
+    with open(destination, "wb") as buffer:
+        while chunk := source.read(CHUNK_BYTES):
+            digest.update(chunk)
+            buffer.write(chunk)
+    return digest.hexdigest()
+
+
+def peak_bytes(save, pdf_path: str, destination: str) -> int:
+    with open(pdf_path, "rb") as source:
+        tracemalloc.start()
+        save(source, destination)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return peak
+
+
+def ingest(job, latency: float):
+    processor = PDFProcessor(job.path, gemini_api_key=None, model=StubGeminiModel(latency=latency),
+                             options=ExtractionOptions(max_concurrency=4))
+    job.stats = processor.stats
+    for products in processor.iter_product_batches():
+        job.products_found += len(products)
+    return {"products_added": job.products_found}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--copies", type=int, default=50, help="Copies of the 10-page sample catalog")
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub Gemini latency per batch")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = build_large_catalog(args.copies, os.path.join(tmp, "large.pdf"))
+        size = os.path.getsize(pdf_path)
+        whole = peak_bytes(save_whole, pdf_path, os.path.join(tmp, "whole.pdf"))
+        chunked = peak_bytes(save_chunked, pdf_path, os.path.join(tmp, "chunked.pdf"))
+        print(f"saving a {size / 1e6:.1f} MB upload: peak {whole / 1e6:.1f} MB read whole, "
+              f"{chunked / 1e6:.1f} MB chunked")
+
+        start = time.perf_counter()
+        ingest(IngestionJob("large.pdf", "", pdf_path), args.latency)
+        print(f"in-request extraction: response after {time.perf_counter() - start:.2f}s")
+
+        upload_path = os.path.join(tmp, "upload.pdf")
+        start = time.perf_counter()
+        with open(pdf_path, "rb") as source:
+            content_hash = save_chunked(source, upload_path)
+        jobs = IngestionQueue(lambda job: ingest(job, args.latency), cleanup=lambda job: None)
+        job = jobs.submit("large.pdf", content_hash, upload_path)
+        print(f"background job:        response after {time.perf_counter() - start:.2f}s")
+        while job.status in ("queued", "running"):
+            progress = job.progress()
+            print(f"  {progress['status']}: {progress['pages_done']}/{progress['pages_total']} pages, "
+                  f"{progress['products_found']} products, ETA {progress['eta_seconds']}s")
+            time.sleep(1.0)
+        print(f"  {job.status} after {job.progress()['running_seconds']}s: {job.result or job.error}")
+        jobs.close()
@@ -0,0 +1,53 @@
+"""
+Peak memory and time-to-first-products of streaming ingestion on a large catalog, using a stub model.
+
+Run from the repo root:
+    python -m src.benchmarks.ingestion_memory --copies 100
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from ..pdf_processor import ExtractionOptions, PDFProcessor
+from .stubs import StubGeminiModel, build_large_catalog
+
+
+def measure(pdf_path: str, streaming: bool, concurrency: int):
+    processor = PDFProcessor(pdf_path, gemini_api_key=None, model=StubGeminiModel(latency=0.0),
+                             options=ExtractionOptions(max_concurrency=concurrency))
+    tracemalloc.start()
+    start = time.perf_counter()
+    first_batch_at = None
+    products_seen = 0
+    if streaming:
+        # What /upload does: store each batch and drop it
+        for products in processor.iter_product_batches():
+            if first_batch_at is None:
+                first_batch_at = time.perf_counter() - start
+            products_seen += len(products)
+    else:
+        # The old pipeline: every page's text up front (text only, as before streaming), then every product in one list
+        extracted_text = processor._extract_text_from_pdf()
+        products = processor._process_text_batches(extracted_text)
+        first_batch_at = time.perf_counter() - start
+        products_seen = len(products)
+    total = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return products_seen, peak, first_batch_at, total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--copies", type=int, default=100, help="Copies of the 10-page sample catalog")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = build_large_catalog(args.copies, os.path.join(tmp, "large.pdf"))
+        for streaming in (False, True):
+            count, peak, first, total = measure(pdf_path, streaming, args.concurrency)
+            label = "streaming" if streaming else "whole-document"
+            print(f"{label:15} {args.copies * 10} pages, {count} products, peak {peak / 1e6:.1f} MB, "
+                  f"first products after {first:.2f}s, total {total:.2f}s")
@@ -0,0 +1,91 @@
+"""
+Native (cell grid) table parser vs the hand-checked Claude output in dataset/table_*/data.json.
+Each dataset table is matched to the sample catalog table sharing the most cell values with its
+ground truth, then compared row for row. Then checks the confidence can fail: every catalog table
+is parsed again with a broken cell grid (last row dropped, cells shifted right by 30% of their
+width). Also times native parsing against rendering the table image, which is the local part of
+the Claude path before any network time.
+
+Run from the repo root:
+    python -m src.benchmarks.native_table_parser
+"""
+import glob
+import json
+import os
+import time
+from types import SimpleNamespace
+import fitz  # PyMuPDF
+from ..boq_processor import BoQProcessor
+from ..table_parser import parse_table
+from .stubs import SAMPLE_PDF
+
+# NATIVE_TABLE_MIN_CONFIDENCE default
+MIN_CONFIDENCE = 0.95
+DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "dataset")
+
+
+def canonical(rows):
+    return sorted(json.dumps(row, sort_keys=True, ensure_ascii=False) for row in rows)
+
+
+def dropped_last_row(table):
+    return SimpleNamespace(bbox=table.bbox, rows=table.rows[:-1])
+
+
+def shifted(table):
+    def shift(cell):
+        return (cell[0] + 0.3 * (cell[2] - cell[0]), cell[1], cell[2] + 0.3 * (cell[2] - cell[0]), cell[3])
+    rows = [SimpleNamespace(cells=[shift(cell) if cell else None for cell in row.cells]) for row in table.rows]
+    return SimpleNamespace(bbox=table.bbox, rows=rows)
+
+
+if __name__ == "__main__":
+    processor = BoQProcessor(catalog_dir=os.path.dirname(SAMPLE_PDF))
+    doc = fitz.open(SAMPLE_PDF)
+    tables = []
+    broken = {"last row dropped": [], "cells shifted": []}
+    parse_time = render_time = 0.0
+    for page in doc:
+        page_dict = page.get_text("dict")
+        for table in page.find_tables():
+            start = time.perf_counter()
+            rows, confidence = parse_table(page, table, page_dict)
+            parse_time += time.perf_counter() - start
+            start = time.perf_counter()
+            processor._extract_table_image(doc, page.number + 1, table.bbox)
+            render_time += time.perf_counter() - start
+            cells = {cell for row in table.extract() for cell in row if cell}
+            tables.append((page.number + 1, rows, confidence, cells))
+            broken["last row dropped"].append(parse_table(page, dropped_last_row(table), page_dict)[1])
+            broken["cells shifted"].append(parse_table(page, shifted(table), page_dict)[1])
+    doc.close()
+
+    exact_tables = compared = matched_rows = total_rows = 0
+    for path in sorted(glob.glob(os.path.join(DATASET, "table_*", "data.json"))):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data["pdf_name"] != os.path.basename(SAMPLE_PDF):
+            continue
+        values = {value for row in data["ground_truth"] for value in row.values()}
+        page_num, rows, confidence, _ = max(tables, key=lambda t: len(values & t[3]))
+        expected, actual = canonical(data["ground_truth"]), canonical(rows)
+        common = len(set(expected) & set(actual))
+        compared += 1
+        exact_tables += expected == actual
+        matched_rows += common
+        total_rows += len(expected)
+        print(f"{data['table_id']} (page {page_num}): confidence {confidence:.2f}, "
+              f"{common}/{len(expected)} rows match{'' if expected == actual else ' <- differs'}")
+        for row in sorted(set(actual) - set(expected))[:1]:
+            print(f"    native: {row}")
+        for row in sorted(set(expected) - set(actual))[:1]:
+            print(f"    claude: {row}")
+
+    print(f"\ntables exactly matching ground truth: {exact_tables}/{compared}, rows: {matched_rows}/{total_rows}")
+    print(f"confident (>= {MIN_CONFIDENCE}) tables in the catalog: "
+          f"{sum(t[2] >= MIN_CONFIDENCE for t in tables)}/{len(tables)}")
+    for label, scores in broken.items():
+        print(f"with the {label}: {sum(score >= MIN_CONFIDENCE for score in scores)}/{len(scores)} confident, "
+              f"highest {max(scores):.2f}")
+    print(f"native parse: {1000 * parse_time / len(tables):.2f} ms per table, "
+          f"render for Claude: {1000 * render_time / len(tables):.1f} ms per table (plus the API call)")
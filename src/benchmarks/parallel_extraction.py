@@ -0,0 +1,39 @@
+"""
+Page text/layout extraction time, in-process vs a process pool, on the sample catalog duplicated to
+hundreds of pages. No LLM calls are made. The pool is forced on (extraction_min_pages=0), but
+PDFProcessor never starts more processes than there are cores.
+
+Run from the repo root:
+    python -m src.benchmarks.parallel_extraction --copies 50 --workers 4
+"""
+import argparse
+import os
+import tempfile
+import time
+from ..pdf_processor import ExtractionOptions, PDFProcessor
+from .stubs import StubGeminiModel, build_large_catalog
+
+
+def extract(pdf_path: str, workers: int):
+    processor = PDFProcessor(pdf_path, gemini_api_key=None, model=StubGeminiModel(latency=0.0),
+                             options=ExtractionOptions(extraction_workers=workers, extraction_min_pages=0))
+    start = time.perf_counter()
+    pages = list(processor._iter_pages())
+    return pages, time.perf_counter() - start, processor.extraction_workers
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--copies", type=int, default=50, help="Copies of the 10-page sample catalog")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = build_large_catalog(args.copies, os.path.join(tmp, "catalog.pdf"))
+        serial, serial_time, _ = extract(pdf_path, 1)
+        parallel, parallel_time, workers = extract(pdf_path, args.workers)
+
+    print(f"{len(serial)} pages, {os.cpu_count()} cores")
+    print(f"1 process:    {serial_time:.2f}s")
+    print(f"{workers} processes:  {parallel_time:.2f}s ({serial_time / parallel_time:.1f}x)")
+    print(f"same text in same order: {serial == parallel}")
@@ -0,0 +1,99 @@
+"""
+Offline pre-pricing job against the local stub batch service, on a product per price table of the
+sample catalog (held in an in-memory stand-in for ProductDB), with native parsing off so every
+table goes through the batch:
+  1. a run that crashes while writing results back, then a restarted run that resumes it
+  2. the lazy path's cost for the same products: one Claude round trip per table at BoQ time
+
+Run from the repo root:
+    python -m src.benchmarks.prepricing_job
+"""
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+import fitz  # PyMuPDF
+from ..api.prepricing import PrePricingJob
+from ..boq_processor import BoQProcessor
+from ..price_extractor import PriceExtractor
+from .stubs import SAMPLE_PDF, StubAnthropicClient
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+FEW_SHOT_DIR = os.path.join(REPO_ROOT, "few-shot-examples")
+CRASH_AFTER = 5
+
+
+class Crash(Exception):
+    pass
+
+
+class InMemoryProductDB:
+    """The ProductDB methods the job uses, over a list of products"""
+
+    def __init__(self, products, crash_after=None):
+        self.products = products
+        self.crash_after = crash_after
+        self.writes = 0
+
+    def get_unpriced_products(self):
+        return [product for product in self.products if product.price_data is None]
+
+    def get_next_product(self, current_product):
+        return next((product for product in self.products
+                     if product.sequence_number == current_product.sequence_number + 1), None)
+
+    def update_price_data(self, product_id, price_data):
+        if self.crash_after is not None and self.writes >= self.crash_after:
+            raise Crash(f"crashed after {self.writes} writes")
+        self.writes += 1
+        next(product for product in self.products if product.id == product_id).price_data = price_data
+
+
+def sample_products():
+    """One product just above each price table in the sample catalog"""
+    doc = fitz.open(SAMPLE_PDF)
+    try:
+        products = []
+        for page in doc:
+            for table in page.find_tables():
+                products.append(SimpleNamespace(
+                    id=len(products) + 1,
+                    product_name=f"Product {len(products) + 1}",
+                    page_reference={"file_path": os.path.basename(SAMPLE_PDF),
+                                    "page_numbers": [page.number + 1], "y_coord": table.bbox[1] - 1},
+                    price_data=None,
+                    sequence_number=len(products) + 1
+                ))
+        return products
+    finally:
+        doc.close()
+
+
+def make_job(db, client, state_path):
+    extractor = PriceExtractor(claude_api_key="benchmark", few_shot_examples_dir=FEW_SHOT_DIR, client=client)
+    processor = BoQProcessor(catalog_dir=os.path.dirname(SAMPLE_PDF), native_min_confidence=None)
+    return PrePricingJob(db, processor, extractor, state_path=state_path, poll_interval=0.0)
+
+
+if __name__ == "__main__":
+    products = sample_products()
+    client = StubAnthropicClient(latency=0.0, rows=3, batch_polls=3)
+    with tempfile.TemporaryDirectory() as state_dir:
+        state_path = os.path.join(state_dir, "prepricing_job.json")
+        db = InMemoryProductDB(products, crash_after=CRASH_AFTER)
+        try:
+            make_job(db, client, state_path).run()
+        except Crash as e:
+            priced = len(products) - len(db.get_unpriced_products())
+            print(f"first run: {e}, {priced}/{len(products)} products priced, "
+                  f"state saved: {os.path.exists(state_path)}")
+
+        db.crash_after = None
+        started = time.perf_counter()
+        stats = make_job(db, client, state_path).run()
+        print(f"resumed run: {stats} in {time.perf_counter() - started:.2f}s")
+        print(f"batches created across both runs: {client.batches_created}, "
+              f"unpriced products left: {len(db.get_unpriced_products())}, state removed: {not os.path.exists(state_path)}")
+
+    batched = sum(1 for product in products if product.price_data and any(table["source"] == "llm" for table in product.price_data))
+    print(f"lazy pricing would have made {batched} BoQ requests wait on Claude; pre-pricing made none")
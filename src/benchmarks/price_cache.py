@@ -0,0 +1,60 @@
+"""
+Price cache on the sample catalog's tables:
+  1. pricing every table, then pricing them again as after a re-upload (Claude calls and hit rate)
+  2. how far apart dHashes are for different tables vs the same table rendered with a slightly
+     shifted clip, which is what perceptual matching would have to tell apart
+
+Run from the repo root:
+    python -m src.benchmarks.price_cache
+"""
+import itertools
+import os
+import tempfile
+import fitz  # PyMuPDF
+from ..boq_processor import BoQProcessor
+from ..price_cache import PriceCache, difference_hash, hamming_distance
+from ..price_extractor import PRICE_CACHE_NAMESPACE, PriceExtractor
+from ..result_cache import ResultCache
+from .stubs import SAMPLE_PDF, StubAnthropicClient
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+FEW_SHOT_DIR = os.path.join(REPO_ROOT, "few-shot-examples")
+SHIFT = 0.3  # points
+
+
+def render_tables(shift: float = 0.0):
+    processor = BoQProcessor(catalog_dir=os.path.dirname(SAMPLE_PDF))
+    doc = fitz.open(SAMPLE_PDF)
+    try:
+        images = []
+        for page in doc:
+            for table in page.find_tables():
+                x0, y0, x1, y1 = table.bbox
+                images.append(processor._extract_table_image(
+                    doc, page.number + 1, (x0 + shift, y0 + shift, x1 + shift, y1 + shift)
+                ))
+        return images
+    finally:
+        doc.close()
+
+
+if __name__ == "__main__":
+    images = render_tables()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = PriceCache(ResultCache(os.path.join(cache_dir, "prices.sqlite3")), namespace=PRICE_CACHE_NAMESPACE)
+        client = StubAnthropicClient(latency=0.0)
+        extractor = PriceExtractor(claude_api_key="benchmark", few_shot_examples_dir=FEW_SHOT_DIR,
+                                   client=client, cache=cache)
+        for label in ("first upload", "re-upload"):
+            before = client.calls
+            extractor.extract_prices_many(images)
+            print(f"{label}: {len(images)} tables, {client.calls - before} Claude calls")
+        print(f"cache: {cache.stats()}")
+        cache.cache.close()
+
+    hashes = [difference_hash(image) for image in images]
+    shifted = [difference_hash(image) for image in render_tables(SHIFT)]
+    different = sorted(hamming_distance(a, b) for a, b in itertools.combinations(hashes, 2))
+    same = sorted(hamming_distance(a, b) for a, b in zip(hashes, shifted))
+    print(f"dHash distance, different tables: min {different[0]}, 10 closest {different[:10]}")
+    print(f"dHash distance, same table shifted {SHIFT}pt: max {same[-1]}, all {same}")
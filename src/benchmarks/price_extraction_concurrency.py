@@ -0,0 +1,54 @@
+"""
+Wall time to price one product's tables: sequential extract_prices calls vs extract_prices_many,
+against a stub Claude client with fixed latency, including a retried 429.
+
+Run from the repo root:
+    python -m src.benchmarks.price_extraction_concurrency --tables 6 --latency 1.0
+"""
+import argparse
+import os
+import time
+import anthropic
+import httpx
+from ..price_extractor import PriceExtractor
+from .stubs import StubAnthropicClient
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+FEW_SHOT_DIR = os.path.join(REPO_ROOT, "few-shot-examples")
+TABLE_IMAGE = os.path.join(REPO_ROOT, "dataset", "table_004", "image.png")
+
+
+def rate_limit_error() -> anthropic.RateLimitError:
+    request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+    return anthropic.RateLimitError("rate limited", response=httpx.Response(429, request=request), body=None)
+
+
+def run(tables: int, latency: float, max_concurrency: int, failures=None):
+    client = StubAnthropicClient(latency=latency, failures=failures)
+    extractor = PriceExtractor(
+        claude_api_key="benchmark", few_shot_examples_dir=FEW_SHOT_DIR, client=client,
+        max_concurrency=max_concurrency, requests_per_minute=600, output_tokens_per_minute=100_000
+    )
+    start = time.perf_counter()
+    if max_concurrency == 1:
+        results = [extractor.extract_prices(TABLE_IMAGE) for _ in range(tables)]
+    else:
+        results = [r["price_data"] for r in extractor.extract_prices_many([TABLE_IMAGE] * tables)]
+    return time.perf_counter() - start, results, client.calls
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tables", type=int, default=6)
+    parser.add_argument("--latency", type=float, default=1.0)
+    args = parser.parse_args()
+
+    serial, serial_results, _ = run(args.tables, args.latency, 1)
+    print(f"sequential:          {serial:.2f}s")
+    parallel, parallel_results, _ = run(args.tables, args.latency, args.tables)
+    print(f"extract_prices_many: {parallel:.2f}s ({serial / parallel:.1f}x faster)")
+    assert parallel_results == serial_results, "results differ"
+
+    retried, retried_results, calls = run(args.tables, args.latency, args.tables, failures=[rate_limit_error()])
+    print(f"with one 429:        {retried:.2f}s ({calls} calls, "
+          f"{sum(r is not None for r in retried_results)}/{args.tables} tables priced)")
@@ -0,0 +1,54 @@
+"""
+Per-call prompt build time in PriceExtractor: re-encoding the few-shot PNGs from disk on every call
+(the old _build_prompt) vs the precomputed prefix.
+
+Run from the repo root:
+    python -m src.benchmarks.price_prompt_build --calls 200
+"""
+import argparse
+import os
+import time
+from ..price_extractor import PriceExtractor
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+FEW_SHOT_DIR = os.path.join(REPO_ROOT, "few-shot-examples")
+TABLE_IMAGE = os.path.join(REPO_ROOT, "dataset", "table_004", "image.png")
+
+
+def build_prompt_from_disk(extractor: PriceExtractor, prompt_image: str):
+    """What _build_prompt used to do: read and base64-encode all four images on every call"""
+    return [{
+        "role": "user",
+        "content": [
+            extractor._image_block(prompt_image),
+            {"type": "text", "text": extractor.prompt_text},
+            extractor._image_block(extractor.few_shot_examples[0]["image_path"]),
+            {"type": "text", "text": extractor.prompt_text2},
+            extractor._image_block(extractor.few_shot_examples[1]["image_path"]),
+            {"type": "text", "text": extractor.prompt_text3},
+            extractor._image_block(extractor.few_shot_examples[2]["image_path"]),
+            {"type": "text", "text": extractor.prompt_text4},
+        ],
+    }, {"role": "assistant", "content": "["}]
+
+
+def time_per_call(build, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        build()
+    return (time.perf_counter() - start) / calls
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    extractor = PriceExtractor(claude_api_key="benchmark", few_shot_examples_dir=FEW_SHOT_DIR)
+    print(f"startup (prefix encoded once): {1000 * (time.perf_counter() - start):.2f} ms")
+
+    before = time_per_call(lambda: build_prompt_from_disk(extractor, TABLE_IMAGE), args.calls)
+    after = time_per_call(lambda: extractor._build_prompt(TABLE_IMAGE), args.calls)
+    print(f"before: {1000 * before:.3f} ms per call")
+    print(f"after:  {1000 * after:.3f} ms per call ({before / after:.1f}x faster)")
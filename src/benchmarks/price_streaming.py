@@ -0,0 +1,59 @@
+"""
+Streaming price extraction against a stub Claude client that emits a large table slowly:
+time to first row vs the blocking call, and recovery when the output is cut off at the token limit.
+
+Run from the repo root:
+    python -m src.benchmarks.price_streaming --rows 60
+"""
+import argparse
+import os
+import time
+from ..price_extractor import PriceExtractor
+from .stubs import StubAnthropicClient
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+FEW_SHOT_DIR = os.path.join(REPO_ROOT, "few-shot-examples")
+TABLE_IMAGE = os.path.join(REPO_ROOT, "dataset", "table_004", "image.png")
+
+
+def extractor(client: StubAnthropicClient, stream: bool) -> PriceExtractor:
+    return PriceExtractor(claude_api_key="benchmark", few_shot_examples_dir=FEW_SHOT_DIR,
+                          client=client, stream=stream)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=60)
+    parser.add_argument("--chunk-latency", type=float, default=0.01)
+    args = parser.parse_args()
+
+    latency = 0.5
+    output_chars = len(StubAnthropicClient(rows=args.rows)._output([{"role": "user"}]))
+
+    def client(**kwargs):
+        return StubAnthropicClient(rows=args.rows, chunk_latency=args.chunk_latency, **kwargs)
+
+    # The blocking call takes as long as the stub takes to stream the whole table
+    start = time.perf_counter()
+    blocking_latency = latency + args.chunk_latency * output_chars / 16
+    blocking = extractor(client(latency=blocking_latency), stream=False).extract_prices(TABLE_IMAGE)
+    print(f"blocking:  {len(blocking)} rows, all after {time.perf_counter() - start:.2f}s")
+
+    streaming = extractor(client(latency=latency), stream=True)
+    start = time.perf_counter()
+    rows = []
+    for row in streaming.extract_prices_stream(TABLE_IMAGE):
+        if not rows:
+            first = time.perf_counter() - start
+        rows.append(row)
+    print(f"streaming: {len(rows)} rows, first after {first:.2f}s, all after {time.perf_counter() - start:.2f}s")
+    assert rows == blocking, "streamed rows differ"
+
+    # Cut every response off a third of the way through the table
+    truncated = extractor(client(latency=latency, max_output_chars=output_chars // 3), stream=False)
+    print(f"blocking, truncated:  {truncated.extract_prices(TABLE_IMAGE)}")
+    truncating = client(latency=latency, max_output_chars=output_chars // 3)
+    recovering = extractor(truncating, stream=True)
+    recovered = list(recovering.extract_prices_stream(TABLE_IMAGE))
+    print(f"streaming, truncated: {len(recovered)} rows in {truncating.calls} requests, stats {recovering.stats}")
+    assert recovered == blocking, "recovered rows differ"
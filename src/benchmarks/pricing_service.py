@@ -0,0 +1,74 @@
+"""
+Per-item pricing overhead in /process-boq-text, on products from the sample catalog whose tables
+go to (stub) Claude:
+  before: a BoQProcessor per item, which per call loads the .env, builds a PriceExtractor
+          (few-shot examples, a new Anthropic client and HTTP connection pool) and reopens the PDF
+  after:  one PricingService for the app, reused for every item
+Setup cost is measured on its own (with a real Anthropic client, no requests sent), then end to end
+per item with the stub client. Connection reuse (no new TLS handshake per item) comes on top and
+needs the real API to measure.
+
+Run from the repo root:
+    python -m src.benchmarks.pricing_service
+"""
+import os
+import statistics
+import time
+from unittest import mock
+from ..boq_processor import BoQProcessor
+from ..pricing_service import PricingService
+from .prepricing_job import sample_products
+from .stubs import SAMPLE_PDF, StubAnthropicClient
+
+ITEMS = 20
+CATALOG_DIR = os.path.dirname(SAMPLE_PDF)
+
+
+def setup_seconds():
+    """Per-item construction in the old endpoint (BoQProcessor + what _process_price_tables built)"""
+    os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+    times = []
+    for _ in range(ITEMS):
+        started = time.perf_counter()
+        processor = BoQProcessor(catalog_dir=CATALOG_DIR)
+        extractor = processor._build_price_extractor()
+        times.append(time.perf_counter() - started)
+        extractor.client.close()
+    return times
+
+
+def item_seconds(price):
+    products = sample_products()
+    pairs = list(zip(products, products[1:]))[:ITEMS]
+    times = []
+    for product, next_product in pairs:
+        started = time.perf_counter()
+        price(vars(product), vars(next_product))
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def report(label, times):
+    print(f"{label}: median {statistics.median(times) * 1000:.1f}ms, mean {statistics.mean(times) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    report("setup per item, before", setup_seconds())
+    started = time.perf_counter()
+    PricingService(catalog_dir=CATALOG_DIR, claude_api_key="benchmark").close()
+    # Built once in the lifespan, so each item pays a share of it
+    report("setup per item, after ", [(time.perf_counter() - started) / ITEMS])
+
+    client = StubAnthropicClient(latency=0.0)
+
+    def price_before(product, next_product):
+        processor = BoQProcessor(catalog_dir=CATALOG_DIR)
+        # The old path builds its own client; hand it the stub so no request leaves the machine
+        with mock.patch("src.price_extractor.Anthropic", return_value=client):
+            return processor.get_price_data(product, next_product)
+
+    service = PricingService(catalog_dir=CATALOG_DIR, claude_api_key="benchmark", client=client)
+    report("end to end per item, before", item_seconds(price_before))
+    report("end to end per item, after ", item_seconds(service.get_price_data))
+    print(f"service: {service.stats()['document_pool']}")
+    service.close()
@@ -0,0 +1,57 @@
+"""
+Wall time to price one product with many tables (every table in the sample catalog), rendering and
+pricing its tables one at a time vs in BoQProcessor's per-product pool, against a stub Claude client.
+Tables are rendered one at a time in the calling thread under FITZ_LOCK and only their Claude calls
+(and PNG encoding) run in the pool: with --latency 0 it is no faster. Checks the tables come back in the same page/bbox order, and that a
+failed table is reported rather than dropped.
+
+Run from the repo root:
+    python -m src.benchmarks.product_table_concurrency --workers 4 --latency 1.0
+"""
+import argparse
+import os
+import time
+from ..boq_processor import BoQProcessor
+from ..price_extractor import PriceExtractor
+from .prepricing_job import sample_products
+from .stubs import SAMPLE_PDF, StubAnthropicClient
+
+FEW_SHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "few-shot-examples")
+
+
+def run(workers: int, latency: float, failures=None):
+    client = StubAnthropicClient(latency=latency, failures=failures)
+    extractor = PriceExtractor(claude_api_key="benchmark", few_shot_examples_dir=FEW_SHOT_DIR, client=client)
+    processor = BoQProcessor(
+        catalog_dir=os.path.dirname(SAMPLE_PDF), max_concurrency=workers, price_extractor=extractor
+    )
+    # No next product, so the first product's range runs to the end of the catalog
+    product = vars(sample_products()[0])
+    start = time.perf_counter()
+    result = processor.get_price_data(product, None)
+    return time.perf_counter() - start, result
+
+
+def layout(tables):
+    return [(table["page_num"], tuple(table["bbox"])) for table in tables]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=1.0)
+    args = parser.parse_args()
+
+    serial, serial_result = run(1, args.latency)
+    print(f"one table at a time: {serial:.2f}s ({len(serial_result['price_tables'])} tables)")
+    parallel, parallel_result = run(args.workers, args.latency)
+    print(f"{args.workers} workers:           {parallel:.2f}s ({serial / parallel:.1f}x faster)")
+    assert parallel_result == serial_result, "results differ"
+
+    _, failed_result = run(args.workers, args.latency, failures=[ValueError("unreadable table")])
+    failed = failed_result["failed_tables"]
+    print(f"with one failure:    {len(failed_result['price_tables'])} priced, {len(failed)} failed ({failed[0]['error']})")
+    order = layout(serial_result["price_tables"])
+    assert sorted(layout(failed_result["price_tables"] + failed)) == sorted(order), "a table went missing"
+    positions = [order.index(table) for table in layout(failed_result["price_tables"])]
+    assert positions == sorted(positions), "priced tables out of order"
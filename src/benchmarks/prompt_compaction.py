@@ -0,0 +1,26 @@
+"""
+Estimated prompt tokens with and without compaction for a catalog (no LLM calls).
+
+Run from the repo root:
+    python -m src.benchmarks.prompt_compaction [path/to/catalog.pdf]
+"""
+import sys
+from ..page_layout import estimate_tokens
+from ..text_compaction import compact_text, find_boilerplate_lines
+from .stubs import SAMPLE_PDF
+import fitz  # PyMuPDF
+
+if __name__ == "__main__":
+    pdf_path = sys.argv[1] if len(sys.argv) > 1 else SAMPLE_PDF
+    boilerplate = find_boilerplate_lines(pdf_path)
+    print(f"boilerplate lines: {sorted(boilerplate)}")
+
+    raw_tokens = compact_tokens = 0
+    doc = fitz.open(pdf_path)
+    for page in doc:
+        text = page.get_text()
+        raw_tokens += estimate_tokens(text)
+        compact_tokens += estimate_tokens(compact_text(text, boilerplate))
+    print(f"{doc.page_count} pages: {raw_tokens} -> {compact_tokens} estimated tokens "
+          f"({raw_tokens - compact_tokens} saved, {100 * (raw_tokens - compact_tokens) / raw_tokens:.1f}%)")
+    doc.close()
@@ -0,0 +1,151 @@
+"""
+Checkpointed ingestion of a large catalog with a stub model that stops answering part way through
+(as if Gemini kept failing or the instance went away), then a restarted run from the checkpoint.
+Counts Gemini calls against a fresh run and checks the stored products, sequence numbers included,
+match an uninterrupted run. Then a catalog with one page Gemini never answers: its batch is retried
+ATTEMPTS times, given up as failed pages, and the rest of the catalog is stored.
+
+Run from the repo root:
+    python -m src.benchmarks.resumable_ingestion --copies 10 --fail-after 12 --bad-page 37
+"""
+import argparse
+import os
+import tempfile
+from ..api.ingestion import store_product_batches
+from ..pdf_processor import BatchExtractionError, ExtractionOptions, PDFProcessor
+from .stubs import StubGeminiModel, build_large_catalog
+
+CONTENT_HASH = "benchmark"
+# Tries a batch gets before its pages are given up (INGESTION_BATCH_ATTEMPTS)
+ATTEMPTS = 3
+# As the API ingests: tables indexed, and a failed batch stops the run so it can be retried
+OPTIONS = ExtractionOptions(max_concurrency=4, index_tables=True, raise_on_batch_errors=True)
+
+
+class FlakyGeminiModel(StubGeminiModel):
+    """StubGeminiModel that raises (not retryably) on every call after the first `fail_after`"""
+
+    def __init__(self, fail_after: int):
+        super().__init__(latency=0.0)
+        self.fail_after = fail_after
+
+    def generate_content(self, prompt: str, generation_config=None):
+        if self.fail_after is not None and self.calls >= self.fail_after:
+            raise ValueError("Gemini unavailable")
+        return super().generate_content(prompt, generation_config)
+
+
+class BadPageGeminiModel(StubGeminiModel):
+    """StubGeminiModel that raises (not retryably) on every batch including `bad_page`"""
+
+    def __init__(self, bad_page: int):
+        super().__init__(latency=0.0)
+        self.bad_page = bad_page
+
+    def generate_content(self, prompt: str, generation_config=None):
+        if f"TEXT FROM PAGE {self.bad_page}:" in prompt:
+            with self._lock:
+                self.calls += 1
+            raise ValueError("Gemini can't answer this batch")
+        return super().generate_content(prompt, generation_config)
+
+
+class InMemoryCheckpointDB:
+    """The ProductDB methods checkpointed ingestion uses, over lists (claims don't expire)"""
+
+    def __init__(self):
+        self.products = []
+        self.layouts = []
+        self.checkpoint = None
+
+    def claim_ingestion(self, content_hash, file_path, claimed_by):
+        if self.checkpoint is None:
+            self.checkpoint = {"file_path": file_path, "pages_done": 0, "products_added": 0, "failed_pages": [],
+                               "batch_attempts": 0, "claimed_by": None}
+        if self.checkpoint["claimed_by"] not in (None, claimed_by):
+            return None
+        self.checkpoint["claimed_by"] = claimed_by
+        return self.checkpoint
+
+    def release_ingestion(self, content_hash, claimed_by):
+        if self.checkpoint["claimed_by"] == claimed_by:
+            self.checkpoint["claimed_by"] = None
+
+    def add_products_checkpointed(self, products, layouts, content_hash, file_path, pages_done, products_added,
+                                  claimed_by, indexed_pages=None, continued_product=None):
+        if self.checkpoint["claimed_by"] != claimed_by:
+            return False
+        self.products.extend(products)
+        self.layouts.extend(layouts)
+        self.checkpoint.update(pages_done=pages_done, products_added=products_added, batch_attempts=0)
+        return True
+
+    def record_failed_batch(self, content_hash, claimed_by, pages):
+        if self.checkpoint["claimed_by"] != claimed_by:
+            return None
+        self.checkpoint["batch_attempts"] += 1
+        if self.checkpoint["batch_attempts"] >= ATTEMPTS:
+            self.checkpoint.update(failed_pages=self.checkpoint["failed_pages"] + pages, pages_done=max(pages),
+                                   batch_attempts=0)
+        return self.checkpoint
+
+
+def run(db, pdf_path: str, model, job_id: str, retry: bool = False) -> int:
+    """One ingestion job, as main.ingest_catalog. Without retry it stops at the first failed batch"""
+    checkpoint = db.claim_ingestion(CONTENT_HASH, "large.pdf", job_id)
+    start_page, products_added = checkpoint["pages_done"] + 1, checkpoint["products_added"]
+    while True:
+        processor = PDFProcessor(pdf_path, gemini_api_key=None, model=model, options=OPTIONS, start_page=start_page)
+        try:
+            return store_product_batches(db, processor, CONTENT_HASH, "large.pdf", job_id, products_added=products_added)
+        except BatchExtractionError as e:
+            if not retry:
+                print(f"  run stopped: {e}; checkpoint {db.checkpoint}")
+                db.release_ingestion(CONTENT_HASH, job_id)
+                return -1
+            checkpoint = db.record_failed_batch(CONTENT_HASH, job_id, e.pages)
+            start_page, products_added = checkpoint["pages_done"] + 1, checkpoint["products_added"]
+
+
+def summary(db):
+    return [(product["product_name"], product["sequence_number"]) for product in db.products]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--copies", type=int, default=10, help="Copies of the 10-page sample catalog")
+    parser.add_argument("--fail-after", type=int, default=12, help="Gemini calls answered before the outage")
+    parser.add_argument("--bad-page", type=int, default=37, help="Page whose batch Gemini never answers")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = build_large_catalog(args.copies, os.path.join(tmp, "large.pdf"))
+
+        reference, model = InMemoryCheckpointDB(), StubGeminiModel(latency=0.0)
+        run(reference, pdf_path, model, "reference")
+        print(f"uninterrupted: {len(reference.products)} products, {model.calls} Gemini calls")
+
+        db, flaky = InMemoryCheckpointDB(), FlakyGeminiModel(args.fail_after)
+        run(db, pdf_path, flaky, "first")
+        stored_before = len(db.products)
+        # While a job holds the catalog another can't claim it (and is skipped); a stopped job's claim is released
+        db.claim_ingestion(CONTENT_HASH, "large.pdf", "held")
+        assert db.claim_ingestion(CONTENT_HASH, "large.pdf", "other") is None, "claimed catalog claimed twice"
+        db.release_ingestion(CONTENT_HASH, "held")
+        resumed = StubGeminiModel(latency=0.0)
+        run(db, pdf_path, resumed, "restart")
+        print(f"interrupted:   {stored_before} products stored before the outage with {flaky.fail_after} "
+              f"answered calls; the restart made {resumed.calls} more calls for {len(db.products) - stored_before}")
+        assert summary(db) == summary(reference), "resumed products differ from an uninterrupted run"
+        assert len(db.layouts) == len(reference.layouts), "table layouts lost or duplicated"
+
+        db, bad = InMemoryCheckpointDB(), BadPageGeminiModel(args.bad_page)
+        run(db, pdf_path, bad, "bad-page", retry=True)
+        failed = db.checkpoint["failed_pages"]
+        expected = [product["product_name"] for product in reference.products
+                    if not set(product["page_reference"]["page_numbers"]) & set(failed)]
+        print(f"bad page {args.bad_page}: pages {failed} given up after {ATTEMPTS} tries, "
+              f"{len(db.products)} of {len(reference.products)} products stored, {bad.calls} Gemini calls")
+        assert args.bad_page in failed, "bad page not recorded as failed"
+        assert [product["product_name"] for product in db.products] == expected, "products after the bad batch lost"
+        assert [product["sequence_number"] for product in db.products] == list(range(1, len(db.products) + 1))
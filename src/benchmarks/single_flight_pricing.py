@@ -0,0 +1,85 @@
+"""
+Claude calls when 8 callers price the same unpriced product at once (the sample catalog's first
+product, whose range runs to the end of the catalog), against a stub Claude client:
+  1. one process: 8 threads on one PricingService
+  2. two processes: 4 threads on each of two PricingServices sharing a price store, whose
+     price_lock stands in for the Postgres advisory lock
+Without coordination every caller pays for every table.
+
+Run from the repo root:
+    python -m src.benchmarks.single_flight_pricing
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from ..pricing_service import PricingService
+from .prepricing_job import sample_products
+from .stubs import SAMPLE_PDF, StubAnthropicClient
+
+CALLERS = 8
+CATALOG_DIR = os.path.dirname(SAMPLE_PDF)
+
+
+class InMemoryPriceStore:
+    """ProductDB's price_lock / get_stored_price_data / update_price_data, with a per-product lock"""
+
+    def __init__(self):
+        self.price_data = {}
+        self.writes = 0
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    @contextmanager
+    def price_lock(self, product_id):
+        with self._guard:
+            lock = self._locks.setdefault(product_id, threading.Lock())
+        with lock:
+            yield
+
+    def get_stored_price_data(self, product_id):
+        return self.price_data.get(product_id)
+
+    def update_price_data(self, product_id, price_data):
+        self.writes += 1
+        self.price_data[product_id] = price_data
+
+
+def run(services, coordinated: bool):
+    product = vars(sample_products()[0])
+
+    def price(index: int):
+        service = services[index % len(services)]
+        if coordinated:
+            return service.price_product(product["id"], product, None)
+        return service.get_price_data(product, None)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CALLERS) as executor:
+        results = list(executor.map(price, range(CALLERS)))
+    elapsed = time.perf_counter() - start
+    assert all(result["price_tables"] == results[0]["price_tables"] for result in results), "results differ"
+    return elapsed, len(results[0]["price_tables"])
+
+
+def make_service(client, store=None):
+    return PricingService(catalog_dir=CATALOG_DIR, claude_api_key="benchmark", client=client,
+                          max_concurrency=4, price_store=store)
+
+
+if __name__ == "__main__":
+    client = StubAnthropicClient(latency=0.5)
+    elapsed, tables = run([make_service(client)], coordinated=False)
+    print(f"uncoordinated: {client.calls} Claude calls for {tables} tables, {elapsed:.2f}s")
+
+    client = StubAnthropicClient(latency=0.5)
+    service = make_service(client)
+    elapsed, _ = run([service], coordinated=True)
+    print(f"one process:   {client.calls} Claude calls, {elapsed:.2f}s, {service.in_flight.stats()}")
+
+    client = StubAnthropicClient(latency=0.5)
+    store = InMemoryPriceStore()
+    services = [make_service(client, store), make_service(client, store)]
+    elapsed, _ = run(services, coordinated=True)
+    print(f"two processes: {client.calls} Claude calls, {elapsed:.2f}s, {store.writes} write(s)")
@@ -0,0 +1,161 @@
+"""Offline stand-ins for the LLM clients, so benchmarks can run without API keys"""
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+import fitz  # PyMuPDF
+
+SAMPLE_PDF = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "pdfs",
+    "Cattelan Italia ITALIA 08.01.21-pages-2-11.pdf"
+)
+
+
+
+def build_large_catalog(copies: int, output_path: str) -> str:
+    """Write the sample catalog repeated `copies` times to output_path, for scale tests"""
+    sample = fitz.open(SAMPLE_PDF)
+    doc = fitz.open()
+    try:
+        for _ in range(copies):
+            doc.insert_pdf(sample)
+        doc.save(output_path)
+    finally:
+        doc.close()
+        sample.close()
+    return output_path
+
+PAGE_HEADER = re.compile(r'TEXT FROM PAGE (\d+):\n"(.*?)"(?=\nTEXT FROM PAGE |\s*$)', re.DOTALL)
+HEADING = re.compile(r'^[A-Z][A-Z0-9 \-]{4,}$')
+
+
+class StubGeminiModel:
+    """
+    Mimics genai.GenerativeModel.generate_content with artificial latency.
+    Every ALL-CAPS line on a page is reported as a product on that page.
+    """
+
+    def __init__(self, latency: float = 0.5, per_token_latency: float = 0.0):
+        self.latency = latency
+        self.per_token_latency = per_token_latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt: str, generation_config=None):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency + self.per_token_latency * len(prompt) / 4)
+
+        products = []
+        for page_num, text in PAGE_HEADER.findall(prompt):
+            for line in text.splitlines():
+                if HEADING.match(line.strip()):
+                    products.append({
+                        "product_name": line.strip(),
+                        "brand_name": "Stub",
+                        "page_reference": [int(page_num)]
+                    })
+        text = json.dumps(products)
+        part = SimpleNamespace(text=text)
+        return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))])
+
+
+class StubAnthropicClient:
+    """
+    Mimics Anthropic().messages.create / messages.stream with artificial latency.
+    Every table comes back as `rows` price rows. `failures` is a list of exceptions raised
+    (one per call) before any successful response. Streamed output arrives in `chunk_chars`
+    pieces `chunk_latency` apart, and stops with stop_reason "max_tokens" after `max_output_chars`.
+    messages.batches is a local batch service: a batch ends after `batch_polls` retrieve calls,
+    and requests whose custom_id is in `batch_errors` come back errored.
+    """
+
+    def __init__(self, latency: float = 2.0, output_tokens: int = 500, failures=None, rows: int = 1,
+                 chunk_chars: int = 16, chunk_latency: float = 0.0, max_output_chars: int = None,
+                 batch_polls: int = 1, batch_errors=None):
+        self.latency = latency
+        self.output_tokens = output_tokens
+        self.failures = list(failures or [])
+        self.rows = rows
+        self.chunk_chars = chunk_chars
+        self.chunk_latency = chunk_latency
+        self.max_output_chars = max_output_chars
+        self.batch_polls = batch_polls
+        self.batch_errors = set(batch_errors or [])
+        self.calls = 0
+        self.batches_created = 0
+        self._batches = {}
+        self._lock = threading.Lock()
+        batches = SimpleNamespace(create=self.create_batch, retrieve=self.retrieve_batch, results=self.batch_results)
+        self.messages = SimpleNamespace(create=self.create, stream=self.stream, batches=batches)
+
+    def _start_call(self):
+        with self._lock:
+            self.calls += 1
+            failure = self.failures.pop(0) if self.failures else None
+        time.sleep(self.latency)
+        if failure is not None:
+            raise failure
+
+    def _output(self, messages) -> str:
+        """The rest of the price table after whatever rows the assistant turn is prefilled with"""
+        prefill = messages[-1]["content"] if messages[-1]["role"] == "assistant" else ""
+        done = prefill.count("{")
+        rows = [{"Dimensions_CM": f"{80 + i}x80x75h", "EUR": f"{1000 + i}"} for i in range(done, self.rows)]
+        return ",".join(json.dumps(row) for row in rows) + "]"
+
+    def _truncate(self, text: str):
+        if self.max_output_chars is not None and len(text) > self.max_output_chars:
+            return text[:self.max_output_chars], "max_tokens"
+        return text, "end_turn"
+
+    def create(self, model: str, messages, system=None, temperature=None, max_tokens=None):
+        self._start_call()
+        text, stop_reason = self._truncate(self._output(messages))
+        return SimpleNamespace(
+            content=[SimpleNamespace(text=text)],
+            stop_reason=stop_reason,
+            usage=SimpleNamespace(output_tokens=self.output_tokens)
+        )
+
+    @contextmanager
+    def stream(self, model: str, messages, system=None, temperature=None, max_tokens=None):
+        self._start_call()
+        text, stop_reason = self._truncate(self._output(messages))
+
+        def text_stream():
+            for i in range(0, len(text), self.chunk_chars):
+                time.sleep(self.chunk_latency)
+                yield text[i:i + self.chunk_chars]
+
+        final = SimpleNamespace(stop_reason=stop_reason, usage=SimpleNamespace(output_tokens=len(text) // 4))
+        yield SimpleNamespace(text_stream=text_stream(), get_final_message=lambda: final)
+
+    def create_batch(self, requests):
+        with self._lock:
+            self.batches_created += 1
+            batch_id = f"msgbatch_stub{self.batches_created}"
+            self._batches[batch_id] = {"requests": list(requests), "polls": 0}
+        return self.retrieve_batch(batch_id, poll=False)
+
+    def retrieve_batch(self, batch_id: str, poll: bool = True):
+        with self._lock:
+            batch = self._batches[batch_id]
+            if poll:
+                batch["polls"] += 1
+            ended = batch["polls"] >= self.batch_polls
+        return SimpleNamespace(id=batch_id, processing_status="ended" if ended else "in_progress")
+
+    def batch_results(self, batch_id: str):
+        # Like the real service, results don't come back in request order
+        for request in reversed(self._batches[batch_id]["requests"]):
+            if request["custom_id"] in self.batch_errors:
+                result = SimpleNamespace(type="errored", error=SimpleNamespace(type="api_error"))
+            else:
+                text, stop_reason = self._truncate(self._output(request["params"]["messages"]))
+                message = SimpleNamespace(content=[SimpleNamespace(text=text)], stop_reason=stop_reason)
+                result = SimpleNamespace(type="succeeded", message=message)
+            yield SimpleNamespace(custom_id=request["custom_id"], result=result)
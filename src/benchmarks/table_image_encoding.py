@@ -0,0 +1,102 @@
+"""
+Table image size, render time and (optionally) Claude extraction accuracy per render setting,
+over the dataset tables that come from the sample catalog.
+
+Vision tokens are estimated the way Anthropic documents them (width * height / 750, after Claude's
+own downscale to a 1568px long edge / ~1.15 megapixels). The smallest text height is the raised
+inch fractions (~3.6pt) at the chosen zoom, a proxy for legibility when no API key is available.
+
+Run from the repo root (add --claude to call the real API with ANTHROPIC_API_KEY):
+    python -m src.benchmarks.table_image_encoding
+"""
+import argparse
+import glob
+import io
+import json
+import math
+import os
+import time
+import fitz  # PyMuPDF
+from PIL import Image
+from ..boq_processor import BoQProcessor
+from ..price_extractor import PriceExtractor
+from .stubs import SAMPLE_PDF
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+DATASET = os.path.join(REPO_ROOT, "dataset")
+FEW_SHOT_DIR = os.path.join(REPO_ROOT, "few-shot-examples")
+SMALLEST_TEXT_PT = 3.6
+
+SETTINGS = [
+    # (label, max_pixels, max_edge, encoding); the first matches the old fixed zoom = 4 render
+    ("zoom 4, rgb (old)", 10 ** 9, 10 ** 9, "rgb"),
+    ("budget 1.15MP/1568px, rgb", 1_150_000, 1568, "rgb"),
+    ("budget 1.15MP/1568px, gray", 1_150_000, 1568, "gray"),
+    ("budget 1.15MP/1568px, palette", 1_150_000, 1568, "palette"),
+    ("budget 0.5MP/1200px, gray", 500_000, 1200, "gray"),
+]
+
+
+def vision_tokens(width: int, height: int) -> int:
+    scale = min(1.0, 1568 / max(width, height), math.sqrt(1_150_000 / (width * height)))
+    return int(width * scale * height * scale / 750)
+
+
+def dataset_tables():
+    """(data.json contents, page number, bbox) for dataset tables found in the sample catalog"""
+    doc = fitz.open(SAMPLE_PDF)
+    try:
+        tables = [(page.number + 1, tuple(table.bbox), {cell for row in table.extract() for cell in row if cell})
+                  for page in doc for table in page.find_tables()]
+    finally:
+        doc.close()
+    matched = []
+    for path in sorted(glob.glob(os.path.join(DATASET, "table_*", "data.json"))):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data["pdf_name"] != os.path.basename(SAMPLE_PDF):
+            continue
+        values = {value for row in data["ground_truth"] for value in row.values()}
+        page_num, bbox, _ = max(tables, key=lambda t: len(values & t[2]))
+        matched.append((data, page_num, bbox))
+    return matched
+
+
+def canonical(rows):
+    return sorted(json.dumps(row, sort_keys=True, ensure_ascii=False) for row in rows or [])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--claude", action="store_true", help="Also measure extraction accuracy with the real API")
+    args = parser.parse_args()
+
+    tables = dataset_tables()
+    extractor = None
+    if args.claude:
+        extractor = PriceExtractor(claude_api_key=os.getenv("ANTHROPIC_API_KEY"), few_shot_examples_dir=FEW_SHOT_DIR)
+
+    doc = fitz.open(SAMPLE_PDF)
+    print(f"{len(tables)} dataset tables")
+    for label, max_pixels, max_edge, encoding in SETTINGS:
+        processor = BoQProcessor(catalog_dir=os.path.dirname(SAMPLE_PDF), image_max_pixels=max_pixels,
+                                 image_max_edge=max_edge, image_encoding=encoding)
+        total_bytes = total_tokens = 0
+        elapsed = 0.0
+        smallest_text = float("inf")
+        correct = 0
+        for data, page_num, bbox in tables:
+            start = time.perf_counter()
+            png = processor._extract_table_image(doc, page_num, bbox)
+            elapsed += time.perf_counter() - start
+            with Image.open(io.BytesIO(png)) as image:
+                width, height = image.size
+            total_bytes += len(png)
+            total_tokens += vision_tokens(width, height)
+            smallest_text = min(smallest_text, SMALLEST_TEXT_PT * width / (bbox[2] - bbox[0] + 10))
+            if extractor:
+                correct += canonical(extractor.extract_prices(png)) == canonical(data["ground_truth"])
+        accuracy = f", accuracy {correct}/{len(tables)}" if extractor else ""
+        print(f"{label:32} {total_bytes / len(tables) / 1024:6.1f} KiB, {1000 * elapsed / len(tables):5.1f} ms, "
+              f"~{total_tokens / len(tables):4.0f} vision tokens, smallest text {smallest_text:4.1f}px{accuracy}")
+    doc.close()
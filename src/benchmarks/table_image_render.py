@@ -0,0 +1,48 @@
+"""
+Render + base64-encode every price table in the sample catalog: the old temp PNG round trip
+(save, read back, unlink) vs in-memory PNG bytes.
+
+Run from the repo root:
+    python -m src.benchmarks.table_image_render
+"""
+import base64
+import os
+import tempfile
+import time
+import fitz  # PyMuPDF
+from ..boq_processor import BoQProcessor
+from .stubs import SAMPLE_PDF
+
+
+def render_via_temp_file(processor: BoQProcessor, doc: fitz.Document, page_num: int, bbox: tuple) -> str:
+    """The old _extract_table_image + _encode_image_to_base64 + cleanup"""
+    x0, y0, x1, y1 = bbox
+    pix = doc[page_num - 1].get_pixmap(matrix=fitz.Matrix(4, 4), clip=fitz.Rect(x0 - 5, y0 - 5, x1 + 5, y1 + 5))
+    handle, temp_path = tempfile.mkstemp(suffix=".png")
+    os.close(handle)
+    try:
+        pix.save(temp_path)
+        with open(temp_path, "rb") as image_file:
+            return base64.standard_b64encode(image_file.read()).decode("utf-8")
+    finally:
+        os.unlink(temp_path)
+
+
+def render_in_memory(processor: BoQProcessor, doc: fitz.Document, page_num: int, bbox: tuple) -> str:
+    return base64.standard_b64encode(processor._extract_table_image(doc, page_num, bbox)).decode("utf-8")
+
+
+if __name__ == "__main__":
+    processor = BoQProcessor(catalog_dir=os.path.dirname(SAMPLE_PDF))
+    doc = fitz.open(SAMPLE_PDF)
+    try:
+        tables = [(page.number + 1, tuple(table.bbox)) for page in doc for table in page.find_tables()]
+        print(f"{len(tables)} tables")
+        for name, render in (("temp file", render_via_temp_file), ("in memory", render_in_memory)):
+            start = time.perf_counter()
+            for page_num, bbox in tables:
+                render(processor, doc, page_num, bbox)
+            elapsed = time.perf_counter() - start
+            print(f"{name}: {1000 * elapsed / len(tables):.1f} ms per table")
+    finally:
+        doc.close()
@@ -0,0 +1,91 @@
+"""
+Table layout index on the sample catalog, with a product just above each price table:
+  1. what indexing adds to upload-time page extraction (INDEX_TABLES)
+  2. finding every product's tables per BoQ request: page.find_tables() every time, the layouts
+     stored at upload, and an index filled lazily by the first lookups (in-memory stand-ins for
+     ProductDB.get_table_layouts), and whether the tables and their native parses match
+
+Run from the repo root:
+    python -m src.benchmarks.table_layout_index
+"""
+import os
+import time
+import fitz  # PyMuPDF
+from ..boq_processor import BoQProcessor
+from ..page_layout import extract_page
+from .prepricing_job import sample_products
+from .stubs import SAMPLE_PDF
+
+
+class InMemoryTableIndex:
+    """ProductDB's table index (get_table_layouts, get_indexed_pages, add_page_table_layouts) over lists"""
+
+    def __init__(self, layouts, indexed_pages):
+        self.layouts = sorted(layouts, key=lambda layout: (layout["page_num"], layout["bbox"][1]))
+        self.indexed_pages = set(indexed_pages)
+
+    def get_indexed_pages(self, file_path, start_page, end_page):
+        return {page_num for page_num in self.indexed_pages if start_page <= page_num <= end_page}
+
+    def add_page_table_layouts(self, file_path, pages, layouts):
+        self.layouts = sorted([layout for layout in self.layouts if layout["page_num"] not in pages] + layouts,
+                              key=lambda layout: (layout["page_num"], layout["bbox"][1]))
+        self.indexed_pages.update(pages)
+
+    def get_table_layouts(self, file_path, start_page, start_y, end_page, end_y):
+        if not self.indexed_pages.issuperset(range(start_page, end_page + 1)):
+            return None
+        return [layout for layout in self.layouts
+                if (layout["page_num"], layout["bbox"][1]) >= (start_page, start_y or 0)
+                and (layout["page_num"] < end_page or (layout["page_num"] == end_page
+                                                       and (not end_y or layout["bbox"][1] <= end_y)))]
+
+
+def find_all(processor, doc, products):
+    started = time.perf_counter()
+    found = []
+    for product, next_product in zip(products, products[1:] + [None]):
+        found.append(processor._get_price_tables(
+            doc, vars(product), vars(next_product) if next_product else None
+        ))
+    return found, time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    products = sample_products()
+    doc = fitz.open(SAMPLE_PDF)
+    try:
+        started = time.perf_counter()
+        for page in doc:
+            extract_page(page)
+        plain = time.perf_counter() - started
+        started = time.perf_counter()
+        layouts = []
+        for page in doc:
+            _, span_index = extract_page(page, detect_tables_on_page=True)
+            layouts.extend(span_index.tables)
+        indexed = time.perf_counter() - started
+        print(f"upload extraction of {len(doc)} pages: {plain * 1000:.0f}ms plain, "
+              f"{indexed * 1000:.0f}ms with table detection ({len(layouts)} tables)")
+
+        catalog_dir = os.path.dirname(SAMPLE_PDF)
+        detecting = BoQProcessor(catalog_dir=catalog_dir, native_min_confidence=0.95)
+        index = BoQProcessor(catalog_dir=catalog_dir, native_min_confidence=0.95,
+                             table_index=InMemoryTableIndex(layouts, range(1, len(doc) + 1)))
+        lazy = BoQProcessor(catalog_dir=catalog_dir, native_min_confidence=0.95,
+                            table_index=InMemoryTableIndex([], []))
+        detected, detect_seconds = find_all(detecting, doc, products)
+        looked_up, lookup_seconds = find_all(index, doc, products)
+        _, first_seconds = find_all(lazy, doc, products)
+        lazily_looked_up, again_seconds = find_all(lazy, doc, products)
+        print(f"finding tables for {len(products)} products: {detect_seconds * 1000:.0f}ms with find_tables, "
+              f"{lookup_seconds * 1000:.0f}ms from the upload index, {first_seconds * 1000:.0f}ms filling the "
+              f"index lazily then {again_seconds * 1000:.0f}ms from it")
+
+        def summary(tables):
+            return [(t["page_num"], tuple(round(v, 1) for v in t["bbox"]), t["native_price_data"], t["confidence"])
+                    for t in tables]
+        same = sum(summary(a) == summary(b) == summary(c) for a, b, c in zip(detected, looked_up, lazily_looked_up))
+        print(f"products with identical tables and native parses: {same}/{len(products)}")
+    finally:
+        doc.close()
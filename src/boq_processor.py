@@ -2,20 +2,77 @@ import fitz
 from pathlib import Path
 import google.generativeai as genai
 from .price_extractor import PriceExtractor
+from .price_cache import PriceCache
+from .document_pool import FITZ_LOCK, DocumentPool, open_document
+from .page_layout import detect_tables
+from .table_parser import IndexedTable, parse_table
+import io
 import json
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import math
 from typing import List, Dict, Optional, Tuple
 import os
 import logging
 from dotenv import load_dotenv
-import tempfile
 from PIL import Image
 import code
 
 logger = logging.getLogger(__name__)
 
+# Claude scales images down to a long edge of 1568px / ~1.15 megapixels, so pixels beyond that only cost bytes
+MAX_IMAGE_EDGE = 1568
+MAX_IMAGE_PIXELS = 1_150_000
+MAX_ZOOM = 4
+MIN_ZOOM = 1
+TABLE_PADDING = 5  # points
+IMAGE_ENCODINGS = ("rgb", "gray", "palette")
+PALETTE_COLORS = 16
+
 class BoQProcessor:
-    def __init__(self, catalog_dir: str):
+    def __init__(self, catalog_dir: str, max_concurrency: int = 1,
+                 requests_per_minute: Optional[float] = None,
+                 output_tokens_per_minute: Optional[float] = None,
+                 price_cache: Optional[PriceCache] = None,
+                 native_min_confidence: Optional[float] = None, stream_prices: bool = False,
+                 image_max_pixels: int = MAX_IMAGE_PIXELS, image_max_edge: int = MAX_IMAGE_EDGE,
+                 image_encoding: str = "rgb", table_index=None,
+                 document_pool: Optional[DocumentPool] = None,
+                 price_extractor: Optional[PriceExtractor] = None):
+        """
+        Args:
+            catalog_dir: Directory the catalog PDFs are stored in
+            max_concurrency: Maximum number of a product's Claude calls in flight at once. Only the calls
+                (and PNG encoding) run in parallel; tables are rendered one at a time under FITZ_LOCK
+            requests_per_minute: Optional cap on Claude requests per minute
+            output_tokens_per_minute: Optional cap on Claude output tokens per minute
+            price_cache: Optional cache of parsed price rows keyed on the table image
+            native_min_confidence: Parse tables locally from their cell grid, and only send tables
+                parsed with lower confidence than this to Claude. None always uses Claude
+            stream_prices: Stream Claude's output, continuing tables that hit the output token limit
+            image_max_pixels: Pixel budget for a rendered table; the zoom is chosen to fit it (max 4x)
+            image_max_edge: Longest side of a rendered table in pixels
+            image_encoding: "rgb", "gray" (8-bit grayscale PNG) or "palette" (16-colour PNG)
+            table_index: Optional store of detected table layouts (ProductDB.get_table_layouts). Pages not
+                indexed at upload have their tables detected on their first lookup and stored in it
+            document_pool: Optional shared pool of open catalogs. None opens the PDF on every call
+            price_extractor: Optional long-lived PriceExtractor (see pricing_service.py). None builds
+                one per call from ANTHROPIC_API_KEY and the Claude settings above
+        """
+        if image_encoding not in IMAGE_ENCODINGS:
+            raise ValueError(f"image_encoding must be one of {IMAGE_ENCODINGS}, got {image_encoding!r}")
         self.catalog_dir = catalog_dir
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.output_tokens_per_minute = output_tokens_per_minute
+        self.price_cache = price_cache
+        self.native_min_confidence = native_min_confidence
+        self.stream_prices = stream_prices
+        self.image_max_pixels = image_max_pixels
+        self.image_max_edge = image_max_edge
+        self.image_encoding = image_encoding
+        self.table_index = table_index
+        self.document_pool = document_pool
+        self.price_extractor = price_extractor
 
     def get_price_data(self, current_prod: Dict, next_prod: Optional[Dict]):
         """Extract price tables between current and next product"""
@@ -24,10 +81,11 @@ class BoQProcessor:
         try:
             pdf_path = os.path.join(self.catalog_dir, current_prod["page_reference"]["file_path"])
             logger.info(f"Opening PDF at: {pdf_path}")
-            doc = fitz.open(pdf_path)
-            
-            # STEP 4: Get all price tables within those bounds from the actual PDF
-            try:
+
+            # STEP 4: Get all price tables within those bounds from the actual PDF. The document stays
+            # borrowed while its tables are found, rendered and priced, but FITZ_LOCK is only held
+            # around the PyMuPDF calls themselves
+            with open_document(pdf_path, self.document_pool) as doc:
                 # Get table coordinates
                 price_tables = self._get_price_tables(doc, current_prod, next_prod if next_prod else None)
                 print("\nPRICE TABLES:\n", price_tables)
@@ -37,15 +95,14 @@ class BoQProcessor:
                     return None
 
                 # Process each table and extract prices
-                processed_tables = self._process_price_tables(doc, price_tables)
-                print("\nPROCESSED TABLES:\n", len(processed_tables))
-
-                return {
-                    "status": "found",
-                    "price_tables": processed_tables
-                }
-            finally:
-                doc.close()
+                processed_tables, failed_tables = self._process_price_tables(doc, price_tables)
+            print("\nPROCESSED TABLES:\n", len(processed_tables))
+
+            return {
+                "status": "found",
+                "price_tables": processed_tables,
+                "failed_tables": failed_tables
+            }
         except Exception as e:
             logger.error(f"Error extracting prices: {str(e)}")
             return None
@@ -79,7 +136,7 @@ class BoQProcessor:
                 print("\nPRICE TABLES:\n", price_tables)
 
                 # Process each table and extract prices
-                processed_tables = self._process_price_tables(doc, price_tables)
+                processed_tables, _ = self._process_price_tables(doc, price_tables)
                 print("\nPROCESSED TABLES:\n", len(processed_tables))
 
                 return {
@@ -153,36 +210,139 @@ class BoQProcessor:
         return None
    
     def _get_price_tables(self, doc: fitz.Document, current_product: Dict, next_product: Optional[Dict]) -> List[dict]:
-        """Get all price tables between current product and next product"""
-        tables = []
+        """
+        Get all price tables between current product and next product. Takes FITZ_LOCK only around
+        table detection and text reads, so the table index's database I/O doesn't hold up other
+        PyMuPDF users; call it without FITZ_LOCK held.
+        """
+        file_path = current_product["page_reference"]["file_path"]
         start_page = int(current_product["page_reference"]["page_numbers"][0])
-        end_page = int(next_product["page_reference"]["page_numbers"][0]) if next_product else len(doc)-1
+        with FITZ_LOCK:
+            page_count = len(doc)
+        end_page = int(next_product["page_reference"]["page_numbers"][0]) if next_product else page_count-1
         start_y = current_product["page_reference"]["y_coord"]
         end_y = next_product["page_reference"]["y_coord"] if next_product else None
-        
-        for page_num in range(start_page, end_page + 1):
-            page = doc[page_num-1]
-            page_tables = page.find_tables()
-            
-            for table in page_tables:
-                table_bbox = table.bbox
-                
+
+        layouts = None
+        if self.table_index is not None:
+            layouts = self.table_index.get_table_layouts(file_path, start_page, start_y, end_page, end_y)
+            if layouts is None:
+                # Pages not indexed at upload: detect their tables on this first lookup and index them
+                indexed = self.table_index.get_indexed_pages(file_path, start_page, end_page)
+                missing = [page_num for page_num in range(start_page, end_page + 1) if page_num not in indexed]
+                with FITZ_LOCK:
+                    detected = self._detect_layouts(doc, missing)
+                self.table_index.add_page_table_layouts(file_path, missing, detected)
+                layouts = self.table_index.get_table_layouts(file_path, start_page, start_y, end_page, end_y)
+
+        if layouts is None:
+            # No index (or another worker was indexing the same pages): detect tables on every page
+            layouts = []
+            with FITZ_LOCK:
+                detected = self._detect_layouts(doc, range(start_page, end_page + 1))
+            for layout in detected:
                 # Check if table is within our y-coordinate range
-                if page_num == start_page and table_bbox[1] < start_y:
+                if layout["page_num"] == start_page and start_y is not None and layout["bbox"][1] < start_y:
                     continue
-                if page_num == end_page and end_y and table_bbox[1] > end_y:
+                if layout["page_num"] == end_page and end_y and layout["bbox"][1] > end_y:
                     continue
-                    
-                tables.append({
-                    "page_num": page_num,
-                    "bbox": table_bbox,
-                    "content": table
-                })
-        # code.interact(local=dict(globals(), **locals()))
+                layouts.append(layout)
+        with FITZ_LOCK:
+            return self._get_indexed_tables(doc, layouts)
+
+    def _detect_layouts(self, doc: fitz.Document, pages) -> List[Dict]:
+        """Layouts of the tables page.find_tables() finds on the given pages (see page_layout.detect_tables)"""
+        return [layout for page_num in pages for layout in detect_tables(doc[page_num-1])]
+
+    def _get_indexed_tables(self, doc: fitz.Document, layouts: List[Dict]) -> List[dict]:
+        """Price tables from their layouts (stored or just detected): only the text is read, for native parsing"""
+        tables = []
+        page_dicts = {}
+        for layout in layouts:
+            table = IndexedTable(layout)
+            native_price_data, confidence = [], 0.0
+            if self.native_min_confidence is not None:
+                page = doc[layout["page_num"]-1]
+                if layout["page_num"] not in page_dicts:
+                    page_dicts[layout["page_num"]] = page.get_text("dict")
+                native_price_data, confidence = parse_table(page, table, page_dicts[layout["page_num"]])
+
+            tables.append({
+                "page_num": layout["page_num"],
+                "bbox": table.bbox,
+                "content": table,
+                "native_price_data": native_price_data,
+                "confidence": confidence
+            })
         return tables
 
-    def _process_price_tables(self, doc: fitz.Document, tables: List[dict]) -> List[dict]:
-        """Process each price table and extract pricing data"""
+    def _process_price_tables(self, doc: fitz.Document, tables: List[dict]) -> Tuple[List[dict], List[dict]]:
+        """
+        Price each table (from _get_price_tables): native rows where the table parsed cleanly, otherwise
+        render it and ask Claude. Only the Claude calls (and PNG encoding) run in parallel, up to
+        max_concurrency at once. Tables are rasterized one after another in the calling thread under
+        FITZ_LOCK: MuPDF can't be used from two threads at once, even through separate Document handles.
+        Each table's Claude call starts as soon as it is rendered, so renders overlap earlier calls.
+        Must be called without FITZ_LOCK held.
+
+        Returns:
+            (processed, failed), both in page/bbox order. processed has {"page_num", "bbox", "price_data",
+            "source"} per priced table, failed has {"page_num", "bbox", "error"} per table that failed
+        """
+        price_extractor = self.price_extractor or self._build_price_extractor()
+
+        def price(table: dict, pixels: Image.Image) -> Dict:
+            result = {"page_num": table["page_num"], "bbox": table["bbox"]}
+            try:
+                image = self._encode_table_image(pixels)
+            except Exception as e:
+                logger.error(f"Error rendering table on page {table['page_num']}: {str(e)}")
+                return {**result, "error": f"render failed: {str(e)}"}
+
+            # Extract prices using Claude
+            extracted = price_extractor.extract_prices_result(image)
+            if extracted["error"]:
+                logger.error(f"Error processing table on page {table['page_num']}: {extracted['error']}")
+                return {**result, "error": extracted["error"]}
+            return {**result, "price_data": extracted["price_data"], "source": "llm"}
+
+        workers = max(1, min(self.max_concurrency, len(tables)))
+        results: List[Optional[Dict]] = [None] * len(tables)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            in_flight = {}
+            for i, table in enumerate(tables):
+                if self._is_native(table):
+                    results[i] = {"page_num": table["page_num"], "bbox": table["bbox"],
+                                  "price_data": table["native_price_data"], "source": "native"}
+                    continue
+                # Render at most one table ahead of the calls in flight, so pixmaps don't pile up
+                if len(in_flight) >= workers:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        results[in_flight.pop(future)] = future.result()
+                try:
+                    with FITZ_LOCK:
+                        pixels = self._rasterize_table(doc, table["page_num"], table["bbox"])
+                except Exception as e:
+                    logger.error(f"Error rendering table on page {table['page_num']}: {str(e)}")
+                    results[i] = {"page_num": table["page_num"], "bbox": table["bbox"],
+                                  "error": f"render failed: {str(e)}"}
+                    continue
+                in_flight[executor.submit(price, table, pixels)] = i
+            for future, i in in_flight.items():
+                results[i] = future.result()
+
+        if self.native_min_confidence is not None:
+            parsed = sum(1 for result in results if result.get("source") == "native")
+            logger.info(f"Parsed {parsed}/{len(tables)} price tables natively")
+
+        # Tables Claude read as empty are dropped, as before; failures are reported separately
+        processed_tables = [result for result in results if result.get("price_data")]
+        failed_tables = [result for result in results if "error" in result]
+        return processed_tables, failed_tables
+
+    def _build_price_extractor(self) -> PriceExtractor:
+        """A PriceExtractor for one call, when no long-lived one was given"""
         load_dotenv("api/.env")
 
         # Get the absolute path to few-shot-examples
@@ -191,77 +351,114 @@ class BoQProcessor:
 
         price_extractor = PriceExtractor(
             claude_api_key=os.getenv('ANTHROPIC_API_KEY'),
-            few_shot_examples_dir=few_shot_dir
+            few_shot_examples_dir=few_shot_dir,
+            max_concurrency=self.max_concurrency,
+            requests_per_minute=self.requests_per_minute,
+            output_tokens_per_minute=self.output_tokens_per_minute,
+            cache=self.price_cache,
+            stream=self.stream_prices
         )
         print("PRICE EXTRACTOR INITIALIZED: ", price_extractor)
+        return price_extractor
+
+    def prepare_price_tables(self, current_prod: Dict, next_prod: Optional[Dict]) -> Optional[List[Dict]]:
+        """
+        Find the price tables between current and next product without calling Claude
+        (used to submit tables in bulk, see api/prepricing.py).
 
-        processed_tables = []
+        Returns:
+            One dict per table, as from _prepare_tables, or None if the catalog couldn't be read
+        """
+        try:
+            pdf_path = os.path.join(self.catalog_dir, current_prod["page_reference"]["file_path"])
+            with open_document(pdf_path, self.document_pool) as doc:
+                tables = self._get_price_tables(doc, current_prod, next_prod)
+                with FITZ_LOCK:
+                    return self._prepare_tables(doc, tables)
+        except Exception as e:
+            logger.error(f"Error finding price tables for {current_prod.get('product_name')}: {str(e)}")
+            return None
+
+    def _prepare_tables(self, doc: fitz.Document, tables: List[dict]) -> List[Dict]:
+        """
+        Native price rows for tables that parsed cleanly from their cell grid, and a rendered PNG for
+        every other table (rendered here, serially, since PyMuPDF isn't thread-safe).
 
+        Returns:
+            One {"page_num", "bbox", "price_data", "image"} per table, in order. price_data is set for
+            native tables, image for the rest; both are None if the table couldn't be rendered
+        """
+        prepared = []
         for table in tables:
-            temp_file = None
-            try:
-                # Extract table image
-                temp_file = self._extract_table_image(
-                    doc=doc,
-                    page_num=table["page_num"],
-                    bbox=table["bbox"]
-                )
-                
-                # Extract prices using Claude
-                price_data = price_extractor.extract_prices(temp_file)
-
-                if price_data:
-                    processed_tables.append({
-                        "page_num": table["page_num"],
-                        "bbox": table["bbox"],
-                        "price_data": price_data
-                    })
-                                
-            except Exception as e:
-                logger.error(f"Error processing table: {str(e)}")
-                continue
-            finally:
-                # Clean up temp file with error handling
-                if temp_file and os.path.exists(temp_file):
-                    try:
-                        os.close(os.open(temp_file, os.O_RDONLY))  # Ensure file is closed
-                        os.unlink(temp_file)  # Delete the file
-                    except Exception as e:
-                        logger.warning(f"Could not delete temporary file {temp_file}: {str(e)}")
-        
-        return processed_tables
+            native = self._is_native(table)
+            image = None
+            if not native:
+                try:
+                    image = self._extract_table_image(
+                        doc=doc,
+                        page_num=table["page_num"],
+                        bbox=table["bbox"]
+                    )
+                except Exception as e:
+                    logger.error(f"Error rendering table on page {table['page_num']}: {str(e)}")
+            prepared.append({
+                "page_num": table["page_num"],
+                "bbox": table["bbox"],
+                "price_data": table["native_price_data"] if native else None,
+                "image": image
+            })
+        if self.native_min_confidence is not None:
+            parsed = sum(1 for table in prepared if table["price_data"])
+            logger.info(f"Parsed {parsed}/{len(tables)} price tables natively")
+        return prepared
     
-    def _extract_table_image(self, doc: fitz.Document, page_num: int, bbox: tuple) -> str:
-        """Extract table region as high-quality image from PDF"""
+    def _is_native(self, table: dict) -> bool:
+        """Whether the table's native parse (from _get_price_tables) is trusted over asking Claude"""
+        return bool(
+            self.native_min_confidence is not None and table["native_price_data"]
+            and table["confidence"] >= self.native_min_confidence
+        )
+
+    def _render_zoom(self, clip: fitz.Rect) -> float:
+        """Largest zoom (up to MAX_ZOOM) that keeps the rendered clip within the pixel budget and edge limit"""
+        zoom = min(
+            MAX_ZOOM,
+            math.sqrt(self.image_max_pixels / (clip.width * clip.height)),
+            self.image_max_edge / max(clip.width, clip.height)
+        )
+        return max(MIN_ZOOM, zoom)
+
+    def _extract_table_image(self, doc: fitz.Document, page_num: int, bbox: tuple) -> bytes:
+        """Extract table region as a PNG image (in memory) from PDF, sized to the pixel budget"""
+        return self._encode_table_image(self._rasterize_table(doc, page_num, bbox))
+
+    def _rasterize_table(self, doc: fitz.Document, page_num: int, bbox: tuple) -> Image.Image:
+        """Render the table region, padded and sized to the pixel budget. Caller holds FITZ_LOCK"""
         page = doc[page_num-1]
         
         # Add padding to bbox to ensure table borders are included
-        padding = 5  # pixels
         x0, y0, x1, y1 = bbox
-        padded_bbox = fitz.Rect(x0 - padding, y0 - padding, 
-                               x1 + padding, y1 + padding)
+        padded_bbox = fitz.Rect(x0 - TABLE_PADDING, y0 - TABLE_PADDING,
+                               x1 + TABLE_PADDING, y1 + TABLE_PADDING)
 
-        # Get the pixmap of the table region
-        zoom = 4  # Increased from 2 to 4 for higher resolution
+        # Scale from the table's size rather than a fixed zoom, so wide tables don't blow the budget
+        zoom = self._render_zoom(padded_bbox)
         matrix = fitz.Matrix(zoom, zoom)
 
         # Get the pixmap withOUT alpha channel (produces transparent background not good for Claude) for better quality
-        pix = page.get_pixmap(matrix=matrix, clip=padded_bbox)
-        
-        # Create temp file path but don't open it
-        temp_dir = os.path.abspath(tempfile.gettempdir())
-        temp_path = os.path.join(temp_dir, f"table_image_{next(tempfile._get_candidate_names())}.png")
-        
-        # Let PyMuPDF create and write the file directly
-        pix.save(temp_path)
-        return temp_path
-        
-        # # Save to temporary file with absolute path
-        # with tempfile.NamedTemporaryFile(delete=False, 
-        #                                suffix='.png', 
-        #                                dir=os.path.abspath(tempfile.gettempdir())) as tmp:
-        #     pix.save(tmp.name)
-        #     return os.path.abspath(tmp.name)  # Return full absolute path
+        gray = self.image_encoding == "gray"
+        pix = page.get_pixmap(matrix=matrix, clip=padded_bbox, colorspace=fitz.csGRAY if gray else fitz.csRGB)
+        # Copy the samples out, so encoding doesn't touch MuPDF
+        return Image.frombytes("L" if gray else "RGB", (pix.width, pix.height), pix.samples)
+
+    def _encode_table_image(self, image: Image.Image) -> bytes:
+        """PNG bytes for a rasterized table (no temp file). Doesn't need FITZ_LOCK"""
+        if self.image_encoding == "palette":
+            # Tables are a handful of flat colours, so a small palette keeps text edges and shrinks the file
+            image = image.quantize(colors=PALETTE_COLORS, method=Image.Quantize.FASTOCTREE)
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        return buffer.getvalue()
         
 
 if __name__ == "__main__":
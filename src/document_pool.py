@@ -0,0 +1,135 @@
+import os
+import threading
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+import fitz  # PyMuPDF
+
+logger = logging.getLogger(__name__)
+
+# MuPDF keeps global state, so PyMuPDF calls must not run on two threads at once, even on
+# different documents. Hold this around any work on a document from the pool.
+FITZ_LOCK = threading.RLock()
+
+
+class DocumentPool:
+    """
+    Open fitz.Document handles keyed by (path, mtime), shared by every caller in the process,
+    so repeated lookups into the same catalogs skip reopening the file and reparsing its xref.
+    Least recently used documents are closed past max_documents; a document still in use is
+    closed once its last user is done with it. A file changed on disk gets a fresh handle.
+    """
+
+    def __init__(self, max_documents: int = 8):
+        """
+        Args:
+            max_documents: Documents kept open at once (not counting ones in use past the cap)
+        """
+        self.max_documents = max(1, max_documents)
+        self.opens = 0
+        self.hits = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # (path, mtime) -> document, least recently used first
+        self._documents: "OrderedDict[Tuple[str, float], fitz.Document]" = OrderedDict()
+        self._users: Dict[int, int] = {}
+        # Evicted documents waiting for their last user to release them
+        self._retired: Dict[int, fitz.Document] = {}
+
+    @contextmanager
+    def open(self, path: str) -> Iterator[fitz.Document]:
+        """
+        Borrow the open document for path. Don't close it; hold FITZ_LOCK while using it.
+
+            with pool.open(path) as doc, FITZ_LOCK:
+                page = doc[0]
+        """
+        doc = self._acquire(path)
+        try:
+            yield doc
+        finally:
+            self._release(doc)
+
+    def _acquire(self, path: str) -> fitz.Document:
+        path = os.path.abspath(path)
+        key = (path, os.path.getmtime(path))
+        # Always FITZ_LOCK before _lock, so borrowing while already holding FITZ_LOCK can't deadlock
+        with FITZ_LOCK, self._lock:
+            doc = self._documents.get(key)
+            if doc is not None:
+                self._documents.move_to_end(key)
+                self.hits += 1
+            else:
+                # An older version of the file is never asked for again
+                for stale in [k for k in self._documents if k[0] == path]:
+                    self._retire(stale)
+                doc = fitz.open(path)
+                self.opens += 1
+                logger.info(f"Opened {path} into the document pool")
+                self._documents[key] = doc
+                while len(self._documents) > self.max_documents:
+                    self._retire(next(iter(self._documents)))
+            self._users[id(doc)] = self._users.get(id(doc), 0) + 1
+            return doc
+
+    def _release(self, doc: fitz.Document):
+        with FITZ_LOCK, self._lock:
+            users = self._users[id(doc)] - 1
+            if users:
+                self._users[id(doc)] = users
+                return
+            del self._users[id(doc)]
+            if id(doc) in self._retired:
+                self._close(self._retired.pop(id(doc)))
+
+    def _retire(self, key: Tuple[str, float]):
+        """Drop a document from the pool, closing it now or when its last user releases it"""
+        doc = self._documents.pop(key)
+        self.evictions += 1
+        if id(doc) in self._users:
+            self._retired[id(doc)] = doc
+        else:
+            self._close(doc)
+
+    def _close(self, doc: fitz.Document):
+        doc.close()
+
+    def discard(self, path: str):
+        """Close the pooled document(s) for path, e.g. before deleting the file"""
+        path = os.path.abspath(path)
+        with FITZ_LOCK, self._lock:
+            for key in [k for k in self._documents if k[0] == path]:
+                self._retire(key)
+
+    def close(self):
+        with FITZ_LOCK, self._lock:
+            for key in list(self._documents):
+                self._retire(key)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.opens + self.hits
+            return {
+                "open_documents": len(self._documents),
+                "opens": self.opens,
+                "hits": self.hits,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+@contextmanager
+def open_document(path: str, pool: Optional[DocumentPool] = None) -> Iterator[fitz.Document]:
+    """Borrow path from pool, or without a pool open it just for this block. Callers take FITZ_LOCK to use it"""
+    if pool is not None:
+        with pool.open(path) as doc:
+            yield doc
+        return
+    with FITZ_LOCK:
+        doc = fitz.open(path)
+    try:
+        yield doc
+    finally:
+        with FITZ_LOCK:
+            doc.close()
@@ -7,10 +7,25 @@ import { Progress } from "@/components/ui/progress"
 import { useToast } from "@/hooks/use-toast"
 import { API_URL } from '@/lib/config'
 
+const JOB_POLL_INTERVAL_MS = 2000
+
+interface UploadJob {
+  job_id: string
+  status: 'queued' | 'running' | 'done' | 'failed' | 'skipped'
+  pages_total: number | null
+  pages_done: number
+  products_found: number
+  failed_pages: number[]
+  eta_seconds: number | null
+  result: { message: string } | null
+  error: string | null
+}
+
 export default function UploadPage() {
   const [selectedFile, setSelectedFile] = useState<File | null>(null)
   const [isUploading, setIsUploading] = useState(false)
   const [progress, setProgress] = useState(0)
+  const [status, setStatus] = useState('Uploading PDF...')
   const { toast } = useToast()
   
   const handleFileSelect = (file: File) => {
@@ -30,6 +45,7 @@ export default function UploadPage() {
 
     setIsUploading(true)
     setProgress(0)
+    setStatus('Uploading PDF...')
 
     const formData = new FormData()
     formData.append('file', selectedFile)
@@ -42,7 +58,31 @@ export default function UploadPage() {
 
       if (!response.ok) throw new Error('Upload failed')
       
-      const data = await response.json() // Get the response data
+      // Extraction runs in the background: poll the job until it's done
+      let job: UploadJob = await response.json()
+      while (job.status === 'queued' || job.status === 'running') {
+        if (job.pages_total) {
+          setProgress(Math.round(100 * job.pages_done / job.pages_total))
+          const eta = job.eta_seconds !== null ? `, about ${Math.ceil(job.eta_seconds)}s left` : ''
+          setStatus(`Processing page ${job.pages_done} of ${job.pages_total} (${job.products_found} products found${eta})`)
+        } else {
+          setStatus(job.status === 'queued' ? 'Waiting to start...' : 'Processing PDF...')
+        }
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS))
+        const jobResponse = await fetch(`${API_URL}/upload/jobs/${job.job_id}`)
+        if (!jobResponse.ok) throw new Error('Lost track of upload job')
+        job = await jobResponse.json()
+      }
+      if (job.status === 'failed') throw new Error(job.error ?? 'Processing failed')
+      if (job.status === 'skipped') {
+        // The same catalog is being processed by another upload
+        toast({
+          title: "Already processing",
+          description: job.error ?? "This PDF is already being processed",
+        })
+        return
+      }
+      const data = job.result!
       
       setProgress(100)
       toast({
@@ -120,7 +160,7 @@ export default function UploadPage() {
           <div className="space-y-2">
             <Progress value={progress} />
             <p className="text-sm text-muted-foreground text-center">
-              Processing PDF...
+              {status}
             </p>
           </div>
         )}
@@ -0,0 +1,86 @@
+import json
+import re
+from typing import Any, List, Optional
+
+SEPARATORS = " \t\r\n,"
+# Characters that change the scan state, outside and inside a string
+SPECIAL = re.compile(r'[{}"]')
+STRING_SPECIAL = re.compile(r'["\\]')
+
+
+class JSONArrayStream:
+    """
+    Incremental parser for a streamed JSON array of objects, fed text as it arrives.
+    Starts inside the array (the opening "[" is usually the prefilled part of the response),
+    but skips a leading "[" if the model repeats it.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.closed = False
+        self._started = False
+        # Scan state of the item at the start of the buffer, kept across feeds so each character is
+        # scanned once: where to resume, brace depth, and whether the scan is inside a string
+        self._scanned = 0
+        self._depth = 0
+        self._in_string = False
+        self._malformed = False
+
+    def feed(self, text: str) -> List[Any]:
+        """Add text and return the items completed by it"""
+        self.buffer += text
+        items = []
+        while not self.closed and not self._malformed:
+            if self._scanned == 0:
+                rest = self.buffer.lstrip(SEPARATORS)
+                if not self._started and rest.startswith("["):
+                    rest = rest[1:].lstrip(SEPARATORS)
+                self.buffer = rest
+                if not rest:
+                    break
+                self._started = True
+                if rest[0] == "]":
+                    self.closed = True
+                    self.buffer = rest[1:]
+                    break
+                if rest[0] != "{":
+                    self._malformed = True
+                    break
+            end = self._scan()
+            if end is None:
+                break
+            try:
+                items.append(json.loads(self.buffer[:end]))
+            except json.JSONDecodeError:
+                self._malformed = True
+                break
+            self.buffer = self.buffer[end:]
+            self._scanned = 0
+        return items
+
+    def _scan(self) -> Optional[int]:
+        """Scan on from where the last feed stopped; returns the end of the item once its closing brace arrives"""
+        pos = self._scanned
+        while True:
+            match = (STRING_SPECIAL if self._in_string else SPECIAL).search(self.buffer, pos)
+            if match is None:
+                self._scanned = max(pos, len(self.buffer))
+                return None
+            char = match.group()
+            pos = match.end()
+            if char == "\\":
+                # Skip the escaped character, even if it hasn't arrived yet
+                pos += 1
+            elif char == '"':
+                self._in_string = not self._in_string
+            elif char == "{":
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    return pos
+
+    @property
+    def pending(self) -> bool:
+        """True if there is a partial (or malformed) item left in the buffer"""
+        return not self.closed and bool(self.buffer.strip(SEPARATORS))
@@ -0,0 +1,160 @@
+import re
+from typing import Dict, List, Optional, Tuple
+import fitz  # PyMuPDF
+
+WHITESPACE = re.compile(r"\s+")
+
+# Heading detection: a span counts as a product heading if it is much bigger than the page's body
+# text, or ALL CAPS and noticeably bigger (less so if bold)
+HEADING_SIZE_RATIO = 2.0
+CAPS_HEADING_SIZE_RATIO = 1.4
+BOLD_CAPS_HEADING_SIZE_RATIO = 1.2
+MIN_HEADING_LETTERS = 3
+BOLD_FLAG = 16
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate (~4 characters per token), good enough for sizing prompts"""
+    return (len(text) + 3) // 4
+
+
+def normalize_text(text: str) -> str:
+    """Case-fold and collapse whitespace so lookups ignore case and spacing differences"""
+    return WHITESPACE.sub(" ", text).strip().casefold()
+
+
+class PageSpanIndex:
+    """
+    Normalized text lines of a single page mapped to their top y-coordinate.
+    Built from one layout pass so every product on the page is a dict probe, not a page search.
+    Also records spans that look like product headings (big, bold or ALL CAPS relative to body text).
+    """
+
+    def __init__(self, lines: List[Tuple[str, float]], headings: Optional[List[str]] = None):
+        # Keep lines in reading order for substring fallback, and first occurrence per text for exact lookup
+        self.lines = lines
+        self.headings = headings or []
+        # Table layouts from detect_tables, when extraction was asked to index tables
+        self.tables: List[Dict] = []
+        self.index: Dict[str, float] = {}
+        for text, y0 in lines:
+            self.index.setdefault(text, y0)
+
+    @classmethod
+    def from_page(cls, page: fitz.Page) -> "PageSpanIndex":
+        return cls.from_text_dict(page.get_text("dict"))
+
+    @classmethod
+    def from_text_dict(cls, text_dict: Dict) -> "PageSpanIndex":
+        """Build from the output of page.get_text("dict")"""
+        lines = []
+        all_spans = []
+        for block in text_dict.get("blocks", []):
+            for line in block.get("lines", []):
+                spans = line.get("spans", [])
+                all_spans.extend(spans)
+                # Index each span on its own (headings are usually a single span) and the whole line
+                for span in spans:
+                    text = normalize_text(span["text"])
+                    if text:
+                        lines.append((text, span["bbox"][1]))
+                if len(spans) > 1:
+                    text = normalize_text(" ".join(span["text"] for span in spans))
+                    if text:
+                        lines.append((text, line["bbox"][1]))
+        return cls(lines, headings=_find_headings(all_spans))
+
+    @property
+    def has_product_heading(self) -> bool:
+        return bool(self.headings)
+
+    def find_y(self, text: str) -> Optional[float]:
+        """Top y-coordinate of the first line matching text, or None if it isn't on the page"""
+        key = normalize_text(text)
+        if not key:
+            return None
+        y0 = self.index.get(key)
+        if y0 is not None:
+            return y0
+        # Fall back to the first line containing the text, e.g. "MAD MAX WOOD" inside "MAD MAX WOOD - TAVOLO"
+        for line_text, line_y0 in self.lines:
+            if key in line_text:
+                return line_y0
+        return None
+
+
+def _find_headings(spans: List[Dict]) -> List[str]:
+    """Text of spans styled like a product heading, compared to the page's body text size"""
+    # Body size = character-weighted median span size
+    sizes = sorted((span["size"], len(span["text"].strip())) for span in spans if span["text"].strip())
+    total_chars = sum(count for _, count in sizes)
+    if not total_chars:
+        return []
+    seen = 0
+    body_size = sizes[-1][0]
+    for size, count in sizes:
+        seen += count
+        if seen * 2 >= total_chars:
+            body_size = size
+            break
+
+    headings = []
+    for span in spans:
+        text = span["text"].strip()
+        letters = [c for c in text if c.isalpha()]
+        if len(letters) < MIN_HEADING_LETTERS:
+            continue
+        ratio = span["size"] / body_size
+        all_caps = all(c.isupper() for c in letters)
+        bold = bool(span["flags"] & BOLD_FLAG) or "bold" in span.get("font", "").lower()
+        if (ratio >= HEADING_SIZE_RATIO
+                or (all_caps and ratio >= CAPS_HEADING_SIZE_RATIO)
+                or (all_caps and bold and ratio >= BOLD_CAPS_HEADING_SIZE_RATIO)):
+            headings.append(text)
+    return headings
+
+
+def detect_tables(page: fitz.Page) -> List[Dict]:
+    """
+    Layout of each table page.find_tables() finds on the page: bbox, size, header text and cell grid
+    (enough to find and parse the table later without running table detection again)
+    """
+    layouts = []
+    for table in page.find_tables():
+        layouts.append({
+            "page_num": page.number + 1,
+            "bbox": tuple(table.bbox),
+            "row_count": table.row_count,
+            "col_count": table.col_count,
+            "header": [name or "" for name in table.header.names],
+            # Cell bboxes per row, None where a cell is merged into a neighbour
+            "cells": [[tuple(cell) if cell else None for cell in row.cells] for row in table.rows],
+        })
+    return layouts
+
+
+def extract_page(page: fitz.Page, detect_tables_on_page: bool = False) -> Tuple[str, PageSpanIndex]:
+    """Plain text and span index of a page from a single text extraction, optionally with its table layouts"""
+    textpage = page.get_textpage(flags=fitz.TEXTFLAGS_TEXT)
+    text = page.get_text(textpage=textpage)
+    span_index = PageSpanIndex.from_text_dict(page.get_text("dict", textpage=textpage))
+    if detect_tables_on_page:
+        span_index.tables = detect_tables(page)
+    return text, span_index
+
+
+def extract_page_range(pdf_path: str, start: int, end: int,
+                       detect_tables_on_page: bool = False) -> List[Tuple[int, str, PageSpanIndex]]:
+    """
+    (page_number, text, span_index) for 1-based pages start..end inclusive.
+    Opens the PDF itself, so it can run in a worker process.
+    """
+    doc = fitz.open(pdf_path)
+    try:
+        pages = []
+        for page_num in range(start, end + 1):
+            text, span_index = extract_page(doc[page_num - 1], detect_tables_on_page)
+            pages.append((page_num, text, span_index))
+        return pages
+    finally:
+        doc.close()
@@ -1,42 +1,249 @@
 import fitz  # PyMuPDF
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 import json
+import multiprocessing
+import os
 import re
-from typing import Dict, List, Optional
+import threading
+from collections import deque
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import logging
+from .document_pool import FITZ_LOCK, DocumentPool, open_document
+from .page_layout import PageSpanIndex, estimate_tokens, extract_page, extract_page_range
+from .rate_limiting import TokenBucket, call_with_retries
+from .result_cache import ResultCache, content_hash
+from .text_compaction import compact_text, find_boilerplate_lines
 
 logger = logging.getLogger(__name__)
 
+# (page_texts, page_numbers, continuation_pages) sent to the LLM together
+Batch = Tuple[List[str], List[int], List[int]]
+
+
+class BatchExtractionError(Exception):
+    """A page batch got no usable answer from Gemini (raised with raise_on_batch_errors)"""
+
+    def __init__(self, message: str, pages: List[int]):
+        super().__init__(message)
+        # The batch's pages, continuation pages included
+        self.pages = list(pages)
+
+# Bump whenever _create_prompt changes, so cached batch results from the old prompt aren't reused
+PROMPT_VERSION = "1"
+
+# Gemini errors worth retrying: rate limits, overload and timeouts
+RETRYABLE_GEMINI_ERRORS = (
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+)
+
+@dataclass(frozen=True)
+class ExtractionOptions:
+    """
+    How PDFProcessor batches pages and calls Gemini. The API builds one from config and passes it to every
+    ingestion job; the defaults suit a single catalog extracted in-process.
+
+    Attributes:
+        max_concurrency: Maximum number of page batches in flight at once
+        requests_per_minute: Optional cap on Gemini requests per minute
+        max_retries: Retries with backoff on rate limit / server errors
+        token_budget: Pack consecutive pages into a batch up to this many (estimated) text tokens
+            instead of a fixed BATCH_SIZE. Pages are never split
+        max_pages_per_batch: Upper bound on pages in a token-budget batch, to keep responses short
+        extraction_workers: Processes used for page text/layout extraction. 1 extracts in-process
+        extraction_chunk_pages: Pages handed to an extraction worker at a time
+        extraction_min_pages: Extract shorter catalogs in-process. Starting a worker costs ~1.4s,
+            against ~3ms per page in-process (see benchmarks/parallel_extraction.py)
+        skip_continuation_pages: Don't send pages without a product heading (by font size/weight/caps)
+            to the LLM; attach them to the previous product instead
+        compact_prompts: Strip lines repeated across the document and collapse whitespace before sending
+        index_tables: Also run table detection on every page during extraction and collect the
+            layouts in `table_layouts`, so price lookups don't have to detect tables per request
+        raise_on_batch_errors: Raise BatchExtractionError when a batch's Gemini call fails (after
+            retries) or its answer can't be parsed, instead of skipping the batch's products
+    """
+    max_concurrency: int = 1
+    requests_per_minute: Optional[float] = None
+    max_retries: int = 3
+    token_budget: Optional[int] = None
+    max_pages_per_batch: int = 8
+    extraction_workers: int = 1
+    extraction_chunk_pages: int = 25
+    extraction_min_pages: int = 1000
+    skip_continuation_pages: bool = False
+    compact_prompts: bool = False
+    index_tables: bool = False
+    raise_on_batch_errors: bool = False
+
+
 class PDFProcessor:
-    def __init__(self, pdf_path: str, gemini_api_key: str):
+    def __init__(self, pdf_path: str, gemini_api_key: str, model=None,
+                 options: Optional[ExtractionOptions] = None, cache: Optional[ResultCache] = None,
+                 document_pool: Optional[DocumentPool] = None, start_page: int = 1):
+        """
+        Args:
+            pdf_path: Path to the catalog PDF
+            gemini_api_key: Gemini API key (unused when `model` is given)
+            model: Object with a Gemini-style `generate_content`. Defaults to gemini-1.5-pro
+            options: Batching, concurrency and extraction settings (ExtractionOptions() if None)
+            cache: Optional persistent cache of parsed batch results, keyed on batch text
+            document_pool: Optional shared pool of open documents for the in-process reads
+            start_page: First page to extract, to resume a catalog whose earlier pages are already stored
+        """
+        if options is None:
+            options = ExtractionOptions()
+        self.options = options
         self.pdf_path = pdf_path
-        # Initialize Gemini
-        genai.configure(api_key=gemini_api_key)
-        self.model = genai.GenerativeModel("gemini-1.5-pro-002")
-        self.BATCH_SIZE = 2  # Pages per batch
-        
+        if model is None:
+            # Initialize Gemini
+            genai.configure(api_key=gemini_api_key)
+            model = genai.GenerativeModel("gemini-1.5-pro-002")
+        self.model = model
+        self.model_name = getattr(model, "model_name", type(model).__name__)
+        self.BATCH_SIZE = 2  # Pages per batch when no token budget is set
+        self.token_budget = options.token_budget
+        self.max_pages_per_batch = options.max_pages_per_batch
+        self.max_concurrency = max(1, options.max_concurrency)
+        self.rate_limiter = TokenBucket(options.requests_per_minute) if options.requests_per_minute else None
+        self.max_retries = options.max_retries
+        self.cache = cache
+        # More processes than cores only adds spawn cost
+        self.extraction_workers = max(1, min(options.extraction_workers, os.cpu_count() or 1))
+        self.extraction_chunk_pages = options.extraction_chunk_pages
+        self.extraction_min_pages = options.extraction_min_pages
+        self.skip_continuation_pages = options.skip_continuation_pages
+        self.compact_prompts = options.compact_prompts
+        self.index_tables = options.index_tables
+        self.document_pool = document_pool
+        self.start_page = max(1, start_page)
+        self.raise_on_batch_errors = options.raise_on_batch_errors
+        # Table layouts of every page (see page_layout.detect_tables), filled as pages are extracted
+        self.table_layouts: List[Dict] = []
+        # pages_total is set once the PDF is opened; pages_done counts pages whose batch has come back
+        self.stats = {"batches": 0, "cache_hits": 0, "cache_misses": 0, "pages_skipped": 0,
+                      "tokens_raw": 0, "tokens_sent": 0, "pages_total": 0, "pages_done": self.start_page - 1}
+        self._stats_lock = threading.Lock()
+        # Span indexes built during extraction, waiting for their batch to resolve y-coords
+        self._span_indexes: Dict[int, PageSpanIndex] = {}
+
     def extract_product_info(self) -> List[Dict]:
         """Main method to process PDF and return structured product data"""
-        # Extract text from PDF
-        extracted_text = self._extract_text_from_pdf()
-        print("len(raw_pages): ", len(extracted_text))
-
-        # Process text through LLM in batches
-        all_products = self._process_text_batches(extracted_text)
-        print("len(all_products): ", len(all_products))
+        all_products = []
+        for products in self.iter_product_batches():
+            all_products.extend(products)
+        logger.info(f"Extracted {len(all_products)} products from {self.pdf_path}")
 
         return all_products
 
+    def iter_product_batches(self) -> Iterator[List[Dict]]:
+        """
+        Stream products batch by batch, in page order.
+        Pages are read, batched, sent to the LLM and released as they go, so memory stays flat
+        and callers can store the first products before the last page is read.
+        """
+        for _, products in self.iter_batches():
+            if products:
+                yield products
+
+    def iter_batches(self) -> Iterator[Tuple[List[int], List[Dict]]]:
+        """
+        Like iter_product_batches, but yields (page_numbers, products) for every batch, including
+        batches with no products, so callers can record which pages are done.
+        page_numbers includes the continuation pages attached to the batch. When the LLM finds no product
+        on a batch's heading pages, its continuation pages are added to the last product yielded before it.
+        """
+        for pages, products in self._continue_products(self._dispatch_batches(self._make_batches(self._iter_pages()))):
+            yield pages, products
+        if self.cache:
+            logger.info(f"Gemini batch cache: {self.stats['cache_hits']} hits, "
+                        f"{self.stats['cache_misses']} misses out of {self.stats['batches']} batches")
+        if self.compact_prompts:
+            logger.info(f"Prompt compaction: {self.stats['tokens_raw']} -> {self.stats['tokens_sent']} "
+                        f"estimated tokens ({self.stats['tokens_raw'] - self.stats['tokens_sent']} saved)")
+
+    def _iter_pages(self) -> Iterator[Tuple[int, str]]:
+        """
+        Yield (page_number, text) for each page using PyMuPDF (fitz), one page at a time.
+        The page's span index is built in the same pass and kept for its batch.
+        With compact_prompts, repeated headers/footers/legal lines and whitespace runs are stripped.
+        """
+        boilerplate = set()
+        if self.compact_prompts:
+            # Quick block-level pass over the whole document; the only step that reads ahead
+            with open_document(self.pdf_path, self.document_pool) as doc, FITZ_LOCK:
+                boilerplate = find_boilerplate_lines(self.pdf_path, doc)
+            logger.info(f"Found {len(boilerplate)} boilerplate lines to strip from prompts")
+
+        pages = self._iter_pages_parallel() if self.extraction_workers > 1 else self._iter_pages_serial()
+        for page_num, text, span_index in pages:
+            self._span_indexes[page_num] = span_index
+            self.table_layouts.extend(span_index.tables)
+            if self.compact_prompts:
+                raw_tokens = estimate_tokens(text)
+                text = compact_text(text, boilerplate)
+                self._count("tokens_raw", raw_tokens)
+                self._count("tokens_sent", estimate_tokens(text))
+            yield page_num, text
+
+    def _iter_pages_serial(self) -> Iterator[Tuple[int, str, PageSpanIndex]]:
+        try:
+            with open_document(self.pdf_path, self.document_pool) as doc:
+                logger.info(f"Streaming text from {doc.page_count} pages")
+                self.stats["pages_total"] = doc.page_count
+                for page_num in range(self.start_page - 1, doc.page_count):
+                    # Only hold the lock per page: the consumer runs between pages (LLM calls included)
+                    with FITZ_LOCK:
+                        text, span_index = extract_page(doc[page_num], self.index_tables)
+                    yield page_num + 1, text, span_index
+        except Exception as e:
+            logger.error(f"Error extracting text from PDF: {str(e)}")
+            raise
+
+    def _iter_pages_parallel(self) -> Iterator[Tuple[int, str, PageSpanIndex]]:
+        """Extract page ranges in worker processes, each opening the PDF itself, merged back in page order"""
+        try:
+            with open_document(self.pdf_path, self.document_pool) as doc:
+                page_count = doc.page_count
+            self.stats["pages_total"] = page_count
+        except Exception as e:
+            logger.error(f"Error extracting text from PDF: {str(e)}")
+            raise
+
+        ranges = [(start, min(start + self.extraction_chunk_pages - 1, page_count))
+                  for start in range(self.start_page, page_count + 1, self.extraction_chunk_pages)]
+        if len(ranges) <= 1 or page_count - self.start_page + 1 < self.extraction_min_pages:
+            # Starting worker processes costs more than extracting a short catalog
+            yield from self._iter_pages_serial()
+            return
+
+        logger.info(f"Extracting {page_count} pages with {self.extraction_workers} processes")
+        # spawn, not fork: the API process has gRPC/HTTP client threads that don't survive a fork
+        with ProcessPoolExecutor(max_workers=self.extraction_workers,
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            # Keep a couple of chunks per worker queued, not the whole document
+            in_flight = deque()
+            for start, end in ranges:
+                in_flight.append(executor.submit(extract_page_range, self.pdf_path, start, end, self.index_tables))
+                if len(in_flight) >= 2 * self.extraction_workers:
+                    yield from in_flight.popleft().result()
+            while in_flight:
+                yield from in_flight.popleft().result()
+
     def _extract_text_from_pdf(self) -> Dict[int, str]:
-        """Extract text from PDF using PyMuPDF (fitz)"""
+        """
+        Extract every page's text up front using PyMuPDF (fitz), the way ingestion worked before streaming.
+        Text only: no span indexes or table layouts are kept, so products come back without y-coords
+        """
         extracted_text = {}
         try:
-            doc = fitz.open(self.pdf_path)
-            for page_num in range(doc.page_count):
-                page = doc[page_num]
-                text = page.get_text()
-                extracted_text[page_num + 1] = text
-            doc.close()
+            with open_document(self.pdf_path, self.document_pool) as doc, FITZ_LOCK:
+                for page_num in range(self.start_page - 1, doc.page_count):
+                    extracted_text[page_num + 1] = doc[page_num].get_text()
             return extracted_text
         except Exception as e:
             logger.error(f"Error extracting text from PDF: {str(e)}")
@@ -45,81 +252,279 @@ class PDFProcessor:
     def _process_text_batches(self, extracted_text: Dict[int, str]) -> List[Dict]:
         """Process extracted text in batches through LLM"""
         all_products = []
+        for _, products in self._continue_products(self._dispatch_batches(self._make_batches(extracted_text.items()))):
+            all_products.extend(products)
+        return all_products
+
+    def _continue_products(self, results: Iterable[Tuple[List[int], Optional[List[Dict]], List[int]]]
+                           ) -> Iterator[Tuple[List[int], List[Dict]]]:
+        """
+        Yield (pages, products) from _dispatch_batches in order. A batch with continuation pages but no
+        products (the LLM found nothing on its heading pages) has its continuation pages added to the last
+        product of an earlier batch, the one they continue, instead of dropping them
+        """
+        last_product = None
+        for pages, products, continuation_pages in results:
+            if not products and continuation_pages and last_product is not None:
+                last_product["page_reference"]["page_numbers"].extend(continuation_pages)
+            if products:
+                last_product = products[-1]
+            yield pages, products or []
+
+    def _make_batches(self, pages: Iterable[Tuple[int, str]]) -> Iterator[Batch]:
+        """
+        Group pages into (page_texts, page_numbers, continuation_pages) batches, by token budget if set,
+        else BATCH_SIZE pages. continuation_pages are skipped pages that belong to the batch's last product.
+        """
+        pages = self._group_continuation_pages(pages)
+        if self.token_budget:
+            yield from self._make_token_budget_batches(pages)
+            return
+
         page_texts_batch = []
         page_numbers_batch = []
 
-        for page_num, page_text in extracted_text.items():
+        for page_num, page_text, continuation_pages in pages:
             page_texts_batch.append(page_text)
             page_numbers_batch.append(page_num)
 
-            if len(page_texts_batch) == self.BATCH_SIZE:
-                products = self._process_batch(page_texts_batch, page_numbers_batch)
-                if products:
-                    all_products.extend(products)
+            # Skipped pages attach to the last product, so they have to close the batch
+            if len(page_texts_batch) == self.BATCH_SIZE or continuation_pages:
+                yield page_texts_batch, page_numbers_batch, continuation_pages
                 page_texts_batch = []
                 page_numbers_batch = []
 
-        # Process remaining pages
+        # Remaining pages
         if page_texts_batch:
-            products = self._process_batch(page_texts_batch, page_numbers_batch)
-            if products:
-                all_products.extend(products)
+            yield page_texts_batch, page_numbers_batch, []
 
-        return all_products
+    def _make_token_budget_batches(self, pages: Iterable[Tuple[int, str, List[int]]]) -> Iterator[Batch]:
+        """
+        Pack consecutive pages until the next one would push the batch over token_budget.
+        A page bigger than the budget on its own still goes out whole, as a batch of one.
+        """
+        page_texts_batch = []
+        page_numbers_batch = []
+        batch_tokens = 0
+
+        for page_num, page_text, continuation_pages in pages:
+            page_tokens = estimate_tokens(page_text)
+            if page_texts_batch and (batch_tokens + page_tokens > self.token_budget
+                                     or len(page_texts_batch) >= self.max_pages_per_batch):
+                yield page_texts_batch, page_numbers_batch, []
+                page_texts_batch = []
+                page_numbers_batch = []
+                batch_tokens = 0
+
+            page_texts_batch.append(page_text)
+            page_numbers_batch.append(page_num)
+            batch_tokens += page_tokens
+
+            if continuation_pages:
+                yield page_texts_batch, page_numbers_batch, continuation_pages
+                page_texts_batch = []
+                page_numbers_batch = []
+                batch_tokens = 0
+
+        if page_texts_batch:
+            yield page_texts_batch, page_numbers_batch, []
+
+    def _group_continuation_pages(self, pages: Iterable[Tuple[int, str]]) -> Iterator[Tuple[int, str, List[int]]]:
+        """
+        Yield (page_number, text, continuation_pages). With skip_continuation_pages, pages whose layout
+        shows no product heading are not sent to the LLM. They are listed after the page they follow instead.
+        A page is only yielded once the next heading page (or the end) is reached, so its list is complete.
+        """
+        pending = None
+        for page_num, page_text in pages:
+            span_index = self._span_indexes.get(page_num)
+            if (self.skip_continuation_pages and pending is not None
+                    and span_index is not None and not span_index.has_product_heading):
+                pending[2].append(page_num)
+                self._span_indexes.pop(page_num, None)
+                self._count("pages_skipped")
+                continue
+            if pending is not None:
+                yield pending
+            pending = (page_num, page_text, [])
+        if pending is not None:
+            yield pending
+
+    def _dispatch_batches(self, batches: Iterable[Batch]) -> Iterator[Tuple[List[int], Optional[List[Dict]], List[int]]]:
+        """
+        Run _process_batch over batches with at most max_concurrency in flight, yielding each batch's
+        pages (continuation pages included), products and continuation pages.
+        Results are yielded in batch (i.e. page) order so sequence numbers stay stable.
+        """
+        if self.max_concurrency == 1:
+            for batch in batches:
+                yield self._batch_pages(batch), self._process_batch(*batch), list(batch[2] or [])
+            return
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            in_flight = deque()
+            for batch in batches:
+                in_flight.append((batch, executor.submit(self._process_batch, *batch)))
+                # Wait for the oldest batch before submitting more, so we never run ahead unbounded
+                if len(in_flight) >= self.max_concurrency:
+                    oldest, future = in_flight.popleft()
+                    yield self._batch_pages(oldest), future.result(), list(oldest[2] or [])
+            while in_flight:
+                oldest, future = in_flight.popleft()
+                yield self._batch_pages(oldest), future.result(), list(oldest[2] or [])
+
+    def _batch_pages(self, batch: Batch) -> List[int]:
+        _, page_numbers, continuation_pages = batch
+        return list(page_numbers) + list(continuation_pages or [])
     
-    def _process_batch(self, page_texts: List[str], page_numbers: List[int]) -> Optional[List[Dict]]:
+    def _process_batch(self, page_texts: List[str], page_numbers: List[int],
+                       continuation_pages: Optional[List[int]] = None) -> Optional[List[Dict]]:
         """Process a single batch of pages"""
+        try:
+            json_batch_data = self._get_batch_products(page_texts, page_numbers)
+        except BatchExtractionError as e:
+            e.pages.extend(continuation_pages or [])
+            raise
+        self._count("pages_done", len(page_numbers) + len(continuation_pages or []))
+        if json_batch_data:
+            # One layout pass per page (done at extraction), shared by every product on that page
+            span_indexes = {num: self._span_indexes.pop(num, None) for num in page_numbers}
+            for product in json_batch_data:
+                self._add_page_reference(product, page_numbers, span_indexes)
+
+            # Pages skipped for having no product heading continue the batch's last product
+            if continuation_pages:
+                json_batch_data[-1]["page_reference"]["page_numbers"].extend(continuation_pages)
+
+            return json_batch_data
+
+        for num in page_numbers:
+            self._span_indexes.pop(num, None)
+        return None
+
+    def _get_batch_products(self, page_texts: List[str], page_numbers: List[int]) -> Optional[List[Dict]]:
+        """Products the LLM finds in a batch, served from the cache when the same text was seen before"""
+        self._count("batches")
+        cache_key = None
+        if self.cache:
+            cache_key = self._batch_cache_key(page_texts)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self._count("cache_hits")
+                # Cached page numbers are relative to the batch's first page, the catalog may have moved
+                return self._shift_page_references(cached, page_numbers[0])
+            self._count("cache_misses")
+
         structured_data = self._parse_text_with_gemini(page_texts, page_numbers)
         if not structured_data:
+            if self.raise_on_batch_errors:
+                raise BatchExtractionError(f"No Gemini response for pages {page_numbers}", page_numbers)
             return None
 
         json_batch_data = self._extract_json_from_response(structured_data)
-        if json_batch_data:
-            for product in json_batch_data:
-                # Only add the file path, preserve the page numbers from LLM
-                if "page_reference" not in product:
-                    # Fallback if LLM didn't provide page numbers
-                    product["page_reference"] = {
-                        "file_path": self.pdf_path,
-                        "page_numbers": [page_numbers[0]]
-                    }
-                else:
-                    # Keep LLM's page numbers, just add the file path
-                    page_nums = product["page_reference"]
-                    # Handle case where page_reference is a single number, not an array like we instructed LLM
-                    if isinstance(page_nums, (int, str)):
-                        page_nums = [int(page_nums)]
-
-                    product["page_reference"] = {
-                        "file_path": self.pdf_path,
-                        "page_numbers": page_nums
-                    }
-
-                # Add y-coord to product
-                page_num = product["page_reference"]["page_numbers"][0]
-                doc = fitz.open(self.pdf_path)
-                try:
-                    page = doc[int(page_num) - 1]  # fitz uses 0-based indexing
-                    instances = page.search_for(product["product_name"])
-                    if instances:
-                        product["page_reference"]["y_coord"] = instances[0].y0
-                finally:
-                    doc.close()
+        if json_batch_data is None and self.raise_on_batch_errors and not self._is_empty_json_array(structured_data):
+            raise BatchExtractionError(f"Unparseable Gemini response for pages {page_numbers}", page_numbers)
+        if cache_key and (json_batch_data or self._is_empty_json_array(structured_data)):
+            self.cache.set(cache_key, self._shift_page_references(json_batch_data or [], -page_numbers[0]))
+        return json_batch_data
 
-            return json_batch_data
-        return None
+    def _batch_cache_key(self, page_texts: List[str]) -> str:
+        """Hash of the whitespace-normalized page texts, prompt version and model name"""
+        normalized = [re.sub(r"\s+", " ", text).strip() for text in page_texts]
+        return content_hash(PROMPT_VERSION, self.model_name, *normalized)
+
+    def _shift_page_references(self, products: List[Dict], offset: int) -> List[Dict]:
+        """Copy of products with every LLM page number moved by offset"""
+        shifted = json.loads(json.dumps(products))
+        for product in shifted:
+            page_nums = product.get("page_reference")
+            if page_nums is None:
+                continue
+            if isinstance(page_nums, list):
+                product["page_reference"] = [self._shift_page(num, offset) for num in page_nums]
+            else:
+                product["page_reference"] = self._shift_page(page_nums, offset)
+        return shifted
+
+    def _shift_page(self, page_num, offset: int):
+        try:
+            return int(page_num) + offset
+        except (TypeError, ValueError):
+            return page_num
+
+    def _is_empty_json_array(self, response_text: str) -> bool:
+        try:
+            return json.loads(response_text) == []
+        except json.JSONDecodeError:
+            return False
+
+    def _count(self, stat: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[stat] += amount
+
+    def _add_page_reference(self, product: Dict, page_numbers: List[int],
+                            span_indexes: Dict[int, Optional[PageSpanIndex]]):
+        """Add file path, page numbers and y-coord of the product name to the product"""
+        # Only add the file path, preserve the page numbers from LLM
+        if "page_reference" not in product:
+            # Fallback if LLM didn't provide page numbers
+            product["page_reference"] = {
+                "file_path": self.pdf_path,
+                "page_numbers": [page_numbers[0]]
+            }
+        else:
+            # Keep LLM's page numbers, just add the file path
+            page_nums = product["page_reference"]
+            # Handle case where page_reference is a single number, not an array like we instructed LLM
+            if isinstance(page_nums, (int, str)):
+                page_nums = [page_nums]
+            page_nums = self._clean_page_numbers(page_nums, page_numbers)
+
+            product["page_reference"] = {
+                "file_path": self.pdf_path,
+                "page_numbers": page_nums
+            }
+
+        # Add y-coord to product
+        page_num = int(product["page_reference"]["page_numbers"][0])
+        span_index = span_indexes.get(page_num)
+        y_coord = span_index.find_y(product["product_name"]) if span_index else None
+        if y_coord is not None:
+            product["page_reference"]["y_coord"] = y_coord
     
+    def _clean_page_numbers(self, page_nums: List, page_numbers: List[int]) -> List[int]:
+        """
+        Sorted, de-duplicated int page numbers restricted to the batch's pages.
+        Bigger batches mean more products spanning pages, so a stray or out-of-batch number from
+        the LLM shouldn't move a product to a page it was never shown.
+        """
+        cleaned = set()
+        for num in page_nums:
+            try:
+                num = int(num)
+            except (TypeError, ValueError):
+                continue
+            if num in page_numbers:
+                cleaned.add(num)
+        return sorted(cleaned) or [page_numbers[0]]
+
     def _parse_text_with_gemini(self, page_texts: List[str], 
                                page_numbers: List[int]) -> Optional[str]:
         """Send text to Gemini API and get structured response"""
         try:
             prompt = self._create_prompt(page_texts, page_numbers)
-            response = self.model.generate_content(
-                prompt,
-                generation_config=genai.GenerationConfig(
-                    response_mime_type="application/json",
+
+            def generate():
+                if self.rate_limiter:
+                    self.rate_limiter.acquire()
+                return self.model.generate_content(
+                    prompt,
+                    generation_config=genai.GenerationConfig(
+                        response_mime_type="application/json",
+                    )
                 )
-            )
+
+            response = call_with_retries(generate, RETRYABLE_GEMINI_ERRORS, max_retries=self.max_retries)
             return response.candidates[0].content.parts[0].text
         except Exception as e:
             logger.error(f"Error calling Gemini API: {str(e)}")
@@ -0,0 +1,125 @@
+import hashlib
+import io
+import threading
+import logging
+from typing import Dict, List, Optional, Tuple
+from PIL import Image
+from .result_cache import ResultCache
+
+logger = logging.getLogger(__name__)
+
+# dHash grid size: HASH_SIZE x HASH_SIZE bits
+HASH_SIZE = 16
+EXACT_PREFIX = "price:"
+PERCEPTUAL_PREFIX = "price-dhash:"
+
+
+def difference_hash(png: bytes, hash_size: int = HASH_SIZE) -> int:
+    """Perceptual dHash: brightness gradient signs of the image shrunk to hash_size x hash_size"""
+    with Image.open(io.BytesIO(png)) as image:
+        small = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class PriceCache:
+    """
+    Table image -> parsed price rows, stored in a ResultCache.
+    Looks up by exact image hash, then optionally by perceptual hash within max_distance bits.
+    Perceptual matching is off by default: price grids of sibling products differ only in their
+    digits and can hash closer than two renders of the same table (see benchmarks/price_cache.py).
+    """
+
+    def __init__(self, cache: ResultCache, namespace: str = "", max_distance: Optional[int] = None):
+        """
+        Args:
+            cache: Persistent store (shared eviction and size limit)
+            namespace: Prefix for keys, e.g. prompt version and model, so a prompt change misses
+            max_distance: Enable perceptual matching up to this many differing dHash bits
+        """
+        self.cache = cache
+        self.namespace = namespace
+        self.max_distance = max_distance
+        self.exact_hits = 0
+        self.perceptual_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # (dhash, exact key) of every stored table, for nearest-neighbour lookup
+        self._perceptual_index: List[Tuple[int, str]] = []
+        if max_distance is not None:
+            prefix = f"{PERCEPTUAL_PREFIX}{namespace}:"
+            for key in cache.keys(prefix):
+                dhash, digest = key[len(prefix):].split(":", 1)
+                self._perceptual_index.append((int(dhash, 16), self._exact_key(digest)))
+
+    def _exact_key(self, digest: str) -> str:
+        return f"{EXACT_PREFIX}{self.namespace}:{digest}"
+
+    def get(self, png: bytes) -> Optional[List[Dict]]:
+        """Cached price rows for the table image, or None on a miss"""
+        value = self.cache.get(self._exact_key(hashlib.sha256(png).hexdigest()))
+        if value is not None:
+            self._count("exact_hits")
+            return value
+
+        if self.max_distance is not None:
+            dhash = difference_hash(png)
+            with self._lock:
+                candidates = sorted(
+                    (hamming_distance(dhash, stored), key) for stored, key in self._perceptual_index
+                )
+            for distance, key in candidates:
+                if distance > self.max_distance:
+                    break
+                value = self.cache.get(key)
+                # The entry may have been evicted since it was indexed
+                if value is not None:
+                    logger.info(f"Price cache perceptual hit at distance {distance}")
+                    self._count("perceptual_hits")
+                    return value
+
+        self._count("misses")
+        return None
+
+    def set(self, png: bytes, price_data: List[Dict]):
+        self.set_by_key(self.image_key(png), price_data)
+
+    def image_key(self, png: bytes) -> str:
+        """The hashes set_by_key stores rows under, for callers that get the rows long after the image is gone"""
+        digest = hashlib.sha256(png).hexdigest()
+        if self.max_distance is None:
+            return digest
+        return f"{difference_hash(png):x}:{digest}"
+
+    def set_by_key(self, image_key: str, price_data: List[Dict]):
+        dhash, _, digest = image_key.rpartition(":")
+        self.cache.set(self._exact_key(digest), price_data)
+        if dhash and self.max_distance is not None:
+            self.cache.set(f"{PERCEPTUAL_PREFIX}{self.namespace}:{image_key}", True)
+            with self._lock:
+                self._perceptual_index.append((int(dhash, 16), self._exact_key(digest)))
+
+    def _count(self, stat: str):
+        with self._lock:
+            setattr(self, stat, getattr(self, stat) + 1)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.exact_hits + self.perceptual_hits + self.misses
+            hits = self.exact_hits + self.perceptual_hits
+            return {
+                "exact_hits": self.exact_hits,
+                "perceptual_hits": self.perceptual_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
@@ -1,31 +1,88 @@
+import anthropic
 from anthropic import Anthropic
 import base64
 import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import logging
-from typing import List, Dict, Optional
+from typing import Generator, Iterator, List, Dict, Optional, Union
 from pathlib import Path
+from .json_stream import JSONArrayStream
+from .price_cache import PriceCache
+from .rate_limiting import TokenBucket, call_with_retries, retry_delay
 # import pandas as pd
-import code
 
 logger = logging.getLogger(__name__)
 
+# A table image: path to a PNG file, or the PNG bytes themselves
+ImageInput = Union[str, Path, bytes, bytearray, memoryview]
+
+# Encoded few-shot prompt prefix per examples directory, built once per process
+_prompt_prefix_cache: Dict[str, List[Dict]] = {}
+_prompt_prefix_lock = threading.Lock()
+
+# Claude errors worth retrying: 429s, 5xx/overloaded and network failures
+RETRYABLE_CLAUDE_ERRORS = (
+    anthropic.RateLimitError,
+    anthropic.InternalServerError,
+    anthropic.APIConnectionError,
+)
+
+CLAUDE_MODEL = "claude-3-5-sonnet-20241022"
+# Bump whenever the prompt changes, so cached price rows from the old prompt aren't reused
+PROMPT_VERSION = "2"
+PRICE_CACHE_NAMESPACE = f"{PROMPT_VERSION}:{CLAUDE_MODEL}"
+
+MAX_OUTPUT_TOKENS = 8192
+# Output tokens reserved per request before the real count is known (settled after the response)
+ESTIMATED_OUTPUT_TOKENS = 2048
+# Follow-up requests allowed when a streamed table is cut off at MAX_OUTPUT_TOKENS
+MAX_CONTINUATIONS = 3
+
 class PriceExtractor:
-    def __init__(self, claude_api_key: str, few_shot_examples_dir: str):
+    def __init__(self, claude_api_key: str, few_shot_examples_dir: str, client=None,
+                 max_concurrency: int = 1, requests_per_minute: Optional[float] = None,
+                 output_tokens_per_minute: Optional[float] = None, max_retries: int = 3,
+                 cache: Optional[PriceCache] = None, stream: bool = False):
         """
         Initialize PriceExtractor with API key and examples directory.
         
         Args:
-            claude_api_key: Anthropic API key
+            claude_api_key: Anthropic API key (unused when `client` is given)
             few_shot_examples_dir: Directory containing example images
+            client: Object with an Anthropic-style `messages.create`. Defaults to an Anthropic client
+            max_concurrency: Maximum number of tables in flight at once in extract_prices_many
+            requests_per_minute: Optional cap on Claude requests per minute
+            output_tokens_per_minute: Optional cap on Claude output tokens per minute
+            max_retries: Retries with backoff on rate limit / server errors
+            cache: Optional cache of parsed price rows keyed on the table image
+                (create it with namespace=PRICE_CACHE_NAMESPACE)
+            stream: Stream responses and parse rows as they arrive, continuing tables that hit
+                the output token limit instead of failing them
         """
-        self.client = Anthropic(api_key=claude_api_key)
+        # Retries are done here (with jitter, behind the rate limiters) rather than inside the SDK
+        self.client = client if client is not None else Anthropic(api_key=claude_api_key, max_retries=0)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.cache = cache
+        self.stream = stream
+        self.stats = {"streamed_tables": 0, "continuations": 0,
+                      "first_row_seconds_total": 0.0, "first_row_seconds_max": 0.0}
+        self._stats_lock = threading.Lock()
+        self.request_limiter = TokenBucket(requests_per_minute) if requests_per_minute else None
+        # Anthropic refills output tokens continuously up to a minute's worth, so allow that burst
+        self.output_token_limiter = (
+            TokenBucket(output_tokens_per_minute, capacity=output_tokens_per_minute)
+            if output_tokens_per_minute else None
+        )
         self.few_shot_examples_dir = Path(few_shot_examples_dir)
         self.few_shot_examples = self._load_few_shot_examples()
         self.system_instruction = "You are a table data extraction system. Process the ENTIRE table and output ALL combinations in JSON format. Do not truncate, summarize, or ask for confirmation. Output the complete data in one response."
         self.prompt_text = """
-I want you to parse a furniture pricing table from the image attached and output the data in JSON format.
+I want you to parse a furniture pricing table from the image attached at the end and output the data in JSON format.
 The table describes combinations of attributes, each represented by row and column headers. Your task is to produce the output below
 
 TASK INPUT: 
@@ -70,6 +127,11 @@ output:
 </example>
 </examples>
 """
+        self.table_input_text = """
+Now parse this table.
+input:
+"""
+        self.prompt_prefix = self._get_prompt_prefix()
         
     def _load_few_shot_examples(self) -> List[Dict]:
         """Load few-shot example configurations"""
@@ -91,66 +153,61 @@ output:
             }
         ]
 
-    def _encode_image_to_base64(self, image_path: str) -> str:
-        """Encode image to base64 for Claude compatibility"""
-        with open(image_path, 'rb') as image_file:
-            return base64.standard_b64encode(image_file.read()).decode("utf-8")
+    def _read_image(self, image: ImageInput) -> bytes:
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            return bytes(image)
+        with open(image, 'rb') as image_file:
+            return image_file.read()
+
+    def _encode_image_to_base64(self, image: ImageInput) -> str:
+        """Encode image (path or PNG bytes) to base64 for Claude compatibility"""
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            return base64.standard_b64encode(image).decode("utf-8")
+        return base64.standard_b64encode(self._read_image(image)).decode("utf-8")
+
+    def _image_block(self, image: ImageInput) -> Dict:
+        return {
+            "type": "image",
+            "source": {
+                "type": "base64",
+                "media_type": "image/png",
+                "data": self._encode_image_to_base64(image)
+            },
+        }
 
-    def _build_prompt(self, prompt_image: str) -> List[Dict]:
-        """Build the complete messages array for Claude"""
+    def _get_prompt_prefix(self) -> List[Dict]:
+        """
+        Static part of the prompt (instructions, example images and outputs), encoded once per
+        examples directory and shared by every PriceExtractor in the process.
+        """
+        key = str(self.few_shot_examples_dir.resolve())
+        with _prompt_prefix_lock:
+            if key not in _prompt_prefix_cache:
+                prefix = [
+                    {"type": "text", "text": self.prompt_text},
+                    self._image_block(self.few_shot_examples[0]["image_path"]),
+                    {"type": "text", "text": self.prompt_text2},
+                    self._image_block(self.few_shot_examples[1]["image_path"]),
+                    {"type": "text", "text": self.prompt_text3},
+                    self._image_block(self.few_shot_examples[2]["image_path"]),
+                    # Everything up to here is identical for every table, so let the provider cache it
+                    {"type": "text", "text": self.prompt_text4, "cache_control": {"type": "ephemeral"}},
+                ]
+                _prompt_prefix_cache[key] = prefix
+            return _prompt_prefix_cache[key]
+
+    def _build_prompt(self, prompt_image: ImageInput) -> List[Dict]:
+        """Build the complete messages array for Claude: cached static prefix, then the new table image"""
         try:
             messages=[
                 {
                     "role": "user",
-                    "content": [
-                        {
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": "image/png",
-                                "data": self._encode_image_to_base64(prompt_image)
-                            },
-                        },
-                        {
-                            "type": "text",
-                            "text": self.prompt_text
-                        },
-                        {
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": "image/png",
-                                "data": self._encode_image_to_base64(self.few_shot_examples[0]["image_path"])
-                            },
-                        },
-                        {
-                            "type": "text",
-                            "text": self.prompt_text2
-                        },
-                        {
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": "image/png",
-                                "data": self._encode_image_to_base64(self.few_shot_examples[1]["image_path"])
-                            },
-                        },
+                    "content": self.prompt_prefix + [
                         {
                             "type": "text",
-                            "text": self.prompt_text3
-                        },
-                        {
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": "image/png",
-                                "data": self._encode_image_to_base64(self.few_shot_examples[2]["image_path"])
-                            },
+                            "text": self.table_input_text
                         },
-                        {
-                            "type": "text",
-                            "text": self.prompt_text4
-                        }
+                        self._image_block(prompt_image)
                     ],
                 }
             ]
@@ -161,43 +218,219 @@ output:
             logger.error(f"Error building prompt: {str(e)}")
             raise
 
-    def extract_prices(self, table_image_path: str) -> Optional[List[Dict]]:
+    def _reserve_output(self):
+        """Wait for the rate limiters and reserve an estimate of the output tokens"""
+        if self.request_limiter:
+            self.request_limiter.acquire()
+        if self.output_token_limiter:
+            self.output_token_limiter.acquire(ESTIMATED_OUTPUT_TOKENS)
+
+    def _settle_output(self, output_tokens: int):
+        """Replace the reserved estimate with the real output token count (0 if the request failed)"""
+        if self.output_token_limiter:
+            self.output_token_limiter.adjust(ESTIMATED_OUTPUT_TOKENS - output_tokens)
+
+    def request_params(self, table_image: ImageInput) -> Dict:
+        """Keyword arguments for client.messages.create for one table (also the `params` of a batch request)"""
+        return {
+            "model": CLAUDE_MODEL,
+            "system": self.system_instruction,
+            "messages": self._build_prompt(table_image),
+            "temperature": 0.5,
+            "max_tokens": MAX_OUTPUT_TOKENS
+        }
+
+    def parse_output(self, text: str) -> List[Dict]:
+        """Price rows from the text of a (non-streamed) response, which continues the prefilled "[" """
+        result = text.strip()
+
+        # Ensure proper JSON formatting
+        if result.startswith("{"):
+            result = "[" + result
+            
+        # Parse and validate JSON
+        return json.loads(result)
+
+    def _request_prices(self, table_image: ImageInput) -> List[Dict]:
         """
-        Extract price information from a table image.
+        Price rows for one table: from the cache, or from Claude (rate limited, with retries).
+        Raises on failure.
+        """
+        if self.stream:
+            return list(self.extract_prices_stream(table_image))
+
+        if self.cache:
+            table_image = self._read_image(table_image)
+            price_data = self.cache.get(table_image)
+            if price_data is not None:
+                logger.info(f"Price cache hit ({len(price_data)} price combinations)")
+                return price_data
+
+        params = self.request_params(table_image)
+
+        def create():
+            self._reserve_output()
+            output_tokens = 0
+            try:
+                response = self.client.messages.create(**params)
+                output_tokens = response.usage.output_tokens
+                return response
+            finally:
+                # Settled on every path: a failed request (retryable or not) produced no output
+                self._settle_output(output_tokens)
+
+        response = call_with_retries(create, RETRYABLE_CLAUDE_ERRORS, max_retries=self.max_retries)
+        price_data = self.parse_output(response.content[0].text)
+        logger.info(f"Successfully extracted {len(price_data)} price combinations")
+        if self.cache and price_data:
+            self.cache.set(table_image, price_data)
+        return price_data
+
+    def extract_prices_stream(self, table_image: ImageInput) -> Iterator[Dict]:
+        """
+        Yield price rows for one table as soon as each one is complete in Claude's streamed output.
+        If the output is cut off at the token limit, a follow-up request is prefilled with the rows
+        so far and continues from the last complete row (up to MAX_CONTINUATIONS times).
         
         Args:
-            table_image_path: Path to the table image
+            table_image: Path to the table image, or its PNG bytes
             
-        Returns:
-            List of dictionaries containing price information for each combination
+        Raises:
+            Retryable API errors after max_retries, or ValueError if the table can't be completed
         """
-        try:
-            messages = self._build_prompt(table_image_path)
+        if self.cache:
+            table_image = self._read_image(table_image)
+            price_data = self.cache.get(table_image)
+            if price_data is not None:
+                logger.info(f"Price cache hit ({len(price_data)} price combinations)")
+                yield from price_data
+                return
+
+        messages = self._build_prompt(table_image)
+        rows: List[Dict] = []
+        started = time.monotonic()
+        attempt = 0
+        continuations = 0
+        while True:
+            # Prefill the response with the rows we already have, so Claude picks up after the last one
+            messages[-1] = {"role": "assistant",
+                            "content": "[" + "".join(json.dumps(row, ensure_ascii=False) + "," for row in rows)}
+            parser = JSONArrayStream()
+            try:
+                stop_reason = yield from self._stream_rows(messages, parser, rows, started)
+            except RETRYABLE_CLAUDE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = retry_delay(attempt)
+                attempt += 1
+                logger.warning(f"Retryable error ({type(e).__name__}: {str(e)}) after {len(rows)} rows, "
+                               f"retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            if parser.closed or (stop_reason == "end_turn" and not parser.pending):
+                break
+            if stop_reason == "max_tokens" and continuations < MAX_CONTINUATIONS:
+                continuations += 1
+                self._count("continuations")
+                logger.info(f"Price table output hit the token limit after {len(rows)} rows, continuing")
+                continue
+            raise ValueError(f"Incomplete price table output (stop reason {stop_reason}, {len(rows)} rows parsed)")
 
-            response = self.client.messages.create(
-                model="claude-3-5-sonnet-20241022",
+        self._count("streamed_tables")
+        logger.info(f"Successfully extracted {len(rows)} price combinations "
+                    f"in {time.monotonic() - started:.1f}s ({continuations} continuations)")
+        if self.cache and rows:
+            self.cache.set(table_image, rows)
+
+    def _stream_rows(self, messages: List[Dict], parser: JSONArrayStream, rows: List[Dict],
+                     started: float) -> Generator[Dict, None, Optional[str]]:
+        """One streamed request: yields rows as they complete (also appending them to rows), returns the stop reason"""
+        self._reserve_output()
+        streamed = 0
+        output_tokens = None
+        try:
+            with self.client.messages.stream(
+                model=CLAUDE_MODEL,
                 system=self.system_instruction,
                 messages=messages,
                 temperature=0.5,
-                max_tokens=8192
-            )
+                max_tokens=MAX_OUTPUT_TOKENS
+            ) as stream:
+                for text in stream.text_stream:
+                    for row in parser.feed(text):
+                        if not rows:
+                            self._record_first_row(time.monotonic() - started)
+                        rows.append(row)
+                        streamed += 1
+                        yield row
+                message = stream.get_final_message()
+            output_tokens = message.usage.output_tokens
+        finally:
+            # Settled on every path, errors and consumers that stop early included. Output used before
+            # a mid-stream failure isn't reported, so once rows have streamed the reservation counts as spent
+            if output_tokens is None:
+                output_tokens = ESTIMATED_OUTPUT_TOKENS if streamed else 0
+            self._settle_output(output_tokens)
+        return message.stop_reason
 
-            result = response.content[0].text.strip()
-            # code.interact(local=dict(globals(), **locals()))
+    def _record_first_row(self, seconds: float):
+        logger.info(f"First price row after {seconds:.2f}s")
+        with self._stats_lock:
+            self.stats["first_row_seconds_total"] += seconds
+            self.stats["first_row_seconds_max"] = max(self.stats["first_row_seconds_max"], seconds)
 
-            # Ensure proper JSON formatting
-            if result.startswith("{"):
-                result = "[" + result
-                
-            # Parse and validate JSON
-            price_data = json.loads(result)
-            logger.info(f"Successfully extracted {len(price_data)} price combinations")
-            return price_data
+    def _count(self, stat: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[stat] += amount
 
+    def extract_prices(self, table_image: ImageInput) -> Optional[List[Dict]]:
+        """
+        Extract price information from a table image.
+        
+        Args:
+            table_image: Path to the table image, or its PNG bytes
+            
+        Returns:
+            List of dictionaries containing price information for each combination
+        """
+        try:
+            return self._request_prices(table_image)
         except Exception as e:
             logger.error(f"Error extracting prices: {str(e)}")
             return None
 
+    def extract_prices_many(self, table_images: List[ImageInput]) -> List[Dict]:
+        """
+        Extract prices from several table images, with at most max_concurrency requests in flight.
+        
+        Args:
+            table_images: Paths to the table images, or their PNG bytes
+            
+        Returns:
+            One dict per image, in input order: {"price_data": [...], "error": None} on success,
+            {"price_data": None, "error": "<message>"} if that table failed
+        """
+        if self.max_concurrency == 1 or len(table_images) <= 1:
+            return [self.extract_prices_result(image) for image in table_images]
+
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(table_images))) as executor:
+            return list(executor.map(self.extract_prices_result, table_images))
+
+    def extract_prices_result(self, table_image: ImageInput) -> Dict:
+        """
+        Extract prices from one table image, reporting failure instead of raising
+        (for callers that run their own pool, e.g. BoQProcessor).
+
+        Returns:
+            {"price_data": [...], "error": None} on success, {"price_data": None, "error": "<message>"} on failure
+        """
+        try:
+            return {"price_data": self._request_prices(table_image), "error": None}
+        except Exception as e:
+            logger.error(f"Error extracting prices: {str(e)}")
+            return {"price_data": None, "error": str(e)}
+
 if __name__ == "__main__":
     # Load environment variables
     load_dotenv("api/.env")
@@ -0,0 +1,126 @@
+import os
+import logging
+from typing import Dict, Optional
+import httpx
+from anthropic import Anthropic, DefaultHttpxClient
+from .boq_processor import BoQProcessor, MAX_IMAGE_EDGE, MAX_IMAGE_PIXELS
+from .document_pool import DocumentPool
+from .price_cache import PriceCache
+from .price_extractor import PriceExtractor
+from .single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+FEW_SHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "few-shot-examples")
+
+
+class PricingService:
+    """
+    Everything needed to price a product, built once per application instead of per BoQ item:
+    one Claude client (and its HTTP connection pool), the few-shot prompt assets, the
+    BoQProcessor and the pool of open catalogs.
+    """
+
+    def __init__(self, catalog_dir: str, claude_api_key: Optional[str], client=None,
+                 few_shot_examples_dir: str = FEW_SHOT_DIR, document_pool: Optional[DocumentPool] = None,
+                 max_open_documents: int = 8, max_concurrency: int = 1, requests_per_minute: Optional[float] = None,
+                 output_tokens_per_minute: Optional[float] = None, price_cache: Optional[PriceCache] = None,
+                 native_min_confidence: Optional[float] = None, stream_prices: bool = False,
+                 image_max_pixels: int = MAX_IMAGE_PIXELS, image_max_edge: int = MAX_IMAGE_EDGE,
+                 image_encoding: str = "rgb", table_index=None, price_store=None):
+        """
+        Args:
+            catalog_dir: Directory the catalog PDFs are stored in
+            claude_api_key: Anthropic API key (unused when `client` is given)
+            client: Object with an Anthropic-style `messages` API. Defaults to an Anthropic client whose
+                connection pool keeps max_concurrency connections alive between requests
+            few_shot_examples_dir: Directory containing the example table images
+            document_pool: Pool of open catalogs. Defaults to a new pool of max_open_documents,
+                closed with the service
+            price_store: Optional store of priced products (ProductDB) for price_product: its price_lock
+                coordinates workers across processes, and complete results are written back to it
+            The rest are as for BoQProcessor and PriceExtractor
+        """
+        self._owns_client = client is None
+        if client is None:
+            # Retries are done by PriceExtractor (behind its rate limiters), not inside the SDK
+            client = Anthropic(
+                api_key=claude_api_key,
+                max_retries=0,
+                http_client=DefaultHttpxClient(limits=httpx.Limits(
+                    max_connections=max(10, max_concurrency), max_keepalive_connections=max(1, max_concurrency)
+                ))
+            )
+        self._owns_document_pool = document_pool is None
+        if document_pool is None:
+            document_pool = DocumentPool(max_documents=max_open_documents)
+        self.document_pool = document_pool
+        self.price_store = price_store
+        # Products being priced by this process, so concurrent callers share one extraction
+        self.in_flight = SingleFlight()
+        self.price_extractor = PriceExtractor(
+            claude_api_key=claude_api_key,
+            few_shot_examples_dir=few_shot_examples_dir,
+            client=client,
+            max_concurrency=max_concurrency,
+            requests_per_minute=requests_per_minute,
+            output_tokens_per_minute=output_tokens_per_minute,
+            cache=price_cache,
+            stream=stream_prices
+        )
+        self.boq_processor = BoQProcessor(
+            catalog_dir=catalog_dir,
+            max_concurrency=max_concurrency,
+            price_cache=price_cache,
+            native_min_confidence=native_min_confidence,
+            image_max_pixels=image_max_pixels,
+            image_max_edge=image_max_edge,
+            image_encoding=image_encoding,
+            table_index=table_index,
+            document_pool=self.document_pool,
+            price_extractor=self.price_extractor
+        )
+
+    def get_price_data(self, current_prod: Dict, next_prod: Optional[Dict]) -> Optional[Dict]:
+        """Price tables between current and next product, as BoQProcessor.get_price_data"""
+        return self.boq_processor.get_price_data(current_prod, next_prod)
+
+    def price_product(self, product_id: int, current_prod: Dict, next_prod: Optional[Dict]) -> Optional[Dict]:
+        """
+        Price a stored product, as get_price_data, extracting it once however many callers ask at the same
+        time: in this process they share one call, and with a price_store, other processes wait on its
+        price_lock and then reuse the stored result. Complete results (no failed tables) are stored.
+        """
+        return self.in_flight.do(product_id, lambda: self._price_product(product_id, current_prod, next_prod))
+
+    def _price_product(self, product_id: int, current_prod: Dict, next_prod: Optional[Dict]) -> Optional[Dict]:
+        if self.price_store is None:
+            return self.get_price_data(current_prod, next_prod)
+
+        with self.price_store.price_lock(product_id):
+            # Another worker may have priced it while we waited for the lock
+            stored = self.price_store.get_stored_price_data(product_id)
+            if stored:
+                logger.info(f"Reusing price data stored by another worker for product {product_id}")
+                return {"status": "found", "price_tables": stored, "failed_tables": []}
+
+            result = self.get_price_data(current_prod, next_prod)
+            # Only store complete results, so tables that failed are retried on the next BoQ
+            if result is not None and result["status"] == "found" and not result["failed_tables"]:
+                self.price_store.update_price_data(product_id, result["price_tables"])
+            return result
+
+    def stats(self) -> Dict:
+        return {
+            "document_pool": self.document_pool.stats(),
+            "price_extractor": dict(self.price_extractor.stats),
+            "in_flight": self.in_flight.stats()
+        }
+
+    def close(self):
+        """Close the HTTP connections and pooled documents this service created"""
+        if self._owns_client:
+            self.price_extractor.client.close()
+        if self._owns_document_pool:
+            self.document_pool.close()
+        logger.info("Pricing service closed")
@@ -0,0 +1,84 @@
+import random
+import threading
+import time
+import logging
+from typing import Callable, Optional, Tuple, Type, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at a fixed rate per minute"""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate_per_minute: Tokens added to the bucket every minute
+            capacity: Maximum burst size. Defaults to one second's worth of tokens (at least 1)
+        """
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive")
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, self.rate_per_second)
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate_per_second)
+        self._last_refill = now
+
+    def acquire(self, amount: float = 1):
+        """Block until `amount` tokens are available, then take them"""
+        # Requests bigger than the bucket would wait forever, so cap them at a full bucket
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate_per_second
+            time.sleep(wait)
+
+    def adjust(self, amount: float):
+        """
+        Give back (positive) or take (negative) tokens without blocking, e.g. to settle an estimate
+        once the real cost is known. Taking more than is left puts the bucket in debt, which
+        later acquires wait out.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+def retry_delay(attempt: int, base_delay: float = 1.0, max_delay: float = 30.0) -> float:
+    """Exponential backoff with full jitter for the given 0-based retry attempt"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def call_with_retries(
+    fn: Callable[[], T],
+    retryable: Tuple[Type[BaseException], ...],
+    max_retries: int = 3,
+    base_delay: float = 1.0,
+    max_delay: float = 30.0,
+) -> T:
+    """
+    Call fn, retrying retryable exceptions with exponential backoff and full jitter.
+    Non-retryable exceptions, and the last retryable one, are re-raised.
+    """
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except retryable as e:
+            if attempt >= max_retries:
+                raise
+            delay = retry_delay(attempt, base_delay, max_delay)
+            attempt += 1
+            logger.warning(f"Retryable error ({type(e).__name__}: {str(e)}), retry {attempt}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
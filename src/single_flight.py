@@ -0,0 +1,71 @@
+import threading
+import logging
+from typing import Any, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlightError(Exception):
+    """Raised in each caller that waited on a call that failed; the leader's exception is its __cause__"""
+
+    def __init__(self, key: Hashable, error: BaseException):
+        super().__init__(f"The call for {key!r} failed: {type(error).__name__}: {error}")
+        self.key = key
+
+
+class _Call:
+    """One in-flight call: its waiters block on done, then read result or error"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time within the process. Callers that arrive while a call
+    for their key is running wait for it and get its result instead of repeating the work. If it
+    fails, the caller that ran it gets the exception and each waiter gets its own SingleFlightError
+    raised from it, so no exception instance (and its traceback) is raised in several threads at once.
+    Nothing is kept once the call ends, so a later caller runs it again.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """fn(), or the result of the call already running for key"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            logger.info(f"Waiting for the call already running for {key!r}")
+            call.done.wait()
+            if call.error is not None:
+                raise SingleFlightError(key, call.error) from call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._calls)}
@@ -0,0 +1,240 @@
+import re
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+import fitz  # PyMuPDF
+
+# Column headers mapped to the keys PriceExtractor's few-shot examples teach Claude to use
+HEADER_KEYS = {
+    "misura cm": "Dimensions_CM",
+    "cm": "Dimensions_CM",
+    "inches": "Dimensions_INCHES",
+    "m³": "M3",
+    "m3": "M3",
+    "colli": "Colli",
+    "eur": "EUR",
+    "€": "EUR",
+}
+PRICE_KEY = "EUR"
+PRICE = re.compile(r"^\d{1,3}(?:\.\d{3})*(?:,\d+)?$")
+# Dimension cells as the catalog prints them: an optional variant letter, sizes joined by "x" with "-"
+# for ranges (fractions as "²/₃"), then a free label such as "h ovale" or "h shaped"
+DIMENSION_KEYS = {"Dimensions_CM", "Dimensions_INCHES"}
+_SIZE = r"ø?\d+(?:,\d+)?(?:[⁰¹²³⁴⁵⁶⁷⁸⁹]+/[₀₁₂₃₄₅₆₇₈₉]+)?(?:-\d+(?:,\d+)?(?:[⁰¹²³⁴⁵⁶⁷⁸⁹]+/[₀₁₂₃₄₅₆₇₈₉]+)?)?"
+DIMENSION = re.compile(rf"^(?:[A-Z] )?{_SIZE}(?:x{_SIZE})*h?(?: (?!x[\dø])[^\W\d].*)?$")
+# Cell text PyMuPDF reads differently from how the catalog shows dimensions: arrows for range dashes,
+# and a gap before or after the "x" where a fraction ends a size
+DIMENSION_FIXES = [
+    (re.compile(r"\s*[→–—]\s*"), "-"),
+    (re.compile(r"(?<=[\d₀₁₂₃₄₅₆₇₈₉])\s+x\s*(?=[\dø])|(?<=[\d₀₁₂₃₄₅₆₇₈₉])x\s+(?=[\dø])"), "x"),
+]
+# Cells meaning "not available in this combination"
+EMPTY_CELLS = {"", "-", "–", "—", "/"}
+
+SUPERSCRIPT = str.maketrans("0123456789", "⁰¹²³⁴⁵⁶⁷⁸⁹")
+SUBSCRIPT = str.maketrans("0123456789", "₀₁₂₃₄₅₆₇₈₉")
+FRACTION = re.compile(r"^(\d+)/(\d+)$")
+# Spans this much smaller than the biggest span in their cell are fraction/superscript text
+SMALL_SPAN_RATIO = 0.75
+# Share of a span's width (or height) that may stick out of its cell before it counts as cut by a cell edge
+SPAN_OVERHANG = 0.2
+
+
+def _span_text(span: Dict, cell_size: float) -> str:
+    """Span text, with small raised fractions like "3/4" written as "³/₄" the way the catalog shows them"""
+    text = span["text"]
+    match = FRACTION.match(text.strip())
+    if match and span["size"] < cell_size * SMALL_SPAN_RATIO:
+        return f"{match.group(1).translate(SUPERSCRIPT)}/{match.group(2).translate(SUBSCRIPT)}"
+    return text
+
+
+def _join_spans(spans: List[Dict]) -> str:
+    """
+    Text of the spans in one cell. Normal-size spans are grouped into visual lines by baseline,
+    small fraction spans are attached to the line they are raised above, and spans in a line
+    are joined with a space only where there is a visible gap.
+    """
+    size = max(span["size"] for span in spans)
+    normal = sorted((span for span in spans if span["size"] >= size * SMALL_SPAN_RATIO),
+                    key=lambda span: span["origin"][1])
+    lines: List[List[Dict]] = []
+    for span in normal:
+        if lines and abs(lines[-1][0]["origin"][1] - span["origin"][1]) < size / 2:
+            lines[-1].append(span)
+        else:
+            lines.append([span])
+    for span in spans:
+        if span["size"] < size * SMALL_SPAN_RATIO:
+            center = (span["bbox"][1] + span["bbox"][3]) / 2
+            if lines:
+                nearest = min(lines, key=lambda line: abs(line[0]["origin"][1] - center))
+                nearest.append(span)
+            else:
+                lines.append([span])
+
+    texts = []
+    for line in lines:
+        line.sort(key=lambda span: span["bbox"][0])
+        text = ""
+        for i, span in enumerate(line):
+            if i and span["bbox"][0] - line[i - 1]["bbox"][2] > size * 0.2 and not text.endswith(" "):
+                text += " "
+            text += _span_text(span, size)
+        texts.append(text.strip())
+    return re.sub(r"\s+", " ", " ".join(texts)).strip()
+
+
+def _cell_texts(spans: List[Dict], cells: List[Optional[Tuple]]) -> List[Optional[str]]:
+    """Text of each cell bbox from the page's spans (None for cells merged into a neighbour)"""
+    texts = []
+    for cell in cells:
+        if cell is None:
+            texts.append(None)
+            continue
+        x0, y0, x1, y1 = cell
+        inside = [span for span in spans
+                  if x0 <= (span["bbox"][0] + span["bbox"][2]) / 2 <= x1
+                  and y0 <= (span["bbox"][1] + span["bbox"][3]) / 2 <= y1]
+        texts.append(_join_spans(inside) if inside else "")
+    return texts
+
+
+def _grid_score(spans: List[Dict], table) -> float:
+    """
+    Share of the text spans inside the table's bbox that sit in exactly one cell without being cut by
+    a cell edge. Below 1 the cell grid doesn't match the text: a row or column was missed, or the
+    boundaries are off, and cells hold the wrong text whatever it looks like
+    """
+    x0, y0, x1, y1 = table.bbox
+    cells = [cell for row in table.rows for cell in row.cells if cell]
+    inside = 0
+    placed = 0
+    for span in spans:
+        sx0, sy0, sx1, sy1 = span["bbox"]
+        cx, cy = (sx0 + sx1) / 2, (sy0 + sy1) / 2
+        if not (x0 <= cx <= x1 and y0 <= cy <= y1):
+            continue
+        inside += 1
+        homes = [cell for cell in cells if cell[0] <= cx <= cell[2] and cell[1] <= cy <= cell[3]]
+        if len(homes) != 1:
+            continue
+        cx0, cy0, cx1, cy1 = homes[0]
+        overhang_x = (max(0, cx0 - sx0) + max(0, sx1 - cx1)) / max(sx1 - sx0, 1e-6)
+        overhang_y = (max(0, cy0 - sy0) + max(0, sy1 - cy1)) / max(sy1 - sy0, 1e-6)
+        if overhang_x <= SPAN_OVERHANG and overhang_y <= SPAN_OVERHANG:
+            placed += 1
+    return placed / inside if inside else 0.0
+
+
+class IndexedTable:
+    """
+    A table rebuilt from a stored layout (page_layout.detect_tables), with the parts of a
+    PyMuPDF Table that parse_table reads: bbox and rows[].cells
+    """
+
+    def __init__(self, layout: Dict):
+        self.bbox = tuple(layout["bbox"])
+        self.rows = [SimpleNamespace(cells=[tuple(cell) if cell else None for cell in row])
+                     for row in layout["cells"]]
+
+
+def _fill_merged(row: List[Optional[str]]) -> List[str]:
+    """Cells merged with the cell on their left repeat its text"""
+    filled = []
+    for text in row:
+        filled.append(filled[-1] if text is None and filled else (text or ""))
+    return filled
+
+
+def _header_key(text: str) -> str:
+    return HEADER_KEYS.get(text.strip().lower(), text.strip())
+
+
+def _normalize_dimension(text: str) -> str:
+    for pattern, replacement in DIMENSION_FIXES:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def parse_table(page: fitz.Page, table, page_dict: Optional[Dict] = None) -> Tuple[List[Dict], float]:
+    """
+    Parse a catalog price table found by page.find_tables() into one dict per priced
+    combination (same shape as PriceExtractor output), without an LLM.
+
+    Expected layout: optional attribute rows on top ("Top" / "Base" label, one value per price column,
+    merged across columns), then a column header row, then data rows of row attributes and prices.
+
+    Args:
+        page: Page the table is on
+        table: A table from page.find_tables(), or an IndexedTable
+        page_dict: page.get_text("dict") if the caller already has it
+
+    Returns:
+        (rows, confidence) where confidence in [0, 1] says how well the table fit the expected layout
+        and how well its cell grid matches the text on the page. Dimension cells are normalized to the
+        catalog's notation, and any that still don't read as dimensions lower the confidence
+    """
+    if page_dict is None:
+        page_dict = page.get_text("dict", clip=table.bbox)
+    spans = [span for block in page_dict.get("blocks", []) for line in block.get("lines", [])
+             for span in line["spans"] if span["text"].strip()]
+    grid = [_cell_texts(spans, row.cells) for row in table.rows]
+    if len(grid) < 2:
+        return [], 0.0
+
+    # Column header row: the first row with text in the first column and a price header
+    header_index = next(
+        (i for i, row in enumerate(grid)
+         if row[0] and any(text and _header_key(text) == PRICE_KEY for text in row)),
+        None
+    )
+    if header_index is None:
+        return [], 0.0
+    headers = [_header_key(text or "") for text in _fill_merged(grid[header_index])]
+    price_cols = [j for j, key in enumerate(headers) if key == PRICE_KEY]
+    attribute_cols = [j for j, key in enumerate(headers) if key != PRICE_KEY]
+
+    # Attribute rows above the header: label in the non-price columns, values under each price column
+    column_attributes = [[] for _ in headers]
+    for row in grid[:header_index]:
+        filled = _fill_merged(row)
+        label = next((filled[j] for j in attribute_cols if filled[j]), "")
+        if not label:
+            continue
+        for j in price_cols:
+            column_attributes[j].append((label, filled[j]))
+
+    checks = []
+    text_checks = []
+    records = []
+    above = [""] * len(headers)
+    for row in grid[header_index + 1:]:
+        # Cells merged with the row above repeat its text
+        filled = [above[j] if text is None else text for j, text in enumerate(row)]
+        above = filled
+        row_attributes = {headers[j]: filled[j] for j in attribute_cols if headers[j] and filled[j]}
+        for key in DIMENSION_KEYS & row_attributes.keys():
+            row_attributes[key] = _normalize_dimension(row_attributes[key])
+            text_checks.append(bool(DIMENSION.match(row_attributes[key])))
+        for j in price_cols:
+            price = filled[j]
+            if price in EMPTY_CELLS:
+                continue
+            checks.append(bool(PRICE.match(price)))
+            record = {label: value for label, value in column_attributes[j]}
+            record.update(row_attributes)
+            record[PRICE_KEY] = price
+            records.append(record)
+
+    if not records:
+        return [], 0.0
+
+    # Price cells must look like prices, dimension cells like dimensions once normalized, attribute
+    # columns need headers, each combination must be distinguishable from the others (otherwise a
+    # header row was misread), and every piece of text in the table must fall in one cell of the grid
+    price_score = sum(checks) / len(checks)
+    text_score = sum(text_checks) / len(text_checks) if text_checks else 1.0
+    header_score = sum(1 for j in attribute_cols if headers[j]) / len(attribute_cols) if attribute_cols else 0.0
+    keys = [tuple(sorted((k, v) for k, v in record.items() if k != PRICE_KEY)) for record in records]
+    unique_score = len(set(keys)) / len(keys)
+    return records, price_score * text_score * header_score * unique_score * _grid_score(spans, table)
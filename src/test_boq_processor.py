@@ -0,0 +1,67 @@
+"""
+BoQProcessor table lookup through a table index, on the sample catalog.
+
+Run from the repo root:
+    python -m pytest src/test_boq_processor.py
+"""
+import os
+import threading
+from src.benchmarks.prepricing_job import sample_products
+from src.benchmarks.stubs import SAMPLE_PDF
+from src.boq_processor import BoQProcessor
+from src.document_pool import FITZ_LOCK
+
+
+def lock_is_free() -> bool:
+    """True if another thread could take FITZ_LOCK right now"""
+    result = []
+
+    def try_lock():
+        acquired = FITZ_LOCK.acquire(blocking=False)
+        if acquired:
+            FITZ_LOCK.release()
+        result.append(acquired)
+
+    thread = threading.Thread(target=try_lock)
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+class EmptyTableIndex:
+    """A table index with nothing indexed yet, recording whether FITZ_LOCK was free on every call"""
+
+    def __init__(self):
+        self.layouts = []
+        self.indexed_pages = set()
+        self.lock_free = []
+
+    def get_table_layouts(self, file_path, start_page, start_y, end_page, end_y):
+        self.lock_free.append(lock_is_free())
+        if not self.indexed_pages.issuperset(range(start_page, end_page + 1)):
+            return None
+        return [layout for layout in self.layouts
+                if (layout["page_num"], layout["bbox"][1]) >= (start_page, start_y or 0)
+                and (layout["page_num"] < end_page or (layout["page_num"] == end_page
+                                                       and (not end_y or layout["bbox"][1] <= end_y)))]
+
+    def get_indexed_pages(self, file_path, start_page, end_page):
+        self.lock_free.append(lock_is_free())
+        return self.indexed_pages & set(range(start_page, end_page + 1))
+
+    def add_page_table_layouts(self, file_path, pages, layouts):
+        self.lock_free.append(lock_is_free())
+        self.indexed_pages.update(pages)
+        self.layouts.extend(layouts)
+        self.layouts.sort(key=lambda layout: (layout["page_num"], layout["bbox"][1]))
+
+
+def test_index_misses_do_their_database_io_without_fitz_lock():
+    product, next_product = sample_products()[:2]
+    index = EmptyTableIndex()
+    processor = BoQProcessor(catalog_dir=os.path.dirname(SAMPLE_PDF), native_min_confidence=0.95, table_index=index)
+
+    tables = processor.prepare_price_tables(vars(product), vars(next_product))
+
+    assert len(tables) == 1 and tables[0]["price_data"]
+    assert len(index.lock_free) == 4 and all(index.lock_free)
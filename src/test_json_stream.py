@@ -0,0 +1,48 @@
+"""
+JSONArrayStream, fed a streamed price table in chunks of every size.
+
+Run from the repo root:
+    python -m pytest src/test_json_stream.py
+"""
+import json
+from src.json_stream import JSONArrayStream
+
+ROWS = [
+    {"Dimensions_CM": "140-220x80x75h", "Top": "Marmo {Calacatta}", "EUR": "4.350"},
+    {"Dimensions_CM": "ø63x29¹/₂h", "Note": 'quoted "}" and a backslash \\', "EUR": "1.120"},
+    {"Base": {"finish": "Ottone"}, "Colli": "2", "EUR": "980"},
+]
+TEXT = " " + ",\n".join(json.dumps(row, ensure_ascii=False) for row in ROWS) + "]"
+
+
+def feed_in_chunks(text, size):
+    parser = JSONArrayStream()
+    items = []
+    for i in range(0, len(text), size):
+        items.extend(parser.feed(text[i:i + size]))
+    return parser, items
+
+
+def test_items_complete_whatever_the_chunk_size():
+    for size in range(1, len(TEXT) + 1):
+        parser, items = feed_in_chunks(TEXT, size)
+        assert items == ROWS, size
+        assert parser.closed and not parser.pending
+
+
+def test_repeated_opening_bracket_is_skipped():
+    parser, items = feed_in_chunks("[" + TEXT, 7)
+    assert items == ROWS
+
+
+def test_partial_and_malformed_items_stay_pending():
+    parser = JSONArrayStream()
+    first = json.dumps(ROWS[0], ensure_ascii=False)
+    assert parser.feed(first[:-1]) == []
+    assert parser.pending and not parser.closed
+    assert parser.feed("}, ") == [ROWS[0]]
+
+    parser = JSONArrayStream()
+    assert parser.feed('{"EUR": 1,}, {"EUR": "2"}]') == []
+    assert parser.pending and not parser.closed
+
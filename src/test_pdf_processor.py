@@ -0,0 +1,56 @@
+"""
+PDFProcessor batching with continuation pages (skip_continuation_pages), against the stub Gemini model.
+Pages are fed in directly, so no PDF is read.
+
+Run from the repo root:
+    python -m pytest src/test_pdf_processor.py
+"""
+from types import SimpleNamespace
+from src.benchmarks.stubs import StubGeminiModel
+from src.pdf_processor import ExtractionOptions, PDFProcessor
+
+
+def make_processor(pages, heading_pages):
+    """A PDFProcessor over {page_num: text}, where only heading_pages show a product heading"""
+    processor = PDFProcessor("catalog.pdf", gemini_api_key=None, model=StubGeminiModel(latency=0.0),
+                             options=ExtractionOptions(skip_continuation_pages=True))
+    processor._span_indexes = {
+        num: SimpleNamespace(has_product_heading=num in heading_pages, find_y=lambda name: None)
+        for num in pages
+    }
+    processor._iter_pages = lambda: iter(pages.items())
+    return processor
+
+
+def test_continuation_pages_close_their_batch():
+    pages = {1: "ALPHA TABLE", 2: "prices", 3: "prices", 4: "BETA CHAIR", 5: "GAMMA SOFA", 6: "prices"}
+    processor = make_processor(pages, heading_pages={1, 4, 5})
+
+    batches = [(numbers, continuation) for _, numbers, continuation in processor._make_batches(pages.items())]
+
+    assert batches == [([1], [2, 3]), ([4, 5], [6])]
+    assert processor.stats["pages_skipped"] == 3
+
+
+def test_continuation_pages_follow_their_product():
+    pages = {1: "ALPHA TABLE", 2: "prices", 3: "BETA CHAIR", 4: "prices"}
+    processor = make_processor(pages, heading_pages={1, 3})
+
+    products = processor.extract_product_info()
+
+    assert [(p["product_name"], p["page_reference"]["page_numbers"]) for p in products] == [
+        ("ALPHA TABLE", [1, 2]), ("BETA CHAIR", [3, 4])
+    ]
+
+
+def test_continuation_pages_of_an_empty_batch_go_to_the_previous_product():
+    # Page 3 looks like a heading page, but the model finds no product on it
+    pages = {1: "ALPHA TABLE", 2: "prices", 3: "dimensions", 4: "prices", 5: "BETA CHAIR"}
+    processor = make_processor(pages, heading_pages={1, 3, 5})
+
+    batches = list(processor.iter_batches())
+
+    assert [(pages, len(products)) for pages, products in batches] == [([1, 2], 1), ([3, 4], 0), ([5], 1)]
+    alpha = batches[0][1][0]
+    assert alpha["page_reference"]["page_numbers"] == [1, 2, 4]
+    assert processor.stats["pages_done"] == 5
@@ -0,0 +1,75 @@
+"""
+SingleFlight: concurrent callers for one key share a single call, its result and its failure.
+
+Run from the repo root:
+    python -m pytest src/test_single_flight.py
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from src.single_flight import SingleFlight, SingleFlightError
+
+CALLERS = 8
+
+
+def run_together(flight, key, fn):
+    """Call flight.do(key, fn) from CALLERS threads, started while the first call is still running"""
+    started = threading.Event()
+    release = threading.Event()
+
+    def leader_fn():
+        started.set()
+        release.wait()
+        return fn()
+
+    def call():
+        try:
+            return flight.do(key, leader_fn)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=CALLERS) as executor:
+        first = executor.submit(call)
+        started.wait()
+        rest = [executor.submit(call) for _ in range(CALLERS - 1)]
+        # Let the waiters reach flight.do before the leader finishes
+        while flight.stats()["shared"] < CALLERS - 1:
+            time.sleep(0.001)
+        release.set()
+        return [first.result()] + [future.result() for future in rest]
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    results = run_together(flight, "product-1", lambda: calls.append(1) or {"status": "found"})
+
+    assert calls == [1]
+    assert results == [{"status": "found"}] * CALLERS
+    assert flight.stats() == {"calls": 1, "shared": CALLERS - 1, "in_flight": 0}
+
+
+def test_waiters_get_their_own_error_raised_from_the_failure():
+    flight = SingleFlight()
+    failure = ValueError("unreadable table")
+
+    def fail():
+        raise failure
+
+    results = run_together(flight, "product-1", fail)
+
+    assert results[0] is failure
+    waiters = results[1:]
+    assert all(isinstance(error, SingleFlightError) and error.__cause__ is failure for error in waiters)
+    assert len({id(error) for error in waiters}) == len(waiters)
+
+
+def test_a_later_caller_runs_again():
+    flight = SingleFlight()
+    assert flight.do("product-1", lambda: 1) == 1
+    assert flight.do("product-1", lambda: 2) == 2
+    with pytest.raises(ValueError):
+        flight.do("product-1", lambda: int("x"))
+    assert flight.stats() == {"calls": 3, "shared": 0, "in_flight": 0}
@@ -0,0 +1,21 @@
+"""
+Dimension cell normalization and checking in the native table parser.
+
+Run from the repo root:
+    python -m pytest src/test_table_parser.py
+"""
+from src.table_parser import DIMENSION, _normalize_dimension
+
+
+def test_dimension_cells_are_normalized_to_the_catalog_notation():
+    assert _normalize_dimension("140→220x80x75h") == "140-220x80x75h"
+    assert _normalize_dimension("ø63 x29¹/₂h") == "ø63x29¹/₂h"
+    assert _normalize_dimension("A 200x100x74h") == "A 200x100x74h"
+    assert _normalize_dimension("180x120x72h ovale") == "180x120x72h ovale"
+
+
+def test_dimension_pattern():
+    for text in ["140-220x80x75h", "A 200x100x74h", "ø24³/₈x26h", "53,5x59x86h", "118¹/₈x47¹/₄x29¹/₂h shaped"]:
+        assert DIMENSION.match(text), text
+    for text in ["140→220x80x75h", "ø63 x29¹/₂h", "1.250", "Colli"]:
+        assert not DIMENSION.match(text), text
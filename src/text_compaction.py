@@ -0,0 +1,67 @@
+import re
+from collections import Counter
+from typing import List, Optional, Set
+import fitz  # PyMuPDF
+
+# Lines in the top/bottom BAND_FRACTION of a page are header/footer candidates
+BAND_FRACTION = 0.1
+# Lines this long are legal/boilerplate candidates wherever they are on the page
+MIN_LONG_LINE_CHARS = 40
+# A candidate is boilerplate if it appears on at least this share of pages (and MIN_REPEAT_PAGES pages)
+MIN_REPEAT_FRACTION = 0.5
+MIN_REPEAT_PAGES = 3
+
+SPACES = re.compile(r"[ \t\u00a0]+")
+PAGE_NUMBER = re.compile(r"^\d{1,4}$")
+
+
+def _normalize_line(line: str) -> str:
+    return SPACES.sub(" ", line).strip()
+
+
+def find_boilerplate_lines(pdf_path: str, doc: Optional[fitz.Document] = None) -> Set[str]:
+    """
+    Lines repeated across the document: running headers/footers and long legal text.
+    Table headers and colour codes also repeat, but sit mid-page and are short, so they are kept.
+    Reads `doc` if given (left open), otherwise opens pdf_path.
+    """
+    counts = Counter()
+    owned = doc is None
+    if owned:
+        doc = fitz.open(pdf_path)
+    try:
+        page_count = doc.page_count
+        for page in doc:
+            height = page.rect.height
+            candidates = set()
+            for x0, y0, x1, y1, text, *_ in page.get_text("blocks"):
+                in_band = y0 < height * BAND_FRACTION or y1 > height * (1 - BAND_FRACTION)
+                for line in text.splitlines():
+                    line = _normalize_line(line)
+                    if line and not PAGE_NUMBER.match(line) and (in_band or len(line) >= MIN_LONG_LINE_CHARS):
+                        candidates.add(line)
+            counts.update(candidates)
+    finally:
+        if owned:
+            doc.close()
+
+    threshold = max(MIN_REPEAT_PAGES, MIN_REPEAT_FRACTION * page_count)
+    return {line for line, count in counts.items() if count >= threshold}
+
+
+def compact_text(text: str, boilerplate: Set[str]) -> str:
+    """
+    Drop boilerplate lines (and page numbers next to them), collapse runs of spaces
+    and remove blank lines. Line breaks are kept since table cells come out one per line.
+    """
+    lines: List[str] = [line for line in (_normalize_line(line) for line in text.splitlines()) if line]
+    kept = []
+    for i, line in enumerate(lines):
+        if line in boilerplate:
+            continue
+        if PAGE_NUMBER.match(line):
+            neighbours = lines[i - 1:i] + lines[i + 1:i + 2]
+            if any(neighbour in boilerplate for neighbour in neighbours):
+                continue
+        kept.append(line)
+    return "\n".join(kept)